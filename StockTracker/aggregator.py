@@ -0,0 +1,250 @@
+# aggregator.py
+# Streaming OHLCV aggregation into coarser resolutions
+
+import threading
+import logging
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Iterable
+from zoneinfo import ZoneInfo
+from config import Config
+from models import StockCandle, CandleBatch, AggregatedBar, to_epoch, from_trade_date
+
+# Resolution name -> bar length. '1d' bars span the whole session.
+RESOLUTIONS = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+def interval_to_timedelta(interval: str) -> timedelta:
+    """Length of a resolution name like '5m' or '1h'"""
+    if interval not in RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution: {interval}")
+    return RESOLUTIONS[interval]
+
+def derived_resolutions(base_interval: Optional[str] = None) -> List[str]:
+    """
+    Configured resolutions coarser than the base data interval.
+    With no base interval (ticks), every configured resolution is built.
+    """
+    base = interval_to_timedelta(base_interval) if base_interval else timedelta(0)
+    return [r for r in Config.AGGREGATE_RESOLUTIONS if interval_to_timedelta(r) > base]
+
+def bar_bounds(timestamp: datetime, resolution: str):
+    """
+    (start, end) of the bar containing a timestamp. Intraday bars are
+    anchored at the market open; the last bar of a session and daily bars
+    end at the market close.
+    """
+    session_open = timestamp.replace(hour=Config.MARKET_OPEN_TIME.hour,
+                                     minute=Config.MARKET_OPEN_TIME.minute,
+                                     second=0, microsecond=0)
+    session_close = timestamp.replace(hour=Config.MARKET_CLOSE_TIME.hour,
+                                      minute=Config.MARKET_CLOSE_TIME.minute,
+                                      second=0, microsecond=0)
+
+    if resolution == '1d':
+        return session_open, session_close
+
+    length = interval_to_timedelta(resolution)
+    start = session_open + length * ((timestamp - session_open) // length)
+    end = start + length
+    if start < session_close < end:
+        end = session_close
+    return start, end
+
+class BarAggregator:
+    """
+    Incrementally maintains OHLCV bars for several resolutions from a stream
+    of fine-grained candles (or ticks). A bar is emitted as soon as the
+    candle that reaches its end arrives, or when a later candle shows the
+    bar is over. Completed bars are written to the database on flush().
+    """
+
+    def __init__(self, database=None, resolutions: List[str] = None,
+                 base_interval: Optional[str] = Config.DATA_INTERVAL):
+        self.database = database
+        self.base_interval = base_interval
+        self.base_length = interval_to_timedelta(base_interval) if base_interval else timedelta(0)
+        self.resolutions = resolutions if resolutions is not None else derived_resolutions(base_interval)
+        self._open_bars: Dict[str, Dict[str, AggregatedBar]] = {}
+        self._bar_ends: Dict[tuple, datetime] = {}
+        self._last_seen: Dict[str, datetime] = {}
+        self._completed: List[AggregatedBar] = []
+        self._lock = threading.Lock()
+
+    def ingest(self, candle: StockCandle) -> List[AggregatedBar]:
+        """Add a base-interval candle. Returns bars completed by it."""
+        return self._ingest(candle.symbol, candle.timestamp, candle.open_price, candle.high_price,
+                            candle.low_price, candle.close_price, candle.volume, self.base_length)
+
+    def ingest_many(self, candles: Iterable[StockCandle]) -> List[AggregatedBar]:
+        """Add candles in timestamp order. Returns bars completed by them."""
+        completed = []
+        for candle in sorted(candles, key=lambda c: (c.symbol, c.timestamp)):
+            completed.extend(self.ingest(candle))
+        return completed
+
+    def ingest_tick(self, symbol: str, timestamp: datetime, price: float, volume: int = 0) -> List[AggregatedBar]:
+        """Add a single trade from a streaming source. Returns bars completed by it."""
+        return self._ingest(symbol, timestamp, price, price, price, price, volume, timedelta(0))
+
+    def _ingest(self, symbol, timestamp, open_price, high_price, low_price, close_price,
+                volume, length) -> List[AggregatedBar]:
+        completed = []
+
+        with self._lock:
+            last_seen = self._last_seen.get(symbol)
+            if last_seen is not None and timestamp <= last_seen and length:
+                # Re-fetched or late candle; its bars were already built
+                logging.debug(f"Aggregator ignoring out-of-order candle {symbol} {timestamp}")
+                return completed
+            self._last_seen[symbol] = timestamp
+
+            bars = self._open_bars.setdefault(symbol, {})
+            for resolution in self.resolutions:
+                start, end = bar_bounds(timestamp, resolution)
+                bar = bars.get(resolution)
+
+                if bar is not None and bar.timestamp != start:
+                    # A newer bar started, so the open one is over
+                    completed.append(bars.pop(resolution))
+                    bar = None
+
+                if bar is None:
+                    bar = bars[resolution] = AggregatedBar(
+                        symbol=symbol,
+                        resolution=resolution,
+                        timestamp=start,
+                        open_price=open_price,
+                        high_price=high_price,
+                        low_price=low_price,
+                        close_price=close_price,
+                        volume=volume,
+                        candle_count=1
+                    )
+                    self._bar_ends[(symbol, resolution)] = end
+                else:
+                    bar.high_price = max(bar.high_price, high_price)
+                    bar.low_price = min(bar.low_price, low_price)
+                    bar.close_price = close_price
+                    bar.volume += volume
+                    bar.candle_count += 1
+
+                if length and timestamp + length >= self._bar_ends[(symbol, resolution)]:
+                    completed.append(bars.pop(resolution))
+
+            self._completed.extend(completed)
+
+        return completed
+
+    def close_bars_before(self, now: datetime) -> List[AggregatedBar]:
+        """Complete open bars whose end has passed (e.g. at market close or for ticks)"""
+        completed = []
+        with self._lock:
+            for symbol, bars in self._open_bars.items():
+                for resolution in list(bars):
+                    if self._bar_ends[(symbol, resolution)] <= now:
+                        completed.append(bars.pop(resolution))
+            self._completed.extend(completed)
+        return completed
+
+    def get_open_bars(self, symbol: str) -> Dict[str, AggregatedBar]:
+        """In-progress bars for a symbol, keyed by resolution"""
+        with self._lock:
+            return dict(self._open_bars.get(symbol, {}))
+
+    def flush(self, include_open: bool = False) -> int:
+        """
+        Write completed bars to the database. With include_open, in-progress
+        bars are written too (they are overwritten once complete).
+        """
+        with self._lock:
+            bars = self._completed
+            self._completed = []
+            if include_open:
+                bars = bars + [bar for symbol_bars in self._open_bars.values()
+                               for bar in symbol_bars.values()]
+
+        if not bars or self.database is None:
+            return 0
+        return self.database.save_bars(bars)
+
+    def warm_up(self, symbols: List[str], since: datetime):
+        """
+        Rebuild in-progress bars from stored candles after a restart
+        """
+        for symbol in symbols:
+            for page in self.database.get_candles_range(symbol, start=since, as_batch=True):
+                self.ingest_many(page)
+        self.flush()
+
+def aggregate_candles(candles: Iterable[StockCandle], resolutions: List[str] = None) -> List[AggregatedBar]:
+    """
+    Aggregate a finished batch of candles (e.g. a backfill chunk) in one pass.
+    Bars still open at the end of the batch are included. A CandleBatch is
+    aggregated on its columns, without a StockCandle per row.
+    """
+    if isinstance(candles, CandleBatch):
+        return _aggregate_batch(candles, resolutions)
+
+    aggregator = BarAggregator(resolutions=resolutions)
+    completed = aggregator.ingest_many(candles)
+    for bars in aggregator._open_bars.values():
+        completed.extend(bars.values())
+    return completed
+
+def _aggregate_batch(batch: CandleBatch, resolutions: List[str] = None) -> List[AggregatedBar]:
+    """
+    aggregate_candles over a CandleBatch: bar starts are computed on the
+    epoch column (bar_bounds anchoring) and each bar is one reduceat slice
+    """
+    if resolutions is None:
+        resolutions = derived_resolutions(Config.DATA_INTERVAL)
+    if not len(batch):
+        return []
+
+    # Timestamp order; a re-fetched candle counts once, like in BarAggregator
+    batch = batch.sorted()
+    batch = batch[np.unique(batch.timestamp, return_index=True)[1]]
+
+    days, day_of_candle = np.unique(batch.trade_dates(), return_inverse=True)
+    session_open = np.array([to_epoch(datetime.combine(from_trade_date(day), Config.MARKET_OPEN_TIME))
+                             for day in days.tolist()], dtype=np.int64)[day_of_candle]
+    tzinfo = ZoneInfo(batch.tz)
+
+    bars = []
+    for resolution in resolutions:
+        if resolution == '1d':
+            starts = session_open
+        else:
+            length = int(interval_to_timedelta(resolution).total_seconds())
+            starts = session_open + (batch.timestamp - session_open) // length * length
+
+        # Starts never decrease, so each bar is a contiguous run of candles
+        bar_starts, first = np.unique(starts, return_index=True)
+        last = np.append(first[1:], len(starts)) - 1
+        columns = zip(bar_starts.tolist(), batch.open_price[first].tolist(),
+                      np.maximum.reduceat(batch.high_price, first).tolist(),
+                      np.minimum.reduceat(batch.low_price, first).tolist(),
+                      batch.close_price[last].tolist(), np.add.reduceat(batch.volume, first).tolist(),
+                      (last - first + 1).tolist())
+        bars.extend(
+            AggregatedBar(
+                symbol=batch.symbol,
+                resolution=resolution,
+                timestamp=datetime.fromtimestamp(start, tzinfo),
+                open_price=open_price,
+                high_price=high_price,
+                low_price=low_price,
+                close_price=close_price,
+                volume=volume,
+                candle_count=candle_count
+            )
+            for start, open_price, high_price, low_price, close_price, volume, candle_count in columns
+        )
+    return bars
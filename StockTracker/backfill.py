@@ -0,0 +1,203 @@
+# backfill.py
+# Resumable, chunked historical backfill
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from config import Config
+from data_fetcher import StockDataFetcher
+from database import StockDatabase
+from aggregator import aggregate_candles
+
+# Chunks are laid on a fixed grid of dates so that repeated runs over
+# overlapping ranges produce the same (symbol, chunk) checkpoints
+CHUNK_GRID_ORIGIN = date(2000, 1, 3)
+
+class BackfillEngine:
+    """
+    Backfills an arbitrary date range by splitting it into provider-sized
+    chunks. Symbols are fetched in parallel (chunks of one symbol run in
+    order), and every finished chunk is checkpointed in the database so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, fetcher: StockDataFetcher, database: StockDatabase,
+                 chunk_days: int = None):
+        self.fetcher = fetcher
+        self.database = database
+        self.chunk_days = max(1, chunk_days or Config.BACKFILL_CHUNK_DAYS)
+        self.market_tz = pytz.timezone(Config.MARKET_TIMEZONE)
+
+    def plan_chunks(self, start: date, end: date) -> List[Tuple[date, date]]:
+        """
+        Split [start, end] (inclusive dates) into grid-aligned chunks.
+        Each chunk is (first_date, end_date_exclusive).
+        """
+        chunks = []
+        offset = (start - CHUNK_GRID_ORIGIN).days // self.chunk_days
+        chunk_start = CHUNK_GRID_ORIGIN + timedelta(days=offset * self.chunk_days)
+
+        while chunk_start <= end:
+            chunk_end = chunk_start + timedelta(days=self.chunk_days)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end
+
+        return chunks
+
+    def _clamp_chunk(self, chunk: Tuple[date, date], start: date, end: date) -> Tuple[date, date]:
+        """
+        The part of a grid-aligned chunk inside [start, end]. The grid start
+        stays the checkpoint key; only the clamped dates are fetched.
+        """
+        return max(chunk[0], start), min(chunk[1], end + timedelta(days=1))
+
+    def _chunk_window(self, chunk: Tuple[date, date]) -> Tuple[datetime, datetime]:
+        """Chunk dates as tz-aware datetimes in the market timezone"""
+        return (
+            self.market_tz.localize(datetime.combine(chunk[0], time.min)),
+            self.market_tz.localize(datetime.combine(chunk[1], time.min))
+        )
+
+    def _earliest_available(self) -> Optional[date]:
+        """Oldest date the data source still serves intraday candles for"""
+        lookback = self.fetcher.source.intraday_lookback_days
+        if lookback is None:
+            return None
+        return (self.fetcher.source.now() - timedelta(days=lookback)).date() + timedelta(days=1)
+
+    def run(self, start: date, end: date = None, symbols: List[str] = None) -> Dict[str, int]:
+        """
+        Backfill all symbols over [start, end]. Returns saved candles per symbol.
+        """
+        symbols = list(symbols if symbols is not None else self.fetcher.symbols)
+        end = end or self.fetcher.source.now().date()
+
+        earliest = self._earliest_available()
+        if earliest and start < earliest:
+            logging.warning(f"Data source only serves {Config.DATA_INTERVAL} candles "
+                            f"from {earliest}; backfill starts there instead of {start}")
+            start = earliest
+
+        chunks = self.plan_chunks(start, end)
+        done = self.database.get_backfill_checkpoints(symbols, [chunk[0] for chunk in chunks])
+
+        pending = {
+            symbol: [chunk for chunk in chunks if (symbol, chunk[0]) not in done]
+            for symbol in symbols
+        }
+        total_chunks = len(symbols) * len(chunks)
+        remaining = sum(len(queue) for queue in pending.values())
+        logging.info(f"Backfill {start} to {end}: {len(symbols)} symbols x {len(chunks)} chunks, "
+                     f"{total_chunks - remaining} already done, {remaining} to fetch")
+
+        results = {symbol: 0 for symbol in symbols}
+
+        # Chunk saves all happen on this thread, under bulk-write durability
+        with self.database.bulk_writes(), \
+                ThreadPoolExecutor(max_workers=self.fetcher.max_workers) as executor:
+            running = {}
+
+            def submit_next(symbol):
+                if pending[symbol] and not self.fetcher.circuit_breaker.allow_request(symbol):
+                    logging.warning(f"Skipping backfill for {symbol}: circuit open")
+                    pending[symbol] = []
+                if pending[symbol]:
+                    chunk = pending[symbol].pop(0)
+                    window = self._chunk_window(self._clamp_chunk(chunk, start, end))
+                    future = executor.submit(self.fetcher.fetch_range, symbol, *window)
+                    running[future] = (symbol, chunk)
+
+            for symbol in symbols:
+                submit_next(symbol)
+
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    symbol, chunk = running.pop(future)
+                    results[symbol] += self._complete_chunk(symbol, chunk, future,
+                                                            self._clamp_chunk(chunk, start, end))
+                    submit_next(symbol)
+
+        total_saved = sum(results.values())
+        logging.info(f"Backfill completed: {total_saved} total records saved")
+        return results
+
+    def _complete_chunk(self, symbol: str, chunk: Tuple[date, date], future,
+                        fetched: Tuple[date, date]) -> int:
+        """
+        Save a fetched chunk and record its checkpoint. `fetched` is the
+        clamped part of the chunk that was actually requested.
+        """
+        try:
+            candles = future.result()
+        except Exception as e:
+            logging.error(f"Backfill chunk {chunk[0]} for {symbol} failed: {e}")
+            self.fetcher.circuit_breaker.record_failure(symbol, str(e))
+            self.database.save_backfill_checkpoint(symbol, chunk[0], chunk[1], 'failed', 0)
+            return 0
+
+        self.fetcher.circuit_breaker.record_success(symbol)
+
+        if not len(candles) and self._has_trading_days(fetched):
+            # Nothing came back for days the market was open: most likely a
+            # failure the source reported as empty, so fetch it again next run
+            logging.warning(f"Backfill chunk {chunk[0]} for {symbol} returned no candles")
+            self.database.save_backfill_checkpoint(symbol, chunk[0], chunk[1], 'empty', 0)
+            return 0
+
+        saved = self.database.save_candles(candles)
+        if not saved.success:
+            # Not checkpointed as done, so the next run fetches it again
+            self.database.save_backfill_checkpoint(symbol, chunk[0], chunk[1], 'failed', len(candles))
+            return 0
+        saved_count = saved.inserted
+
+        # Chunks are whole days, so every coarser bar lies inside one chunk
+        self.database.save_bars(aggregate_candles(candles))
+
+        # A chunk that reaches into today is still filling up, and one cut
+        # short by the requested range is missing days; fetch those again
+        # next run. Days the source no longer serves do not count as missing
+        status = 'done' if chunk[1] <= self.fetcher.source.now().date() \
+            and self._covers_chunk(chunk, fetched) else 'partial'
+        self.database.save_backfill_checkpoint(symbol, chunk[0], chunk[1], status, len(candles))
+
+        logging.info(f"Backfilled {saved_count} records for {symbol} ({chunk[0]} to {chunk[1]})")
+        return saved_count
+
+    def _covers_chunk(self, chunk: Tuple[date, date], fetched: Tuple[date, date]) -> bool:
+        """Whether the fetched dates cover every day of the chunk still available"""
+        earliest = self._earliest_available()
+        first = max(chunk[0], earliest) if earliest else chunk[0]
+        return fetched[0] <= first and fetched[1] >= chunk[1]
+
+    def _has_trading_days(self, chunk: Tuple[date, date]) -> bool:
+        """Whether a chunk covers a weekday the market trades on"""
+        return any((chunk[0] + timedelta(days=offset)).weekday() in Config.TRADING_DAYS
+                   for offset in range((chunk[1] - chunk[0]).days))
+
+    def run_days(self, days: int, symbols: List[str] = None) -> Dict[str, int]:
+        """Backfill the last `days` trading days"""
+        return self.run(self.trading_days_start(days), symbols=symbols)
+
+    def trading_days_start(self, days: int) -> date:
+        """
+        First date of the last `days` trading days. Today counts only once
+        the market has opened.
+        """
+        now = self.fetcher.source.now()
+        day = now.date()
+        if now.time() < Config.MARKET_OPEN_TIME:
+            day -= timedelta(days=1)
+
+        counted = 0
+        while True:
+            if day.weekday() in Config.TRADING_DAYS:
+                counted += 1
+                if counted >= max(1, days):
+                    return day
+            day -= timedelta(days=1)
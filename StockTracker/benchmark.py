@@ -0,0 +1,721 @@
+#!/usr/bin/env python3
+# benchmark.py
+# Offline benchmarks for Stock Tracker, driven by the replay data source
+
+import sys
+import os
+import time
+import logging
+import argparse
+import tempfile
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from data_fetcher import StockDataFetcher
+from data_sources import ReplaySource, write_synthetic_replay
+
+def synthetic_symbols(count: int):
+    """Symbol names for synthetic recordings"""
+    return [f"SYM{i:05d}.NS" for i in range(count)]
+
+def make_replay(args, count: int, days: int = 1) -> ReplaySource:
+    """Write synthetic recordings (unless --replay-dir is given) and open them"""
+    directory = args.replay_dir or tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(count)
+    if not args.replay_dir:
+        write_synthetic_replay(directory, symbols, days=days)
+
+    source = ReplaySource(directory, speed=0, latency=args.latency)
+    source.preload(symbols)
+    return source
+
+def use_temporary_database():
+    """Point the application at a throwaway database"""
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='stocktracker-db-'), 'stocks.db')
+
+def bench_fetch(args):
+    """Cycle time of fetch_all_symbols against symbol count"""
+    Config.REQUESTS_PER_SECOND = args.rate
+    Config.RATE_LIMIT_BURST = args.rate
+    source = make_replay(args, max(args.sizes))
+
+    print(f"Fetch cycle (replay latency {args.latency * 1000:.0f} ms/request, "
+          f"batch size {min(Config.FETCH_BATCH_SIZE, int(args.rate))}, {Config.FETCH_WORKERS} workers, "
+          f"{args.rate:g} requests/s)")
+    print(f"{'symbols':>8} {'mode':>8} {'requests':>9} {'seconds':>9}")
+
+    for count in args.sizes:
+        fetcher = StockDataFetcher(synthetic_symbols(count), source=source)
+
+        for mode, batched, workers in (("serial", False, 1),
+                                       ("pooled", False, Config.FETCH_WORKERS),
+                                       ("batched", True, Config.FETCH_WORKERS)):
+            fetcher.max_workers = workers
+            source.requests = 0
+            started = time.perf_counter()
+            results = fetcher.fetch_all_symbols(batched=batched)
+            elapsed = time.perf_counter() - started
+
+            assert all(r.success for r in results)
+            print(f"{count:>8} {mode:>8} {source.requests:>9} {elapsed:>9.3f}")
+
+def bench_pipeline(args):
+    """Backfill and collection throughput of the scheduler against a fresh database"""
+    from scheduler import DataScheduler
+
+    Config.REQUESTS_PER_SECOND = args.rate
+    Config.RATE_LIMIT_BURST = args.rate
+    use_temporary_database()
+    source = make_replay(args, args.symbols, days=args.days)
+
+    Config.STOCK_SYMBOLS = synthetic_symbols(args.symbols)
+    scheduler = DataScheduler()
+    scheduler.fetcher = StockDataFetcher(Config.STOCK_SYMBOLS, database=scheduler.database, source=source)
+    scheduler.market_hours_only = False
+
+    print(f"Pipeline ({args.symbols} symbols x {args.days} days, "
+          f"replay latency {args.latency * 1000:.0f} ms/request)")
+
+    # Backfill exactly the recorded sessions rather than the days before today
+    recorded = source.history(Config.STOCK_SYMBOLS[0], Config.DATA_INTERVAL, period='max').index
+    source.requests = 0
+
+    started = time.perf_counter()
+    results = scheduler.backfill_range(recorded[0].date(), recorded[-1].date())
+    elapsed = time.perf_counter() - started
+    saved = sum(results.values())
+    print(f"  backfill: {saved} candles in {elapsed:.3f}s ({saved / elapsed:,.0f} candles/s)")
+
+    started = time.perf_counter()
+    scheduler._collect_data()
+    elapsed = time.perf_counter() - started
+    scheduler.ingest_queue.flush()
+    written = time.perf_counter() - started
+    queue = scheduler.ingest_queue.get_status()
+    print(f"  collection cycle: {elapsed:.3f}s (written by {written:.3f}s, "
+          f"{queue['commits']} commits, last {queue['last_commit_ms']:.1f} ms)")
+    scheduler.ingest_queue.stop()
+
+def bench_ingest(args):
+    """Backfill insert throughput: the previous per-candle save vs one save_candles batch"""
+    import sqlite3
+    from database import StockDatabase, partition_name
+    from models import (CandleBatch, to_epoch, trade_date, trade_date_bounds, to_paise,
+                        avg_price_paise, net_money_flow)
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+    batches = [CandleBatch.from_frame(symbol, source.history(symbol, Config.DATA_INTERVAL, period='max'))
+               for symbol in symbols]
+    total = sum(len(batch) for batch in batches)
+
+    def per_candle(database):
+        # The previous save_candle on today's schema: a fresh rollback-journal
+        # connection per candle, two SELECTs for Net MF, one INSERT and a commit
+        conn = database._connect()
+        database._ensure_partitions(conn, {day for batch in batches for day in batch.trade_dates().tolist()})
+        database._ensure_symbols(conn, symbols)
+        for batch in batches:
+            for candle in batch:
+                conn = sqlite3.connect(database.db_path)
+                cursor = conn.cursor()
+                timestamp, day = to_epoch(candle.timestamp), trade_date(candle.timestamp)
+                open_price, high_price = to_paise(candle.open_price), to_paise(candle.high_price)
+                low_price, close_price = to_paise(candle.low_price), to_paise(candle.close_price)
+                avg_price = avg_price_paise(high_price, low_price)
+                money_flow = avg_price * candle.volume
+                day_start, day_end = trade_date_bounds(day)
+                cursor.execute('''
+                    SELECT COUNT(*) FROM stock_candles
+                    WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+                ''', (candle.symbol, day_start, day_end))
+                previous = None
+                if cursor.fetchone()[0]:
+                    cursor.execute('''
+                        SELECT avg_price, net_mf FROM stock_candles
+                        WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp DESC LIMIT 1
+                    ''', (candle.symbol, day_start, day_end))
+                    previous = cursor.fetchone()
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO {partition_name(day)}
+                    (symbol_id, timestamp, trade_date, open_price, high_price, low_price,
+                    close_price, volume, avg_price, money_flow, net_mf, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (database.symbol_ids[candle.symbol], timestamp, day, open_price, high_price,
+                      low_price, close_price, candle.volume, avg_price, money_flow,
+                      net_money_flow(money_flow, avg_price, open_price, close_price, previous),
+                      to_epoch(candle.created_at)))
+                conn.commit()
+                conn.close()
+
+    def bulk(database):
+        for batch in batches:
+            database.save_candles(batch)
+
+    print(f"Ingest of {total:,} candles ({args.symbols} symbols x {args.days} days)")
+    timings = {}
+    net_mf = {}
+    for name, journal_mode, func in (("per-candle", 'DELETE', per_candle),
+                                     ("save_candles", Config.DB_JOURNAL_MODE, bulk)):
+        Config.DB_JOURNAL_MODE = journal_mode
+        use_temporary_database()
+        database = StockDatabase()
+        started = time.perf_counter()
+        func(database)
+        timings[name] = time.perf_counter() - started
+        net_mf[name] = [candle.net_mf for symbol in symbols
+                        for candle in database.get_candles_for_symbol(symbol, limit=total)]
+        print(f"  {name:<13} {timings[name]:>8.3f}s {total / timings[name]:>12,.0f} candles/s")
+
+    speedup = timings['per-candle'] / timings['save_candles']
+    print(f"  speedup {speedup:.0f}x ({'meets' if speedup >= 50 else 'short of'} the 50x target), "
+          f"Net MF identical: {net_mf['per-candle'] == net_mf['save_candles']}")
+
+def bench_recompute(args):
+    """Net MF chain rebuild: per-row net_money_flow loop vs vectorized recompute_net_mf"""
+    import numpy as np
+    from database import StockDatabase, partition_name
+    from models import CandleBatch, net_money_flow, net_money_flow_chain
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+
+    use_temporary_database()
+    database = StockDatabase()
+    with database.bulk_writes():
+        for symbol in symbols:
+            database.save_candles(CandleBatch.from_frame(symbol, source.history(symbol, Config.DATA_INTERVAL, period='max')))
+    conn = database._connect()
+    total = database.get_total_records()
+    expected = conn.execute('SELECT net_mf FROM stock_candles ORDER BY symbol, timestamp').fetchall()
+
+    def per_row():
+        for symbol in symbols:
+            rows = conn.execute('''
+                SELECT symbol_id, timestamp, trade_date, open_price, close_price, avg_price, money_flow
+                FROM stock_candles WHERE symbol = ? ORDER BY timestamp
+            ''', (symbol,)).fetchall()
+            updates, previous, previous_day = {}, None, None
+            for symbol_id, timestamp, day, open_price, close_price, avg_price, money_flow in rows:
+                if day != previous_day:
+                    previous, previous_day = None, day
+                net_mf = net_money_flow(money_flow, avg_price, open_price, close_price, previous)
+                previous = (avg_price, net_mf)
+                updates.setdefault(partition_name(day), []).append((net_mf, symbol_id, timestamp))
+            for table, table_updates in updates.items():
+                conn.executemany(f'UPDATE {table} SET net_mf = ? WHERE symbol_id = ? AND timestamp = ?',
+                                 table_updates)
+            conn.commit()
+
+    def vectorized():
+        for symbol in symbols:
+            database.recompute_net_mf(symbol)
+
+    print(f"Net MF recompute of {total:,} candles ({args.symbols} symbols x {args.days} days)")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # The chain arithmetic alone, on columns already in memory
+    columns = np.array(conn.execute('''
+        SELECT symbol_id, trade_date, avg_price, open_price, close_price, money_flow
+        FROM stock_candles ORDER BY symbol, timestamp
+    ''').fetchall(), dtype=np.int64)
+    chains = columns[:, 0] * 100000000 + columns[:, 1]
+
+    def chain_per_row():
+        values, previous, previous_chain = [], None, None
+        for chain, avg_price, open_price, close_price, money_flow in zip(
+                chains.tolist(), *(columns[:, index].tolist() for index in range(2, 6))):
+            if chain != previous_chain:
+                previous, previous_chain = None, chain
+            net_mf = net_money_flow(money_flow, avg_price, open_price, close_price, previous)
+            previous = (avg_price, net_mf)
+            values.append(net_mf)
+        return values
+
+    chain_results = {}
+    for name, func in (("per-row loop", chain_per_row),
+                       ("net_money_flow_chain", lambda: net_money_flow_chain(
+                           chains, columns[:, 2], columns[:, 3], columns[:, 4], columns[:, 5]).tolist())):
+        started = time.perf_counter()
+        chain_results[name] = func()
+        elapsed = time.perf_counter() - started
+        print(f"  chain only, {name:<21} {elapsed * 1000:>8.1f} ms")
+    print(f"  chain results identical: {len(set(map(tuple, chain_results.values()))) == 1}")
+    print(f"  end to end (read, compute, write changed rows, commit per symbol), best of {args.repeat}:")
+    timings = {}
+    identical = {}
+    for _ in range(args.repeat):
+        # Alternate the methods so drift in disk and cache state hits both
+        for name, func in (("per-row loop", per_row), ("recompute_net_mf", vectorized)):
+            for table in database._candle_partitions(conn.cursor()):
+                conn.execute(f'UPDATE {table} SET net_mf = 0')
+            conn.commit()
+            started = time.perf_counter()
+            func()
+            timings.setdefault(name, []).append(time.perf_counter() - started)
+            identical[name] = conn.execute(
+                'SELECT net_mf FROM stock_candles ORDER BY symbol, timestamp').fetchall() == expected
+
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        vectorized()
+        timings.setdefault("already correct", []).append(time.perf_counter() - started)
+
+    for name, elapsed in timings.items():
+        elapsed = min(elapsed)
+        print(f"  {name:<17} {elapsed:>8.3f}s {total / elapsed:>12,.0f} candles/s"
+              + (f"  identical: {identical[name]}" if name in identical else ""))
+
+def bench_retention(args):
+    """Tiered retention: roll expired months up into 1h/1d bars over the live-built ones"""
+    from database import StockDatabase, ROLLUP_RESOLUTIONS
+    from models import CandleBatch
+    from aggregator import aggregate_candles
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+
+    use_temporary_database()
+    database = StockDatabase()
+    with database.bulk_writes():
+        for symbol in symbols:
+            batch = CandleBatch.from_frame(symbol, source.history(symbol, Config.DATA_INTERVAL, period='max'))
+            database.save_candles(batch)
+            database.save_bars(aggregate_candles(batch, list(ROLLUP_RESOLUTIONS)))
+    conn = database._connect()
+    count_bars = lambda: conn.execute('SELECT COUNT(*) FROM aggregated_bars').fetchone()[0]
+    read_bars = lambda: {row[:3]: row[3:] for row in conn.execute(
+        'SELECT symbol, resolution, timestamp, ROUND(open_price, 2), ROUND(high_price, 2), ROUND(low_price, 2), '
+        'ROUND(close_price, 2), volume, candle_count FROM aggregated_bars')}
+
+    def file_size():
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')  # Freed pages leave the file at checkpoint
+        return os.path.getsize(database.db_path)
+
+    live = read_bars()
+    size = file_size()
+
+    print(f"Retention of {database.get_total_records():,} candles ({args.symbols} symbols x {args.days} days, "
+          f"{len(live):,} live-built bars)")
+    started = time.perf_counter()
+    removed = database.cleanup_old_data(days_to_keep=0, hourly_months_to_keep=10**4)
+    elapsed = time.perf_counter() - started
+    rolled = read_bars()
+
+    # The rollup must land on the live bars' keys, not next to them
+    assert count_bars() == len(live), f"{count_bars()} bars after rollup, {len(live)} before"
+    print(f"  rolled up {removed:,} candles in {elapsed:.3f}s, file {size / 2**20:.1f} -> "
+          f"{file_size() / 2**20:.1f} MB")
+    print(f"  bars {count_bars():,} (unchanged), identical to live-built: {rolled == live}")
+
+def bench_layout(args):
+    """Candle table layout: rowid tables with a UNIQUE index vs WITHOUT ROWID clustered by (symbol_id, timestamp)"""
+    import sqlite3
+    import numpy as np
+    from models import CandleBatch
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+    batches = [CandleBatch.from_frame(symbol, source.history(symbol, Config.DATA_INTERVAL, period='max'))
+               for symbol in symbols]
+    per_day = len(batches[0]) // args.days
+    total = sum(len(batch) for batch in batches)
+
+    def rows(symbol_key, batch):
+        """Candle rows in integer paise, keyed by symbol name or id"""
+        open_price, high_price, low_price, close_price = (np.rint(column * 100).astype(np.int64)
+                                                          for column in (batch.open_price, batch.high_price,
+                                                                         batch.low_price, batch.close_price))
+        avg_price = (high_price + low_price + 1) // 2
+        volume = batch.volume.astype(np.int64)
+        return list(zip([symbol_key] * len(batch), batch.timestamp.tolist(), batch.trade_dates().tolist(),
+                        open_price.tolist(), high_price.tolist(), low_price.tolist(), close_price.tolist(),
+                        volume.tolist(), avg_price.tolist(), (avg_price * volume).tolist(),
+                        [0] * len(batch), batch.timestamp.tolist()))
+
+    columns = ('{key}, timestamp INTEGER NOT NULL, trade_date INTEGER NOT NULL, '
+               'open_price INTEGER NOT NULL, high_price INTEGER NOT NULL, low_price INTEGER NOT NULL, '
+               'close_price INTEGER NOT NULL, volume INTEGER NOT NULL, avg_price INTEGER NOT NULL, '
+               'money_flow INTEGER NOT NULL, net_mf INTEGER NOT NULL, created_at INTEGER NOT NULL')
+    layouts = {
+        # Schema version 5: insert-ordered rowid tables, symbol names in every row
+        'rowid': dict(
+            create=lambda table: [
+                f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, '
+                + columns.format(key='symbol TEXT NOT NULL') + ', UNIQUE(symbol, timestamp))',
+                f'CREATE INDEX idx_{table}_trade_date ON {table}(symbol, trade_date, timestamp)'],
+            insert='INSERT OR IGNORE INTO {table} (symbol, timestamp, trade_date, open_price, high_price, '
+                   'low_price, close_price, volume, avg_price, money_flow, net_mf, created_at) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            view=lambda tables: 'CREATE VIEW stock_candles AS ' + ' UNION ALL '.join(
+                f'SELECT * FROM {table}' for table in tables),
+            key=lambda index: symbols[index]),
+        # Schema version 6 onwards: one B-tree per month ordered by symbol, then time
+        'clustered': dict(
+            create=lambda table: [
+                f'CREATE TABLE {table} (' + columns.format(key='symbol_id INTEGER NOT NULL')
+                + ', PRIMARY KEY (symbol_id, timestamp)) WITHOUT ROWID'],
+            insert='INSERT OR IGNORE INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            view=lambda tables: 'CREATE VIEW stock_candles AS ' + ' UNION ALL '.join(
+                f'SELECT s.symbol, c.* FROM {table} c JOIN symbols s ON s.id = c.symbol_id' for table in tables),
+            key=lambda index: index + 1),
+    }
+
+    # Scan the middle third of the recorded range
+    first, last = int(batches[0].timestamp[0]), int(batches[0].timestamp[-1])
+    window = (first + (last - first) // 3, first + 2 * (last - first) // 3)
+    scanned = symbols[::max(1, len(symbols) // 20)]
+
+    print(f"Candle layout ({args.symbols} symbols x {args.days} days, {total:,} candles written "
+          f"as live collection does: every symbol per cycle, one transaction per day)")
+    print(f"Range scan: one symbol, middle third of the range ({(window[1] - window[0]) / 86400:.1f} days)")
+    print(f"{'layout':>10} {'candles/s':>10} {'live cycle ms':>14} {'file MB':>8} {'scan ms':>15}")
+
+    for name, layout in layouts.items():
+        path = os.path.join(tempfile.mkdtemp(prefix='stocktracker-db-'), 'stocks.db')
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {Config.DB_SYNCHRONOUS}')
+        conn.execute('CREATE TABLE symbols (id INTEGER PRIMARY KEY, symbol TEXT NOT NULL UNIQUE)')
+        conn.executemany('INSERT INTO symbols (symbol) VALUES (?)', [(symbol,) for symbol in symbols])
+        symbol_rows = [rows(layout['key'](index), batch) for index, batch in enumerate(batches)]
+        tables = sorted({f"stock_candles_{row[2] // 100}" for row in symbol_rows[0]})
+        for table in tables:
+            for statement in layout['create'](table):
+                conn.execute(statement)
+        conn.execute(layout['view'](tables))
+
+        started = time.perf_counter()
+        for start in range(0, len(symbol_rows[0]), per_day):
+            conn.execute('BEGIN')
+            for offset in range(start, min(start + per_day, len(symbol_rows[0]))):
+                cycle = [candles[offset] for candles in symbol_rows]
+                conn.executemany(layout['insert'].format(table=f"stock_candles_{cycle[0][2] // 100}"), cycle)
+            conn.execute('COMMIT')
+        insert_rate = total / (time.perf_counter() - started)
+
+        # New candles after the recording, one per symbol per commit
+        cycles = 20
+        started = time.perf_counter()
+        for cycle in range(cycles):
+            conn.execute('BEGIN')
+            conn.executemany(layout['insert'].format(table=tables[-1]),
+                             [candles[-1][:1] + (candles[-1][1] + 86400 + cycle * 300,) + candles[-1][2:]
+                              for candles in symbol_rows])
+            conn.execute('COMMIT')
+        live_ms = (time.perf_counter() - started) / cycles * 1000
+
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = os.path.getsize(path)
+        conn.close()
+
+        # A fresh connection with a small page cache per query, as a reader
+        # that has not touched the symbol yet
+        elapsed = 0.0
+        for symbol in scanned:
+            reader = sqlite3.connect(path)
+            reader.execute('PRAGMA cache_size = -2000')
+            started = time.perf_counter()
+            found = reader.execute('SELECT * FROM stock_candles WHERE symbol = ? AND timestamp BETWEEN ? AND ? '
+                                   'ORDER BY timestamp', (symbol,) + window).fetchall()
+            elapsed += time.perf_counter() - started
+            reader.close()
+            if not found:
+                raise RuntimeError(f"no candles for {symbol} in the scan window")
+
+        print(f"{name:>10} {insert_rate:>10,.0f} {live_ms:>14.2f} {size / 2**20:>8.1f} "
+              f"{elapsed / len(scanned) * 1000:>15.2f}")
+
+def bench_concurrency(args):
+    """Reader latency while a writer thread ingests: per-call rollback-journal connections vs WAL per-thread connections"""
+    import sqlite3
+    import threading
+    import db_connection
+    from database import StockDatabase
+    from models import CandleBatch
+
+    class PerCallConnections(db_connection.ConnectionManager):
+        """The previous behaviour: a fresh default connection for every call"""
+        def connection(self):
+            return sqlite3.connect(self.db_path)
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+    batches = [CandleBatch.from_frame(symbol, source.history(symbol, Config.DATA_INTERVAL, period='max'))
+               for symbol in symbols]
+
+    print(f"Reads during ingestion ({args.symbols} symbols x {args.days} days, "
+          f"writer commits every {args.write_batch} candles, {args.seconds:g}s per mode)")
+    print(f"{'mode':>22} {'reads':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'writes/s':>9}")
+
+    for name, journal_mode, per_call in (("per-call, rollback", 'DELETE', True),
+                                         ("per-thread, WAL", 'WAL', False)):
+        Config.DB_JOURNAL_MODE = journal_mode
+        use_temporary_database()
+        database = StockDatabase()
+        if per_call:
+            database.connections = PerCallConnections(database.db_path)
+        database.save_candles(batches[0][:args.write_batch])
+
+        stop = threading.Event()
+        written = [0]
+
+        def writer():
+            while not stop.is_set():
+                for batch in batches:
+                    for start in range(0, len(batch), args.write_batch):
+                        if stop.is_set():
+                            return
+                        written[0] += database.save_candles(batch[start:start + args.write_batch]).inserted
+
+        latencies = []
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            database.get_latest_candle(symbols[0])
+            database.get_candles_for_symbol(symbols[-1], limit=50)
+            latencies.append(time.perf_counter() - started)
+        stop.set()
+        thread.join()
+
+        latencies.sort()
+        pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(f"{name:>22} {len(latencies):>7} {pick(0.5):>8.2f} {pick(0.99):>8.2f} "
+              f"{latencies[-1] * 1000:>8.2f} {written[0] / args.seconds:>9,.0f}")
+
+def bench_convert(args):
+    """DataFrame-to-candle conversion: iterrows vs column arrays"""
+    from models import StockCandle, frame_to_columns, frame_to_rows
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    write_synthetic_replay(directory, ['CONVERT.NS'], days=args.days)
+    frame = ReplaySource(directory, speed=0).history('CONVERT.NS', Config.DATA_INTERVAL, period='max')
+
+    def iterrows_candles():
+        return [StockCandle.from_yfinance_row('CONVERT.NS', timestamp.to_pydatetime(), row)
+                for timestamp, row in frame.iterrows()]
+
+    print(f"Conversion of {len(frame)} rows ({args.days} trading days), best of {args.repeat}")
+    for name, func in (("iterrows -> StockCandle", iterrows_candles),
+                       ("columns -> StockCandle", lambda: StockCandle.from_yfinance_frame('CONVERT.NS', frame)),
+                       ("columns -> row tuples", lambda: frame_to_rows('CONVERT.NS', frame)),
+                       ("columns only", lambda: frame_to_columns(frame))):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        print(f"  {name:<24} {min(timings) * 1000:>9.2f} ms")
+
+def bench_memory(args):
+    """Memory held by a history as StockCandle lists vs CandleBatches"""
+    import gc
+    import tracemalloc
+    from models import StockCandle, CandleBatch
+
+    directory = tempfile.mkdtemp(prefix='stocktracker-replay-')
+    symbols = synthetic_symbols(args.symbols)
+    write_synthetic_replay(directory, symbols, days=args.days)
+    source = ReplaySource(directory, speed=0)
+    frames = {symbol: source.history(symbol, Config.DATA_INTERVAL, period='max') for symbol in symbols}
+    rows = sum(len(frame) for frame in frames.values())
+
+    print(f"History of {args.symbols} symbols x {args.days} days ({rows:,} candles)")
+    print(f"{'layout':>14} {'MB':>9} {'bytes/candle':>13} {'seconds':>9}")
+    for name, build in (("StockCandle", StockCandle.from_yfinance_frame),
+                        ("CandleBatch", CandleBatch.from_frame)):
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        history = {symbol: build(symbol, frame) for symbol, frame in frames.items()}
+        elapsed = time.perf_counter() - started
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del history
+        print(f"{name:>14} {size / 2**20:>9.1f} {size / rows:>13.0f} {elapsed:>9.3f}")
+
+def start_stand_in_server(handshake: float, latency: float):
+    """
+    Local HTTP server standing in for the data provider. Every new connection
+    costs `handshake` seconds (TLS + cookie/crumb negotiation) and every
+    request `latency` seconds. Connections are kept alive.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # Replies on reused connections would wait for delayed ACKs
+
+        def setup(self):
+            time.sleep(handshake)
+            self.server.connections += 1
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = b'{"chart": {"result": []}}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def bench_http(args):
+    """Per-request latency of a fresh session per call vs the shared pooled session"""
+    from concurrent.futures import ThreadPoolExecutor
+    from http_session import create_http_session
+
+    server = start_stand_in_server(args.handshake, args.latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v8/finance/chart/TEST.NS"
+    shared = create_http_session()
+
+    def fresh_request(_):
+        started = time.perf_counter()
+        session = create_http_session()
+        session.get(url).raise_for_status()
+        session.close()
+        return time.perf_counter() - started
+
+    def shared_request(_):
+        started = time.perf_counter()
+        shared.get(url).raise_for_status()
+        return time.perf_counter() - started
+
+    print(f"HTTP stand-in ({args.handshake * 1000:.0f} ms per new connection, "
+          f"{args.latency * 1000:.0f} ms per request, {args.requests} requests, {args.workers} workers)")
+    print(f"{'session':>8} {'connections':>12} {'mean ms':>9} {'p95 ms':>9} {'total s':>9}")
+
+    for name, func in (("fresh", fresh_request), ("shared", shared_request)):
+        server.connections = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            timings = sorted(executor.map(func, range(args.requests)))
+        elapsed = time.perf_counter() - started
+        mean = sum(timings) / len(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:>8} {server.connections:>12} {mean * 1000:>9.1f} {p95 * 1000:>9.1f} {elapsed:>9.3f}")
+
+    server.shutdown()
+
+def bench_synth(args):
+    """Write synthetic recordings for offline runs (DATA_SOURCE = 'replay')"""
+    directory = args.replay_dir or Config.REPLAY_DATA_DIR
+    rows = write_synthetic_replay(directory, synthetic_symbols(args.symbols),
+                                  days=args.days, fmt=args.format)
+    print(f"Wrote {args.symbols} symbols x {rows} candles to {directory}")
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def create_parser():
+    """Create command line argument parser"""
+    parser = argparse.ArgumentParser(description=f"{Config.APP_NAME} benchmarks")
+    parser.add_argument('--replay-dir', help='Use existing recordings instead of synthetic ones')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated seconds per request (default: 0.05)')
+    parser.add_argument('--rate', type=float, default=100.0,
+                        help='Rate limit in requests/s (default: 100)')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help='Fetch cycle time vs symbol count')
+    fetch_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    fetch_parser.set_defaults(func=bench_fetch)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Scheduler backfill and collection throughput')
+    pipeline_parser.add_argument('--symbols', type=int, default=50)
+    pipeline_parser.add_argument('--days', type=int, default=1)
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Per-candle vs bulk database inserts')
+    ingest_parser.add_argument('--symbols', type=int, default=5)
+    ingest_parser.add_argument('--days', type=int, default=5)
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    recompute_parser = subparsers.add_parser('recompute', help='Net MF chain rebuild: per-row vs vectorized')
+    recompute_parser.add_argument('--symbols', type=int, default=500)
+    recompute_parser.add_argument('--days', type=int, default=21)
+    recompute_parser.add_argument('--repeat', type=int, default=3)
+    recompute_parser.set_defaults(func=bench_recompute)
+
+    retention_parser = subparsers.add_parser('retention', help='Roll expired candles up into hourly and daily bars')
+    retention_parser.add_argument('--symbols', type=int, default=100)
+    retention_parser.add_argument('--days', type=int, default=60)
+    retention_parser.set_defaults(func=bench_retention)
+
+    layout_parser = subparsers.add_parser('layout', help='Rowid vs clustered candle tables: inserts, size, range scans')
+    layout_parser.add_argument('--symbols', type=positive_int, default=200)
+    layout_parser.add_argument('--days', type=positive_int, default=60)
+    layout_parser.set_defaults(func=bench_layout)
+
+    concurrency_parser = subparsers.add_parser('concurrency', help='Read latency while the collector writes')
+    concurrency_parser.add_argument('--symbols', type=int, default=50)
+    concurrency_parser.add_argument('--days', type=int, default=30)
+    concurrency_parser.add_argument('--write-batch', type=int, default=75)
+    concurrency_parser.add_argument('--seconds', type=float, default=5.0)
+    concurrency_parser.set_defaults(func=bench_concurrency)
+
+    convert_parser = subparsers.add_parser('convert', help='Frame-to-candle conversion micro-benchmark')
+    convert_parser.add_argument('--days', type=int, default=60)
+    convert_parser.add_argument('--repeat', type=int, default=5)
+    convert_parser.set_defaults(func=bench_convert)
+
+    memory_parser = subparsers.add_parser('memory', help='In-memory history size: StockCandle vs CandleBatch')
+    memory_parser.add_argument('--symbols', type=int, default=100)
+    memory_parser.add_argument('--days', type=int, default=30)
+    memory_parser.set_defaults(func=bench_memory)
+
+    http_parser = subparsers.add_parser('http', help='Shared pooled session vs new session per request')
+    http_parser.add_argument('--requests', type=int, default=100)
+    http_parser.add_argument('--workers', type=int, default=Config.FETCH_WORKERS)
+    http_parser.add_argument('--handshake', type=float, default=0.15,
+                             help='Simulated seconds to open a connection (default: 0.15)')
+    http_parser.set_defaults(func=bench_http)
+
+    synth_parser = subparsers.add_parser('synth', help='Write synthetic replay recordings')
+    synth_parser.add_argument('--symbols', type=int, default=1000)
+    synth_parser.add_argument('--days', type=int, default=5)
+    synth_parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    synth_parser.set_defaults(func=bench_synth)
+
+    return parser
+
+def main():
+    """Main entry point"""
+    args = create_parser().parse_args()
+
+    # Keep per-symbol fetch logging out of the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
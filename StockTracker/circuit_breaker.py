@@ -0,0 +1,130 @@
+# circuit_breaker.py
+# Per-symbol health tracking with exponential backoff
+
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from config import Config
+
+CLOSED = 'closed'        # Healthy, requests flow normally
+OPEN = 'open'            # Failing, requests are skipped until retry_at
+HALF_OPEN = 'half_open'  # One probe request is deciding whether to close again
+
+@dataclass
+class SymbolHealth:
+    """
+    Health record for one symbol
+    """
+    symbol: str
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    open_count: int = 0
+    retry_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def backoff_seconds(self) -> float:
+        """Open duration, doubling with every consecutive trip"""
+        delay = Config.RETRY_DELAY_SECONDS * (2 ** max(0, self.open_count - 1))
+        return min(delay, Config.CIRCUIT_MAX_BACKOFF_SECONDS)
+
+class CircuitBreaker:
+    """
+    Tracks per-symbol fetch health. After MAX_RETRY_ATTEMPTS consecutive
+    failures a symbol's circuit opens and its requests are skipped. Once the
+    backoff expires a single half-open probe is let through: success closes
+    the circuit, failure re-opens it with twice the backoff.
+    """
+
+    def __init__(self, failure_threshold: int = None):
+        self.failure_threshold = max(1, failure_threshold or Config.MAX_RETRY_ATTEMPTS)
+        self._health: Dict[str, SymbolHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, symbol: str) -> SymbolHealth:
+        health = self._health.get(symbol)
+        if health is None:
+            health = self._health[symbol] = SymbolHealth(symbol)
+        return health
+
+    def allow_request(self, symbol: str) -> bool:
+        """
+        Check whether a request for the symbol may go out now.
+        An expired open circuit lets exactly one probe through.
+        """
+        with self._lock:
+            health = self._get(symbol)
+
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and time.monotonic() >= health.retry_at:
+                health.state = HALF_OPEN
+                logging.info(f"Circuit half-open for {symbol}, probing")
+                return True
+            return False
+
+    def record_success(self, symbol: str):
+        """Close the circuit after a successful request"""
+        with self._lock:
+            health = self._get(symbol)
+            if health.state != CLOSED:
+                logging.info(f"Circuit closed for {symbol}")
+            health.state = CLOSED
+            health.consecutive_failures = 0
+            health.open_count = 0
+            health.retry_at = None
+            health.last_error = None
+
+    def record_failure(self, symbol: str, error: str = None):
+        """Count a failed request, opening the circuit if needed"""
+        with self._lock:
+            health = self._get(symbol)
+            health.consecutive_failures += 1
+            health.last_error = error
+
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                health.state = OPEN
+                health.open_count += 1
+                backoff = health.backoff_seconds()
+                health.retry_at = time.monotonic() + backoff
+                logging.warning(f"Circuit open for {symbol} after {health.consecutive_failures} "
+                                f"failures, retrying in {backoff:.0f}s: {error}")
+
+    def get_state(self, symbol: str) -> str:
+        """Current circuit state for a symbol"""
+        with self._lock:
+            health = self._health.get(symbol)
+            return health.state if health else CLOSED
+
+    def get_status(self) -> dict:
+        """Summary of circuit states for status displays"""
+        with self._lock:
+            now = time.monotonic()
+            unhealthy = [h for h in self._health.values() if h.state != CLOSED]
+            return {
+                'open_count': sum(1 for h in unhealthy if h.state == OPEN),
+                'half_open_count': sum(1 for h in unhealthy if h.state == HALF_OPEN),
+                'symbols': {
+                    h.symbol: {
+                        'state': h.state,
+                        'failures': h.consecutive_failures,
+                        'retry_in': max(0.0, h.retry_at - now) if h.retry_at else None,
+                        'last_error': h.last_error
+                    }
+                    for h in sorted(unhealthy, key=lambda h: h.symbol)
+                }
+            }
+
+    def open_symbols(self) -> List[str]:
+        """Symbols whose requests are currently being skipped"""
+        with self._lock:
+            return sorted(h.symbol for h in self._health.values() if h.state != CLOSED)
+
+    def reset(self, symbol: str = None):
+        """Forget health history for one symbol, or all of them"""
+        with self._lock:
+            if symbol is None:
+                self._health.clear()
+            else:
+                self._health.pop(symbol, None)
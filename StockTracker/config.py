@@ -7,6 +7,20 @@ from datetime import time
 class Config:
     # Database settings
     DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'stocks.db')
+    DB_JOURNAL_MODE = 'WAL'           # Readers keep working while the collector writes
+    DB_SYNCHRONOUS = 'FULL'           # Live collection: every commit survives power loss
+    DB_BULK_SYNCHRONOUS = 'NORMAL'    # Backfill: consistent, last commits re-fetched if lost
+    DB_CACHE_SIZE_KB = 64 * 1024      # Page cache per connection
+    DB_MMAP_SIZE_MB = 256             # Memory-mapped reads
+    DB_STATEMENT_CACHE_SIZE = 256     # Prepared statements kept per connection
+    DB_BUSY_TIMEOUT_SECONDS = 10      # Wait this long for a lock before failing
+    DB_PAGE_SIZE = 5000               # Candles per page when streaming ranges
+    
+    # Write-behind ingestion (one writer thread saves collected candles)
+    INGEST_QUEUE_CANDLES = 50000      # Queued candles before collection waits for the writer
+    INGEST_BATCH_CANDLES = 5000       # Commit as soon as this many candles are queued...
+    INGEST_MAX_DELAY_SECONDS = 1.0    # ...or this long after the oldest one arrived
+    INGEST_STOP_TIMEOUT_SECONDS = 30  # Longest wait for queued writes when stopping
     
     # Stock symbols to track - Indian Market (NSE)
     STOCK_SYMBOLS = [
@@ -22,11 +36,31 @@ class Config:
         'LT.NS',        # Larsen & Toubro
     ]
     
+    # Data source settings
+    DATA_SOURCE = 'yfinance'    # 'yfinance' for live data, 'replay' for recorded files
+    REPLAY_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'replay')
+    REPLAY_SPEED = 1.0          # Replay clock speed (x wall time, 0 = serve everything)
+    REPLAY_LATENCY_SECONDS = 0.0  # Simulated delay per replay request
+    
     # Data fetching settings
     FETCH_INTERVAL_MINUTES = 5  # Fetch data every 5 minutes
     DATA_INTERVAL = '5m'        # 5-minute candles
+    BATCH_FETCH_ENABLED = True  # Download many symbols per request
+    FETCH_BATCH_SIZE = 50       # Symbols per batched download
+    FETCH_WORKERS = 8           # Concurrent fetch requests
+    HTTP_POOL_SIZE = 16         # Keep-alive connections held by the shared HTTP session
+    HTTP_TIMEOUT_SECONDS = 30   # Per-request timeout of the shared HTTP session
+    SESSION_WARMUP_MINUTES = 10 # Warm up the data source this long before market open
+    REQUESTS_PER_SECOND = 4.0   # Shared request budget across all fetches
+    RATE_LIMIT_BURST = 8        # Requests allowed back-to-back before pacing
+    INTRADAY_LOOKBACK_DAYS = 59 # How far back the provider serves intraday candles
+    BACKFILL_CHUNK_DAYS = 7     # Days of candles per backfill request
+    METADATA_TTL_HOURS = 24 * 7       # Refresh cached symbol metadata weekly
+    METADATA_NEGATIVE_TTL_HOURS = 24  # Re-check invalid symbols daily
+    AGGREGATE_RESOLUTIONS = ['5m', '15m', '1h', '1d']  # Bars built locally from fetched candles
     
     # Market hours (Indian Standard Time - IST)
+    MARKET_TIMEZONE = 'Asia/Kolkata'
     MARKET_OPEN_TIME = time(9, 15)   # 9:15 AM IST
     MARKET_CLOSE_TIME = time(15, 30)  # 3:30 PM IST
     
@@ -41,13 +75,16 @@ class Config:
     WINDOW_WIDTH = 800
     WINDOW_HEIGHT = 600
     UPDATE_GUI_INTERVAL = 30000  # Update GUI every 30 seconds (in milliseconds)
+    GUI_PAGE_ROWS = 50           # Candles per page in the data grid
     
-    # Data retention settings
-    KEEP_DATA_DAYS = 30  # Keep data for 30 days
+    # Data retention settings (tiered)
+    KEEP_DATA_DAYS = 30      # Keep candles for at least 30 days (then rolled up a whole month at a time)
+    KEEP_HOURLY_MONTHS = 12  # Keep 1h bars rolled up from old candles this long; daily bars are kept forever
     
     # Error handling
-    MAX_RETRY_ATTEMPTS = 3
-    RETRY_DELAY_SECONDS = 10
+    MAX_RETRY_ATTEMPTS = 3      # Consecutive failures before a symbol's circuit opens
+    RETRY_DELAY_SECONDS = 10    # First backoff; doubles each time a probe fails
+    CIRCUIT_MAX_BACKOFF_SECONDS = 6 * 60 * 60  # Longest wait between probes
     
     # Logging
     LOG_LEVEL = "INFO"
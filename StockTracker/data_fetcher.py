@@ -1,78 +1,116 @@
 # data_fetcher.py
-# Stock data fetching using yfinance
+# Stock data fetching from a pluggable data source (yfinance by default)
 
-import yfinance as yf
 import pandas as pd
 import logging
-from datetime import datetime, time, timedelta
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Callable
 from config import Config
-from models import StockCandle, FetchResult, MarketStatus
+from models import StockCandle, CandleBatch, FetchResult, MarketStatus
+from rate_limiter import get_rate_limiter
+from data_sources import DataSource, create_data_source
+from circuit_breaker import CircuitBreaker
 
 class StockDataFetcher:
     """
-    Fetches stock data using yfinance API
+    Fetches stock data from a DataSource (yfinance unless configured otherwise)
     """
     
-    def __init__(self, symbols: List[str] = None):
+    def __init__(self, symbols: List[str] = None, database=None, source: DataSource = None):
         self.symbols = symbols or Config.STOCK_SYMBOLS
-        self.session = None  # Let yfinance handle sessions internally
+        self.database = database  # Source of last stored timestamps for incremental fetches
+        self.source = source or create_data_source()
+        self.session = getattr(self.source, 'session', None)  # Shared pooled HTTP session (None offline)
+        self.rate_limiter = get_rate_limiter()
+        self.max_workers = max(1, Config.FETCH_WORKERS)
+        self.circuit_breaker = CircuitBreaker()
         logging.info("Data fetcher initialized successfully")
     
+    def warm_up(self) -> bool:
+        """
+        Prepare the data source connection before market open, so the first
+        collection of the day does not pay for handshakes and negotiation
+        """
+        try:
+            started = datetime.now()
+            self.rate_limiter.acquire()
+            self.source.warm_up(self.symbols)
+            elapsed = (datetime.now() - started).total_seconds()
+            logging.info(f"Data source warmed up in {elapsed * 1000:.0f} ms")
+            return True
+            
+        except Exception as e:
+            logging.warning(f"Data source warm-up failed: {e}")
+            return False
+    
     def fetch_latest_candle(self, symbol: str) -> FetchResult:
         """
         Fetch the latest 5-minute candle for a symbol
         """
         try:
             logging.info(f"Fetching data for {symbol}")
-            
-            # Create ticker object with error handling for different yfinance versions
-            try:
-                ticker = yf.Ticker(symbol)
-            except Exception as e:
-                if "curl_cffi" in str(e):
-                    # Try with requests_cache disabled
-                    ticker = yf.Ticker(symbol)
-                else:
-                    raise
+            self.rate_limiter.acquire()
             
             # Get 5-minute data for today
-            data = ticker.history(
-                period="1d",
-                interval=Config.DATA_INTERVAL,
-                prepost=False,  # Don't include pre/post market data
-                auto_adjust=True,
-                back_adjust=False,
-                repair=True
-            )
+            data = self.source.latest(symbol, Config.DATA_INTERVAL)
             
-            if data.empty:
-                error_msg = f"No data returned for {symbol}"
-                logging.warning(error_msg)
-                return FetchResult(
-                    success=False,
-                    symbol=symbol,
-                    error_message=error_msg
-                )
+            return self._result_from_frame(symbol, data)
             
-            # Get the latest candle
-            latest_timestamp = data.index[-1]
-            latest_row = data.iloc[-1]
+        except Exception as e:
+            error_msg = f"Error fetching data for {symbol}: {str(e)}"
+            logging.error(error_msg)
             
-            # Convert to our StockCandle model
-            candle = StockCandle.from_yfinance_row(
+            return FetchResult(
+                success=False,
                 symbol=symbol,
-                timestamp=latest_timestamp.to_pydatetime(),
-                row=latest_row
+                error_message=error_msg
             )
-            
-            logging.info(f"Successfully fetched data for {symbol}: ${candle.close_price:.2f}")
-            
+    
+    def _result_from_frame(self, symbol: str, data: pd.DataFrame) -> FetchResult:
+        """
+        Build a FetchResult from the latest row of a symbol's OHLCV frame
+        """
+        if data is None or data.empty:
+            error_msg = f"No data returned for {symbol}"
+            logging.warning(error_msg)
             return FetchResult(
-                success=True,
+                success=False,
                 symbol=symbol,
-                data=candle
+                error_message=error_msg
             )
+        
+        # Get the latest candle
+        latest_timestamp = data.index[-1]
+        latest_row = data.iloc[-1]
+        
+        # Convert to our StockCandle model
+        candle = StockCandle.from_yfinance_row(
+            symbol=symbol,
+            timestamp=latest_timestamp.to_pydatetime(),
+            row=latest_row
+        )
+        
+        logging.info(f"Successfully fetched data for {symbol}: ${candle.close_price:.2f}")
+        
+        return FetchResult(
+            success=True,
+            symbol=symbol,
+            data=candle
+        )
+    
+    def fetch_new_candles(self, symbol: str, since: Optional[datetime] = None) -> FetchResult:
+        """
+        Fetch every completed candle after `since` (the last stored candle).
+        Without `since`, only the latest completed candle is returned.
+        """
+        try:
+            logging.info(f"Fetching data for {symbol} since {since}")
+            self.rate_limiter.acquire()
+            
+            data = self.source.history(symbol, Config.DATA_INTERVAL, **self._history_window(since))
+            
+            return self._new_candles_result(symbol, data, since)
             
         except Exception as e:
             error_msg = f"Error fetching data for {symbol}: {str(e)}"
@@ -84,12 +122,70 @@ class StockDataFetcher:
                 error_message=error_msg
             )
     
-    def fetch_historical_data(self, symbol: str, days: int = 1) -> List[StockCandle]:
+    def _history_window(self, since: Optional[datetime]) -> Dict[str, Any]:
+        """
+        Build history() window arguments for an incremental fetch.
+        The start is clamped to how far back the provider serves intraday data.
+        """
+        if since is None:
+            return {'period': '1d'}
+        
+        if self.source.intraday_lookback_days is None:
+            return {'start': since}
+        
+        earliest = self.source.now() - pd.Timedelta(days=self.source.intraday_lookback_days)
+        return {'start': max(pd.Timestamp(since), earliest)}
+    
+    def _new_candles_result(self, symbol: str, data: pd.DataFrame,
+                            since: Optional[datetime]) -> FetchResult:
         """
-        Fetch historical 5-minute candles for a symbol
+        Build a FetchResult holding the completed candles newer than `since`
+        """
+        if data is None or data.empty:
+            error_msg = f"No data returned for {symbol}"
+            logging.warning(error_msg)
+            return FetchResult(
+                success=False,
+                symbol=symbol,
+                error_message=error_msg
+            )
+        
+        # Yahoo leaves prices NaN for intervals with no trades
+        data = data.dropna(subset=['Open', 'High', 'Low', 'Close'])
+        
+        # The last row is still forming until its interval has elapsed
+        interval = pd.Timedelta(Config.DATA_INTERVAL.replace('m', 'min'))
+        frame = data[data.index + interval <= self.source.now()]
+        
+        if since is None:
+            frame = frame.iloc[-1:]
+        else:
+            since_ts = pd.Timestamp(since)
+            if since_ts.tzinfo is None and data.index.tz is not None:
+                since_ts = since_ts.tz_localize(data.index.tz)
+            frame = frame[frame.index > since_ts]
+        
+        candles = StockCandle.from_yfinance_frame(symbol, frame)
+        
+        if candles:
+            logging.info(f"Fetched {len(candles)} new candles for {symbol}: ${candles[-1].close_price:.2f}")
+        else:
+            logging.debug(f"No new candles for {symbol} since {since}")
+        
+        return FetchResult(
+            success=True,
+            symbol=symbol,
+            data=candles[-1] if candles else None,
+            candles=candles
+        )
+    
+    def fetch_historical_data(self, symbol: str, days: int = 1, as_batch: bool = False):
+        """
+        Fetch historical 5-minute candles for a symbol.
+        With as_batch, returns a columnar CandleBatch instead of a list of StockCandles.
         """
         try:
-            ticker = yf.Ticker(symbol)  # Let yfinance handle sessions
+            self.rate_limiter.acquire()
             
             # Calculate period
             if days <= 1:
@@ -101,54 +197,194 @@ class StockDataFetcher:
             else:
                 period = "3mo"
             
-            data = ticker.history(
-                period=period,
-                interval=Config.DATA_INTERVAL,
-                prepost=False,
-                auto_adjust=True,
-                back_adjust=False,
-                repair=True
-            )
+            data = self.source.history(symbol, Config.DATA_INTERVAL, period=period)
             
             if data.empty:
                 logging.warning(f"No historical data for {symbol}")
-                return []
+                return CandleBatch.empty(symbol) if as_batch else []
             
-            candles = []
-            for timestamp, row in data.iterrows():
-                candle = StockCandle.from_yfinance_row(
-                    symbol=symbol,
-                    timestamp=timestamp.to_pydatetime(),
-                    row=row
-                )
-                candles.append(candle)
+            data = data.dropna(subset=['Open', 'High', 'Low', 'Close'])
+            logging.info(f"Fetched {len(data)} historical candles for {symbol}")
             
-            logging.info(f"Fetched {len(candles)} historical candles for {symbol}")
-            return candles
+            if as_batch:
+                return CandleBatch.from_frame(symbol, data)
+            return StockCandle.from_yfinance_frame(symbol, data)
             
         except Exception as e:
             logging.error(f"Error fetching historical data for {symbol}: {e}")
-            return []
+            return CandleBatch.empty(symbol) if as_batch else []
     
-    def fetch_all_symbols(self) -> List[FetchResult]:
+    def fetch_range(self, symbol: str, start: datetime, end: datetime) -> CandleBatch:
         """
-        Fetch latest candles for all tracked symbols
+        Fetch candles for a symbol in [start, end) as a CandleBatch.
+        Unlike fetch_historical_data, the source is asked to raise on errors
+        instead of returning an empty frame, and they are not caught here.
+        An empty batch may still mean a failure the source could not tell
+        from a range with no trading.
         """
-        results = []
+        self.rate_limiter.acquire()
+        data = self.source.history(symbol, Config.DATA_INTERVAL, start=start, end=end, raise_errors=True)
         
-        for symbol in self.symbols:
-            result = self.fetch_latest_candle(symbol)
-            results.append(result)
-            
-            # Small delay to avoid rate limiting
-            import time
-            time.sleep(0.1)
+        if data is None or data.empty:
+            return CandleBatch.empty(symbol)
+        
+        data = data.dropna(subset=['Open', 'High', 'Low', 'Close'])
+        return CandleBatch.from_frame(symbol, data)
+    
+    def fetch_all_symbols(self, batched: bool = None) -> List[FetchResult]:
+        """
+        Fetch new candles for all tracked symbols.
+        With a database attached, each symbol is fetched from its last stored
+        candle onwards so skipped or late cycles are filled in.
+        Symbols whose circuit is open are skipped without a request.
+        """
+        if batched is None:
+            batched = Config.BATCH_FETCH_ENABLED
+        
+        symbols = [symbol for symbol in self.symbols if self.circuit_breaker.allow_request(symbol)]
+        allowed = set(symbols)
+        skipped = [
+            FetchResult(
+                success=False,
+                symbol=symbol,
+                error_message=f"Skipped {symbol}: circuit open after repeated failures",
+                skipped=True
+            )
+            for symbol in self.symbols if symbol not in allowed
+        ]
+        
+        since = self.database.get_last_timestamps(symbols) if self.database else {}
+        
+        if batched:
+            # A download costs one request per ticker; keep each within one burst.
+            # Symbols are batched with others last stored on the same day, so
+            # one stale symbol does not widen everyone's download window
+            batch_size = max(1, min(Config.FETCH_BATCH_SIZE, int(self.rate_limiter.capacity)))
+            batches = [group[start:start + batch_size]
+                       for group in self._since_groups(symbols, since)
+                       for start in range(0, len(group), batch_size)]
+            results = []
+            for batch_results in self.run_concurrently(
+                    lambda batch: self.fetch_batch(batch, since), batches):
+                results.extend(batch_results)
+        else:
+            results = self.run_concurrently(
+                lambda symbol: self.fetch_new_candles(symbol, since.get(symbol)), symbols)
+        
+        for result in results:
+            self.record_result(result)
         
         successful = sum(1 for r in results if r.success)
-        logging.info(f"Fetched data for {successful}/{len(self.symbols)} symbols")
+        logging.info(f"Fetched data for {successful}/{len(self.symbols)} symbols"
+                     + (f" ({len(skipped)} skipped, circuit open)" if skipped else ""))
+        
+        return results + skipped
+    
+    def record_result(self, result: FetchResult):
+        """
+        Feed a fetch outcome into the symbol's circuit breaker
+        """
+        if result.skipped:
+            return
+        if result.success:
+            self.circuit_breaker.record_success(result.symbol)
+        else:
+            self.circuit_breaker.record_failure(result.symbol, result.error_message)
+    
+    def run_concurrently(self, func: Callable, items: List[Any]) -> List[Any]:
+        """
+        Run a fetch function over items on the worker pool.
+        Results keep the order of items; request pacing comes from the shared rate limiter.
+        """
+        if len(items) <= 1 or self.max_workers == 1:
+            return [func(item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(func, items))
+    
+    def _since_groups(self, symbols: List[str], since: Dict[str, datetime]) -> List[List[str]]:
+        """
+        Symbols grouped by the day of their last stored candle, so a download
+        window only spans the gap its symbols share. Symbols with nothing
+        stored (fetched by period) form their own group.
+        """
+        groups = {}
+        for symbol in symbols:
+            last = since.get(symbol)
+            groups.setdefault(None if last is None else last.date(), []).append(symbol)
+        return list(groups.values())
+    
+    def fetch_batch(self, symbols: List[str], since: Dict[str, datetime] = None) -> List[FetchResult]:
+        """
+        Fetch new candles for several symbols with a single download call.
+        The provider makes one request per ticker, so the call takes one
+        rate-limit token per symbol; batches larger than the limiter's burst
+        are split into downloads that fit it.
+        Symbols whose last stored candles fall on different days (or that
+        have none) are downloaded separately; within a download the window
+        starts at the oldest last-stored candle.
+        A symbol missing from the combined frame only fails on its own; if the
+        whole request fails, the batch falls back to per-symbol fetches.
+        """
+        if not symbols:
+            return []
+        
+        groups = self._since_groups(symbols, since or {})
+        if len(groups) > 1:
+            return [result for group in groups for result in self.fetch_batch(group, since)]
+        
+        per_download = max(1, int(self.rate_limiter.capacity))
+        if len(symbols) > per_download:
+            return [result for start in range(0, len(symbols), per_download)
+                    for result in self.fetch_batch(symbols[start:start + per_download], since)]
+        
+        since = since or {}
+        starts = [since.get(symbol) for symbol in symbols]
+        window_start = None if None in starts else min(starts)
+        
+        try:
+            logging.info(f"Fetching batch of {len(symbols)} symbols")
+            self.rate_limiter.acquire(len(symbols))
+            data = self.source.download(symbols, Config.DATA_INTERVAL,
+                                        **self._history_window(window_start))
+        except Exception as e:
+            logging.error(f"Batch fetch failed, falling back to per-symbol fetch: {e}")
+            return [self.fetch_new_candles(symbol, since.get(symbol)) for symbol in symbols]
+        
+        results = []
+        for symbol in symbols:
+            try:
+                frame = self._extract_symbol_frame(data, symbol)
+                results.append(self._new_candles_result(symbol, frame, since.get(symbol)))
+            except Exception as e:
+                error_msg = f"Error fetching data for {symbol}: {str(e)}"
+                logging.error(error_msg)
+                results.append(FetchResult(
+                    success=False,
+                    symbol=symbol,
+                    error_message=error_msg
+                ))
         
         return results
     
+    def _extract_symbol_frame(self, data: pd.DataFrame, symbol: str) -> Optional[pd.DataFrame]:
+        """
+        Pull one symbol's OHLCV columns out of a grouped (multi-index) download frame
+        """
+        if data is None or data.empty:
+            return None
+        
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                return None
+            frame = data[symbol]
+        else:
+            # Single-level columns only happen for single-ticker downloads
+            frame = data
+        
+        # Rows where this symbol did not trade are NaN in the combined frame
+        return frame.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    
     def get_market_status(self) -> MarketStatus:
         """
         Check if the Indian market is currently open
@@ -216,16 +452,71 @@ class StockDataFetcher:
         """
         Validate if a stock symbol exists
         """
+        metadata = self.get_symbol_metadata(symbol)
+        return bool(metadata and metadata['is_valid'])
+    
+    def get_symbol_metadata(self, symbol: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get symbol metadata, served from the database cache while it is fresh.
+        Returns None if the metadata could not be fetched.
+        """
+        if self.database and not refresh:
+            cached = self.database.get_symbol_metadata(symbol)
+            if cached and self._is_metadata_fresh(cached):
+                return cached
+        
+        return self._fetch_symbol_metadata(symbol)
+    
+    def _is_metadata_fresh(self, metadata: Dict[str, Any]) -> bool:
+        """Check a cached entry against its TTL (shorter for invalid symbols)"""
+        ttl_hours = Config.METADATA_TTL_HOURS if metadata['is_valid'] else Config.METADATA_NEGATIVE_TTL_HOURS
+        return datetime.now() - metadata['fetched_at'] < timedelta(hours=ttl_hours)
+    
+    def _fetch_symbol_metadata(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch metadata from the data source and cache it.
+        Symbols the source does not know are cached as invalid; request
+        errors are not cached so the next lookup retries.
+        """
         try:
-            ticker = yf.Ticker(symbol)  # Let yfinance handle sessions
-            info = ticker.info
-            
-            # Check if we got valid info
-            return 'symbol' in info or 'shortName' in info
-            
+            self.rate_limiter.acquire()
+            info = self.source.info(symbol) or {}
         except Exception as e:
-            logging.warning(f"Symbol validation failed for {symbol}: {e}")
-            return False
+            logging.warning(f"Symbol metadata lookup failed for {symbol}: {e}")
+            return None
+        
+        metadata = {
+            'symbol': symbol,
+            'is_valid': 'symbol' in info or 'shortName' in info,
+            'name': info.get('longName', 'N/A'),
+            'sector': info.get('sector', 'N/A'),
+            'industry': info.get('industry', 'N/A'),
+            'market_cap': info.get('marketCap', 0) or 0,
+            'currency': info.get('currency', 'USD'),
+            'fetched_at': datetime.now()
+        }
+        
+        if self.database:
+            self.database.save_symbol_metadata(metadata)
+        return metadata
+    
+    def warm_metadata_cache(self, symbols: List[str] = None) -> int:
+        """
+        Fetch metadata for every symbol that is missing or stale in the cache,
+        on the worker pool. Returns the number of symbols fetched.
+        """
+        symbols = symbols if symbols is not None else self.symbols
+        cached = self.database.get_symbol_metadata_many(symbols) if self.database else {}
+        
+        stale = [
+            symbol for symbol in symbols
+            if symbol not in cached or not self._is_metadata_fresh(cached[symbol])
+        ]
+        if stale:
+            logging.info(f"Warming metadata cache for {len(stale)}/{len(symbols)} symbols")
+            self.run_concurrently(self._fetch_symbol_metadata, stale)
+        
+        return len(stale)
     
     def add_symbol(self, symbol: str) -> bool:
         """
@@ -246,6 +537,16 @@ class StockDataFetcher:
             logging.error(f"Invalid symbol: {symbol}")
             return False
     
+    def add_symbols(self, symbols: List[str]) -> Dict[str, bool]:
+        """
+        Add many symbols at once. Metadata for all of them is fetched
+        concurrently first, so validation is served from the cache.
+        """
+        symbols = list(dict.fromkeys(symbol.upper().strip() for symbol in symbols if symbol.strip()))
+        self.warm_metadata_cache([symbol for symbol in symbols if symbol not in self.symbols])
+        
+        return {symbol: self.add_symbol(symbol) for symbol in symbols}
+    
     def remove_symbol(self, symbol: str) -> bool:
         """
         Remove a symbol from tracking
@@ -265,19 +566,11 @@ class StockDataFetcher:
         """
         Get basic information about a symbol
         """
-        try:
-            ticker = yf.Ticker(symbol)  # Let yfinance handle sessions
-            info = ticker.info
-            
-            return {
-                'symbol': symbol,
-                'name': info.get('longName', 'N/A'),
-                'sector': info.get('sector', 'N/A'),
-                'industry': info.get('industry', 'N/A'),
-                'market_cap': info.get('marketCap', 0),
-                'currency': info.get('currency', 'USD')
-            }
-            
-        except Exception as e:
-            logging.error(f"Error getting info for {symbol}: {e}")
-            return {'symbol': symbol, 'error': str(e)}
\ No newline at end of file
+        metadata = self.get_symbol_metadata(symbol)
+        if metadata is None:
+            return {'symbol': symbol, 'error': f"Could not fetch info for {symbol}"}
+        
+        return {
+            key: metadata[key]
+            for key in ('symbol', 'name', 'sector', 'industry', 'market_cap', 'currency')
+        }
\ No newline at end of file
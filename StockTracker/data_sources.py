@@ -0,0 +1,319 @@
+# data_sources.py
+# Market data providers behind a common interface
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Protocol
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import Config
+from http_session import get_http_session
+
+class DataSource(Protocol):
+    """
+    Interface the fetcher uses for all market data.
+    Frames have a tz-aware DatetimeIndex and Open/High/Low/Close/Volume columns.
+    """
+
+    # Days of intraday history the provider serves (None = unlimited)
+    intraday_lookback_days: Optional[int]
+
+    def now(self) -> pd.Timestamp:
+        """Current time as seen by this source (exchange timezone)"""
+        ...
+
+    def history(self, symbol: str, interval: str, period: Optional[str] = None,
+                start: Optional[datetime] = None, end: Optional[datetime] = None,
+                raise_errors: bool = False) -> pd.DataFrame:
+        """
+        OHLCV candles for one symbol, by period or by start/end window.
+        With raise_errors, a failed request raises instead of returning an
+        empty frame, so it can be told apart from a window with no trading.
+        """
+        ...
+
+    def latest(self, symbol: str, interval: str) -> pd.DataFrame:
+        """Candles for the current (or most recent) trading session"""
+        ...
+
+    def download(self, symbols: List[str], interval: str, period: Optional[str] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+        """OHLCV candles for many symbols, columns grouped by symbol (multi-index)"""
+        ...
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        """Symbol metadata; an empty dict means the symbol is unknown"""
+        ...
+
+    def warm_up(self, symbols: List[str]):
+        """Open connections and negotiate provider state ahead of the first real fetch"""
+        ...
+
+class YFinanceSource:
+    """
+    Live Yahoo Finance data via yfinance
+    """
+
+    name = 'yfinance'
+    intraday_lookback_days = Config.INTRADAY_LOOKBACK_DAYS
+
+    def __init__(self, session=None):
+        # One keep-alive session for every Ticker and download, so TLS
+        # handshakes and the cookie/crumb exchange happen once, not per call
+        self.session = session or get_http_session()
+
+    def now(self) -> pd.Timestamp:
+        return pd.Timestamp.now(tz=Config.MARKET_TIMEZONE)
+
+    def _ticker(self, symbol: str):
+        """Create ticker object with error handling for different yfinance versions"""
+        try:
+            return yf.Ticker(symbol, session=self.session)
+        except Exception as e:
+            if "curl_cffi" in str(e):
+                # Session type not accepted by this yfinance version; let it manage its own
+                return yf.Ticker(symbol)
+            raise
+
+    def history(self, symbol, interval, period=None, start=None, end=None, raise_errors=False):
+        return self._ticker(symbol).history(
+            interval=interval,
+            **_window_kwargs(period, start, end),
+            prepost=False,  # Don't include pre/post market data
+            auto_adjust=True,
+            back_adjust=False,
+            repair=True,
+            # yfinance logs request errors and returns an empty frame unless asked
+            # (Yahoo also answers a window without candles with an error)
+            raise_errors=raise_errors
+        )
+
+    def latest(self, symbol, interval):
+        return self.history(symbol, interval, period="1d")
+
+    def download(self, symbols, interval, period=None, start=None, end=None):
+        return yf.download(
+            tickers=symbols,
+            interval=interval,
+            **_window_kwargs(period, start, end),
+            group_by='ticker',
+            prepost=False,
+            auto_adjust=True,
+            back_adjust=False,
+            repair=True,
+            threads=True,
+            progress=False,
+            session=self.session
+        )
+
+    def info(self, symbol):
+        return self._ticker(symbol).info
+
+    def warm_up(self, symbols):
+        # A one-candle history request fetches the cookie and crumb and
+        # leaves a connection open in the pool
+        if symbols:
+            self.history(symbols[0], Config.DATA_INTERVAL, period="1d")
+
+class ReplaySource:
+    """
+    Serves recorded OHLCV from local files (<SYMBOL>.csv or <SYMBOL>.parquet).
+
+    A replay clock starts at the first recorded candle and advances `speed`
+    times faster than wall time; only candles that have "happened" on that
+    clock are served. speed=0 serves everything up to the present. `latency` adds a
+    fixed delay per request to mimic network round trips.
+    """
+
+    name = 'replay'
+    intraday_lookback_days = None
+
+    def __init__(self, directory: str, speed: float = 1.0, latency: float = 0.0,
+                 start_at: Optional[datetime] = None):
+        self.directory = directory
+        self.speed = speed
+        self.latency = latency
+        self.requests = 0
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._clock_start = _as_timestamp(start_at) if start_at is not None else None
+
+    def _path(self, symbol: str) -> Optional[str]:
+        for extension in ('.parquet', '.csv'):
+            path = os.path.join(self.directory, symbol + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, symbol: str) -> Optional[pd.DataFrame]:
+        """Load and cache a symbol's recording"""
+        with self._lock:
+            if symbol in self._frames:
+                return self._frames[symbol]
+
+        path = self._path(symbol)
+        frame = None
+        if path is not None:
+            if path.endswith('.parquet'):
+                frame = pd.read_parquet(path)
+            else:
+                frame = pd.read_csv(path, index_col=0)
+            frame.index = pd.to_datetime(frame.index, utc=True).tz_convert(Config.MARKET_TIMEZONE)
+            frame = frame.sort_index()
+
+        with self._lock:
+            self._frames[symbol] = frame
+            if frame is not None and not frame.empty and self._clock_start is None:
+                self._clock_start = frame.index[0]
+        return frame
+
+    def preload(self, symbols: List[str]):
+        """Load recordings up front so file parsing stays out of timings"""
+        for symbol in symbols:
+            self._load(symbol)
+
+    def _simulate_request(self, count: int = 1):
+        # `count` requests issued in parallel: counted each, waited on once
+        with self._lock:
+            self.requests += count
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def now(self) -> pd.Timestamp:
+        if not self.speed or self._clock_start is None:
+            return pd.Timestamp.now(tz=Config.MARKET_TIMEZONE)
+        elapsed = (time.monotonic() - self._started) * self.speed
+        return self._clock_start + pd.Timedelta(seconds=elapsed)
+
+    def _window(self, frame: pd.DataFrame, period, start, end) -> pd.DataFrame:
+        """Cut a recording down to what history() would return right now"""
+        frame = frame[frame.index <= self.now()]
+        if end is not None:
+            frame = frame[frame.index < _as_timestamp(end)]
+
+        if start is not None:
+            return frame[frame.index >= _as_timestamp(start)]
+        if period and period != 'max' and not frame.empty:
+            if period.endswith('mo'):
+                cutoff = frame.index[-1] - pd.Timedelta(days=30 * int(period[:-2]))
+                return frame[frame.index > cutoff]
+            if period.endswith('d'):
+                # Trading days, like yfinance
+                dates = np.unique(frame.index.date)[-int(period[:-1]):]
+                return frame[np.isin(frame.index.date, dates)]
+        return frame
+
+    def history(self, symbol, interval, period=None, start=None, end=None, raise_errors=False):
+        self._simulate_request()
+        frame = self._load(symbol)
+        if frame is None:
+            if raise_errors:
+                raise ValueError(f"No recording for {symbol} in {self.directory}")
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        return self._window(frame, period, start, end)
+
+    def latest(self, symbol, interval):
+        return self.history(symbol, interval, period="1d")
+
+    def download(self, symbols, interval, period=None, start=None, end=None):
+        # yfinance fetches every ticker of a download separately (threads=True)
+        self._simulate_request(len(symbols))
+        frames = {}
+        for symbol in symbols:
+            frame = self._load(symbol)
+            if frame is not None:
+                frames[symbol] = self._window(frame, period, start, end)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def info(self, symbol):
+        self._simulate_request()
+        if self._load(symbol) is None:
+            return {}
+        return {'symbol': symbol, 'shortName': symbol, 'longName': symbol, 'currency': 'INR'}
+
+    def warm_up(self, symbols):
+        self.preload(symbols)
+
+def _as_timestamp(value) -> pd.Timestamp:
+    """Convert a window bound to a tz-aware timestamp in the market timezone"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize(Config.MARKET_TIMEZONE)
+    return timestamp.tz_convert(Config.MARKET_TIMEZONE)
+
+def _window_kwargs(period, start, end) -> Dict[str, Any]:
+    """history()/download() window arguments, dropping unset ones"""
+    kwargs = {'start': start, 'end': end} if start is not None else {'period': period or '1d'}
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+def write_synthetic_replay(directory: str, symbols: List[str], days: int = 5,
+                           start_date: datetime = None, fmt: str = 'csv', seed: int = 0) -> int:
+    """
+    Write random-walk 5-minute recordings for a list of symbols, one file per
+    symbol, covering `days` weekdays of market hours. Returns rows written per symbol.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start_date = start_date or datetime(2025, 1, 6)
+
+    sessions = []
+    day = start_date
+    while len(sessions) < days:
+        if day.weekday() in Config.TRADING_DAYS:
+            session = pd.date_range(
+                datetime.combine(day.date(), Config.MARKET_OPEN_TIME),
+                datetime.combine(day.date(), Config.MARKET_CLOSE_TIME),
+                freq='5min', inclusive='left'
+            )
+            sessions.append(session)
+        day += timedelta(days=1)
+    index = sessions[0].append(sessions[1:]).tz_localize(Config.MARKET_TIMEZONE)
+    rows = len(index)
+
+    rng = np.random.default_rng(seed)
+    for symbol in symbols:
+        base = rng.uniform(100, 5000)
+        close = np.round(base + (base * 0.001 * rng.standard_normal(rows)).cumsum(), 2)
+        open_ = np.round(close + rng.normal(0, base * 0.0005, rows), 2)
+        spread = np.round(np.abs(rng.normal(0, base * 0.001, rows)), 2)
+        frame = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': rng.integers(1_000, 500_000, rows)
+        }, index=index)
+        frame.index.name = 'Datetime'
+
+        path = os.path.join(directory, symbol + ('.parquet' if fmt == 'parquet' else '.csv'))
+        if fmt == 'parquet':
+            frame.to_parquet(path)
+        else:
+            frame.to_csv(path)
+
+    logging.info(f"Wrote {rows} synthetic candles for {len(symbols)} symbols to {directory}")
+    return rows
+
+def create_data_source(name: str = None) -> DataSource:
+    """
+    Create the data source named in the configuration
+    """
+    name = name or Config.DATA_SOURCE
+
+    if name == 'yfinance':
+        return YFinanceSource()
+    if name == 'replay':
+        return ReplaySource(
+            Config.REPLAY_DATA_DIR,
+            speed=Config.REPLAY_SPEED,
+            latency=Config.REPLAY_LATENCY_SECONDS
+        )
+    raise ValueError(f"Unknown data source: {name}")
@@ -1,12 +1,162 @@
 # database.py
 # SQLite database operations for Stock Tracker
 
+import os
 import sqlite3
+import threading
 import logging
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import numpy as np
+from itertools import chain, repeat
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Dict, Any, Set, Tuple
 from config import Config
-from models import StockCandle, AppStatus
+from db_connection import get_connection_manager
+from aggregator import interval_to_timedelta
+from models import (StockCandle, CandleBatch, AggregatedBar, AppStatus, SaveResult, PAISE_PER_RUPEE,
+                    PAISE_PER_MONEY_FLOW_UNIT, to_paise, avg_price_paise, net_money_flow,
+                    net_money_flow_chain, DailySummary, to_epoch, from_epoch, trade_date,
+                    from_trade_date, trade_date_bounds, market_now)
+
+# Schema version stored in PRAGMA user_version. Databases created before
+# versioning report 0 and are brought up to date by the migrations below.
+SCHEMA_VERSION = 8
+
+# Candles copied per transaction by the version 2 migration
+MIGRATION_BATCH_SIZE = 50000
+
+# Candles live in one table per month of trade_date (stock_candles_YYYYMM),
+# keyed by (symbol_id, timestamp) and read through the stock_candles view
+PARTITION_GLOB = 'stock_candles_[0-9][0-9][0-9][0-9][0-9][0-9]'
+
+def partition_name(day: int) -> str:
+    """Candle table holding a trade_date (YYYYMMDD)"""
+    return f"stock_candles_{day // 100}"
+
+def partition_bounds(table: str) -> Tuple[int, int]:
+    """Epoch seconds [start, end) of the month a candle table holds"""
+    month = int(table[-6:])
+    next_month = month + 89 if month % 100 == 12 else month + 1
+    return trade_date_bounds(month * 100 + 1)[0], trade_date_bounds(next_month * 100 + 1)[0]
+
+def bar_key(value: datetime) -> str:
+    """aggregated_bars timestamp of a bar start: ISO market time with its offset"""
+    return from_epoch(to_epoch(value)).isoformat()
+
+def day_runs(days) -> List[Tuple[int, int]]:
+    """(first, last) trade_dates of each run of consecutive calendar days"""
+    runs = []
+    for day in sorted(days):
+        if runs and from_trade_date(day) - from_trade_date(runs[-1][1]) == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+# Bars that candles are rolled up into before their month is dropped:
+# 1h bars are kept for KEEP_HOURLY_MONTHS, daily bars forever
+ROLLUP_RESOLUTIONS = ('1h', '1d')
+
+class NetMFState:
+    """
+    Running Net MF state for each symbol: timestamp, trading day, average
+    price and Net MF of its latest stored candle. A candle that extends a
+    symbol's chain takes its previous values from here instead of the
+    database; a candle on a later trading day starts a fresh chain, so older
+    days drop out on rollover. Loaded from the database on first use (after
+    a restart) and updated only after an insert commits. Reloaded when
+    another connection (e.g. a backfill or Net MF recompute run in a second
+    process) has stored, removed or rewritten candles since, which bumps
+    the app_status generation.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()  # Held by writers from computing Net MF through commit
+        self.loaded = False
+        self.generation: Optional[int] = None  # app_status generation this state matches
+        self._latest: Dict[str, Tuple[int, int, int, int]] = {}
+    
+    def load(self, cursor):
+        """Read every symbol's latest candle (one query, one seek per symbol)"""
+        cursor.execute('''
+            SELECT c.symbol, c.timestamp, c.trade_date, c.avg_price, c.net_mf
+            FROM symbol_stats s
+            JOIN stock_candles c
+            ON c.symbol = s.symbol AND c.timestamp = s.last_timestamp
+        ''')
+        self._latest = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+        cursor.execute('SELECT generation FROM app_status WHERE id = 1')
+        self.generation = cursor.fetchone()[0]
+        self.loaded = True
+        logging.debug(f"Loaded Net MF state for {len(self._latest)} symbols")
+    
+    def is_current(self, cursor) -> bool:
+        """
+        Whether the state is loaded and no other connection has stored,
+        removed or rewritten candles since (one read of app_status)
+        """
+        if not self.loaded:
+            return False
+        cursor.execute('SELECT generation FROM app_status WHERE id = 1')
+        return cursor.fetchone()[0] == self.generation
+    
+    def committed(self, generation: int):
+        """
+        Note a commit of this process that bumped the generation to
+        `generation`. A state that was already behind stays stale.
+        """
+        if self.loaded and self.generation == generation - 1:
+            self.generation = generation
+    
+    def latest_timestamp(self, symbol: str) -> Optional[int]:
+        """Epoch time of the symbol's latest stored candle"""
+        latest = self._latest.get(symbol)
+        return latest[0] if latest else None
+    
+    def previous(self, symbol: str, day: int, timestamp: int):
+        """
+        (known, previous): previous is the (avg_price, net_mf) a candle at
+        `timestamp` chains from, or None when it opens its trading day.
+        known is False for candles at or before the symbol's latest stored
+        candle, whose predecessor has to be looked up in the database.
+        """
+        latest = self._latest.get(symbol)
+        if latest is None:
+            return True, None
+        latest_timestamp, latest_day, avg_price, net_mf = latest
+        if timestamp <= latest_timestamp:
+            return False, None
+        if day != latest_day:
+            return True, None
+        return True, (avg_price, net_mf)
+    
+    def record(self, symbol: str, timestamp: int, day: int, avg_price: int, net_mf: int):
+        """Note a committed candle, or a recomputed Net MF of the latest one"""
+        latest = self._latest.get(symbol)
+        if latest is None or timestamp >= latest[0]:
+            self._latest[symbol] = (timestamp, day, avg_price, net_mf)
+    
+    def reset(self):
+        """Forget everything; reloaded on the next write"""
+        with self.lock:
+            self._latest = {}
+            self.generation = None
+            self.loaded = False
+
+_shared_states: Dict[Tuple[str, str], Any] = {}
+_shared_states_lock = threading.Lock()
+
+def get_shared_state(db_path: str, name: str, factory):
+    """
+    Get a piece of process-wide in-memory state for a database file (Net
+    MF state, known partitions, symbol ids), shared like its connections so
+    every StockDatabase instance sees the same writes
+    """
+    key = (os.path.abspath(db_path), name)
+    
+    with _shared_states_lock:
+        if key not in _shared_states:
+            _shared_states[key] = factory()
+        return _shared_states[key]
 
 class StockDatabase:
     """
@@ -16,49 +166,165 @@ class StockDatabase:
     def __init__(self):
         self.db_path = Config.DATABASE_PATH
         Config.ensure_data_directory()
+        self.connections = get_connection_manager(self.db_path)
+        self.net_mf_state = get_shared_state(self.db_path, 'net_mf', NetMFState)
+        self.partitions: Set[str] = get_shared_state(self.db_path, 'partitions', set)  # Monthly tables known to exist
+        self.symbol_ids: Dict[str, int] = get_shared_state(self.db_path, 'symbol_ids', dict)
         self.init_database()
         
+    def _connect(self) -> sqlite3.Connection:
+        """
+        This thread's long-lived connection. Used as `with self._connect() as conn:`
+        it commits on success and rolls back on error, without closing.
+        """
+        return self.connections.connection()
+    
+    def bulk_writes(self):
+        """Context for large write workloads (backfill) with relaxed fsync"""
+        return self.connections.synchronous(Config.DB_BULK_SYNCHRONOUS)
+    
+    def close(self):
+        """Close all connections to this database (on shutdown)"""
+        self.connections.close_all()
+        
     def init_database(self):
-        """Initialize the database and create tables"""
+        """Initialize the database, migrating older schemas, and create tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                #cursor.execute('DROP TABLE IF EXISTS stock_candles')
-                # Create stock_candles table
+                
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'stock_candles'")
+                existing = cursor.fetchone() is not None
+                cursor.execute('PRAGMA user_version')
+                version = cursor.fetchone()[0]
+                
+                if not existing:
+                    # Lets dropped partitions hand space back; only takes
+                    # effect before the first table is created, and in WAL
+                    # mode only through VACUUM (instant on an empty file)
+                    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                    cursor.execute('VACUUM')
+                
+                if existing and version < SCHEMA_VERSION:
+                    self._migrate(conn, version)
+                    self._reclaim_space(conn)
+                
+                # Create symbols table, the dimension behind candles' symbol_id
                 cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS stock_candles (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    CREATE TABLE IF NOT EXISTS symbols (
+                        id INTEGER PRIMARY KEY,
+                        symbol TEXT NOT NULL UNIQUE
+                    )
+                ''')
+                
+                # Create this month's candle table and the stock_candles view
+                self._ensure_partitions(conn, [trade_date(datetime.now())])
+                
+                # Create symbol_metadata table caching data source lookups
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS symbol_metadata (
+                        symbol TEXT PRIMARY KEY,
+                        is_valid INTEGER NOT NULL,
+                        name TEXT,
+                        sector TEXT,
+                        industry TEXT,
+                        market_cap INTEGER,
+                        currency TEXT,
+                        fetched_at TEXT NOT NULL
+                    )
+                ''')
+                
+                # Create backfill_checkpoints table recording finished backfill chunks
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                        symbol TEXT NOT NULL,
+                        chunk_start TEXT NOT NULL,
+                        chunk_end TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        rows_fetched INTEGER DEFAULT 0,
+                        updated_at TEXT NOT NULL,
+                        PRIMARY KEY (symbol, chunk_start)
+                    )
+                ''')
+                
+                # Create aggregated_bars table holding locally built coarser resolutions
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS aggregated_bars (
                         symbol TEXT NOT NULL,
+                        resolution TEXT NOT NULL,
                         timestamp TEXT NOT NULL,
                         open_price REAL NOT NULL,
                         high_price REAL NOT NULL,
                         low_price REAL NOT NULL,
                         close_price REAL NOT NULL,
                         volume INTEGER NOT NULL,
-                        avg_price REAL NOT NULL,
-                        money_flow REAL NOT NULL,
-                        net_mf REAL NOT NULL,
-                        created_at TEXT NOT NULL,
-                        UNIQUE(symbol, timestamp)
+                        candle_count INTEGER NOT NULL,
+                        net_mf REAL,
+                        PRIMARY KEY (symbol, resolution, timestamp)
+                    )
+                ''')
+                
+                # Retention deletes bars by resolution and age
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_aggregated_bars_resolution 
+                    ON aggregated_bars(resolution, timestamp)
+                ''')
+                
+                # Create daily_summary table, one row per symbol and trading day
+                # kept up to date by save_candles (prices and Net MF in paise)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS daily_summary (
+                        symbol TEXT NOT NULL,
+                        trade_date INTEGER NOT NULL,
+                        open_price INTEGER NOT NULL,
+                        high_price INTEGER NOT NULL,
+                        low_price INTEGER NOT NULL,
+                        close_price INTEGER NOT NULL,
+                        volume INTEGER NOT NULL,
+                        net_mf INTEGER NOT NULL,
+                        candle_count INTEGER NOT NULL,
+                        first_timestamp INTEGER NOT NULL,
+                        last_timestamp INTEGER NOT NULL,
+                        PRIMARY KEY (symbol, trade_date)
                     )
                 ''')
                 
-                # Create index for faster queries
                 cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_symbol_timestamp 
-                    ON stock_candles(symbol, timestamp)
+                    CREATE INDEX IF NOT EXISTS idx_daily_summary_trade_date 
+                    ON daily_summary (trade_date)
                 ''')
                 
-                # Create app_status table for tracking application state
+                # Create symbol_stats table, candle count and time span per symbol
+                # kept up to date by save_candles and cleanup
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS symbol_stats (
+                        symbol TEXT PRIMARY KEY,
+                        candle_count INTEGER NOT NULL,
+                        first_timestamp INTEGER NOT NULL,
+                        last_timestamp INTEGER NOT NULL
+                    )
+                ''')
+                
+                # Create app_status table for tracking application state;
+                # row 1 holds the maintained candle total and the generation
+                # bumped by every commit that stores, removes or rewrites candles
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS app_status (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         last_update TEXT NOT NULL,
                         total_records INTEGER DEFAULT 0,
                         last_fetch_time TEXT,
-                        errors_count INTEGER DEFAULT 0
+                        errors_count INTEGER DEFAULT 0,
+                        generation INTEGER NOT NULL DEFAULT 0
                     )
                 ''')
+                cursor.execute('''
+                    INSERT OR IGNORE INTO app_status (id, last_update, total_records)
+                    VALUES (1, ?, 0)
+                ''', (datetime.now().isoformat(),))
+                
+                if not existing:
+                    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
                 
                 conn.commit()
                 logging.info("Database initialized successfully")
@@ -67,125 +333,1080 @@ class StockDatabase:
             logging.error(f"Database initialization error: {e}")
             raise
     
+    def _create_partition(self, cursor, table: str):
+        """
+        Create one month's candle table. Prices, avg_price, money_flow and
+        net_mf are integer paise so sums are exact. timestamp and created_at
+        are epoch seconds; trade_date is the market-local date as YYYYMMDD.
+        Rows are clustered by (symbol_id, timestamp) in a single B-tree, so
+        a symbol's candles are stored together in time order and trading
+        days are read as timestamp ranges.
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                symbol_id INTEGER NOT NULL,
+                timestamp INTEGER NOT NULL,
+                trade_date INTEGER NOT NULL,
+                open_price INTEGER NOT NULL,
+                high_price INTEGER NOT NULL,
+                low_price INTEGER NOT NULL,
+                close_price INTEGER NOT NULL,
+                volume INTEGER NOT NULL,
+                avg_price INTEGER NOT NULL,
+                money_flow INTEGER NOT NULL,
+                net_mf INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (symbol_id, timestamp)
+            ) WITHOUT ROWID
+        ''')
+    
+    def _candle_partitions(self, cursor) -> List[str]:
+        """Names of the monthly candle tables, oldest first"""
+        cursor.execute('''
+            SELECT name FROM sqlite_master 
+            WHERE type = 'table' AND name GLOB ?
+            ORDER BY name
+        ''', (PARTITION_GLOB,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _create_candles_view(self, cursor):
+        """
+        (Re)create the stock_candles view over every monthly table. SQLite
+        pushes symbol/time filters into each table's indexes and merges
+        ordered results, so reads through the view stay index seeks.
+        """
+        partitions = self._candle_partitions(cursor)
+        if not partitions:
+            partitions = [partition_name(trade_date(datetime.now()))]
+            self._create_partition(cursor, partitions[0])
+        
+        cursor.execute('DROP VIEW IF EXISTS stock_candles')
+        cursor.execute('CREATE VIEW stock_candles AS ' + ' UNION ALL '.join(
+            f'SELECT s.symbol, c.symbol_id, c.timestamp, c.trade_date, c.open_price, c.high_price, '
+            f'c.low_price, c.close_price, c.volume, c.avg_price, c.money_flow, c.net_mf, c.created_at '
+            f'FROM {table} c JOIN symbols s ON s.id = c.symbol_id'
+            for table in partitions))
+        self.partitions.clear()
+        self.partitions.update(partitions)
+    
+    def _ensure_partitions(self, conn, days):
+        """
+        Create the monthly tables for some trade_dates if they are missing,
+        and add them to the view. Runs in the caller's transaction if one is
+        open, otherwise in its own.
+        """
+        cursor = conn.cursor()
+        if not self.partitions:
+            self.partitions.update(self._candle_partitions(cursor))
+        
+        missing = {partition_name(day) for day in days} - self.partitions
+        if not missing:
+            return
+        
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for table in sorted(missing):
+                self._create_partition(cursor, table)
+            self._create_candles_view(cursor)
+            if own_transaction:
+                conn.commit()
+        except sqlite3.Error:
+            self.partitions.clear()
+            if own_transaction:
+                conn.rollback()
+            raise
+        logging.info(f"Created candle partitions: {', '.join(sorted(missing))}")
+    
+    def _expired_partitions(self, conn, days) -> Set[str]:
+        """
+        Monthly tables for some trade_dates that retention has dropped: the
+        table is gone but daily_summary still holds the month. Candles
+        re-fetched for such a month (e.g. by a backfill reaching back past
+        the cutoff) are skipped, so its days are not counted twice.
+        """
+        cursor = conn.cursor()
+        if not self.partitions:
+            self.partitions.update(self._candle_partitions(cursor))
+        
+        expired = set()
+        for table in {partition_name(day) for day in days} - self.partitions:
+            month = int(table[-6:]) * 100
+            cursor.execute('''
+                SELECT 1 FROM daily_summary
+                WHERE trade_date > ? AND trade_date < ? LIMIT 1
+            ''', (month, month + 100))
+            if cursor.fetchone() is not None:
+                expired.add(table)
+        return expired
+    
+    def _ensure_symbols(self, conn, symbols):
+        """
+        Make sure symbols have ids in the symbols table (cached in memory).
+        Runs in the caller's transaction if one is open, otherwise in its own.
+        """
+        cursor = conn.cursor()
+        if not self.symbol_ids:
+            cursor.execute('SELECT symbol, id FROM symbols')
+            self.symbol_ids.update(cursor.fetchall())
+        
+        missing = sorted(set(symbols) - self.symbol_ids.keys())
+        if not missing:
+            return
+        
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.executemany('INSERT OR IGNORE INTO symbols (symbol) VALUES (?)',
+                               [(symbol,) for symbol in missing])
+            cursor.execute(f"SELECT symbol, id FROM symbols WHERE symbol IN ({', '.join('?' * len(missing))})",
+                           missing)
+            ids = dict(cursor.fetchall())
+            if own_transaction:
+                conn.commit()
+        except sqlite3.Error:
+            if own_transaction:
+                conn.rollback()
+            raise
+        self.symbol_ids.update(ids)
+    
+    def _symbol_id(self, cursor, symbol: str) -> Optional[int]:
+        """id of a stored symbol, or None"""
+        if symbol not in self.symbol_ids:
+            cursor.execute('SELECT id FROM symbols WHERE symbol = ?', (symbol,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            self.symbol_ids[symbol] = row[0]
+        return self.symbol_ids[symbol]
+    
+    def _reclaim_space(self, conn):
+        """
+        After migrations: switch an existing database to incremental
+        auto_vacuum (rewrites the file once), or release free pages
+        """
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            conn.executescript('PRAGMA incremental_vacuum;')
+            return
+        logging.info("Enabling incremental auto_vacuum (one-time VACUUM)")
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    
+    def _migrate(self, conn, version: int):
+        """
+        Apply schema migrations after `version`. Each migration ends inside an
+        open transaction, which commits together with the new user_version.
+        """
+        migrations = {
+            1: self._migrate_prices_to_paise,
+            2: self._migrate_timestamps_to_epoch,
+            3: self._migrate_daily_summary,
+            4: self._migrate_symbol_stats,
+            5: self._migrate_partition_candles,
+            6: self._migrate_clustered_candles,
+            7: self._migrate_bar_net_mf,
+            8: self._migrate_status_generation,
+        }
+        
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            logging.info(f"Migrating database to schema version {target}")
+            try:
+                migrations[target](conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+    
+    def _migrate_prices_to_paise(self, conn):
+        """
+        Version 1: REAL rupee prices (with avg_price and money flow rounded to
+        whole units) become integer paise. avg_price, money_flow and net_mf are
+        recomputed exactly from the stored prices and volumes.
+        
+        This changes the unit of money flow and Net MF. The last legacy
+        save_candle stored avg * (volume // 1000) / 1000, i.e. millions of
+        rupees (rows from older versions used avg * volume / 1000). All rows
+        are now read back in thousands of rupees like StockCandle.money_flow,
+        so most migrated values come out about 1000 times larger.
+        """
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute('''
+            CREATE TABLE stock_candles_v1 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                open_price INTEGER NOT NULL,
+                high_price INTEGER NOT NULL,
+                low_price INTEGER NOT NULL,
+                close_price INTEGER NOT NULL,
+                volume INTEGER NOT NULL,
+                avg_price INTEGER NOT NULL,
+                money_flow INTEGER NOT NULL,
+                net_mf INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                UNIQUE(symbol, timestamp)
+            )
+        ''')
+        
+        cursor.execute('''
+            SELECT symbol, timestamp, open_price, high_price, low_price,
+                   close_price, volume, created_at
+            FROM stock_candles
+            ORDER BY symbol, timestamp
+        ''')
+        
+        rows = []
+        previous = {}  # (symbol, day) -> (avg_price, net_mf) of the last candle
+        for symbol, timestamp, open_price, high_price, low_price, close_price, volume, created_at in cursor.fetchall():
+            open_price, high_price, low_price, close_price = (
+                to_paise(price) for price in (open_price, high_price, low_price, close_price))
+            volume = int(volume)
+            avg_price = avg_price_paise(high_price, low_price)
+            money_flow = avg_price * volume
+            
+            day = (symbol, timestamp[:10])
+            net_mf = net_money_flow(money_flow, avg_price, open_price, close_price, previous.get(day))
+            previous[day] = (avg_price, net_mf)
+            
+            rows.append((symbol, timestamp, open_price, high_price, low_price, close_price,
+                         volume, avg_price, money_flow, net_mf, created_at))
+        
+        cursor.executemany('''
+            INSERT INTO stock_candles_v1 
+            (symbol, timestamp, open_price, high_price, low_price, 
+            close_price, volume, avg_price, money_flow, net_mf, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        
+        cursor.execute('DROP TABLE stock_candles')
+        cursor.execute('ALTER TABLE stock_candles_v1 RENAME TO stock_candles')
+        cursor.execute('DROP INDEX IF EXISTS idx_symbol_timestamp')
+        cursor.execute('CREATE INDEX idx_symbol_timestamp ON stock_candles(symbol, timestamp)')
+        logging.info(f"Converted {len(rows)} candles to integer paise; money flow and Net MF "
+                     f"are now in thousands of rupees (mostly millions before)")
+    
+    def _migrate_timestamps_to_epoch(self, conn):
+        """
+        Version 2: ISO text timestamps become epoch seconds plus a trade_date
+        column. Rows are copied in id order, one short transaction per batch,
+        so the database stays usable meanwhile and an interrupted migration
+        picks up from the last copied id. Only the final swap is exclusive.
+        Text without an offset (every created_at) is converted by to_epoch,
+        as market time, the same as candles saved since.
+        """
+        conn.create_function('to_epoch', 1, lambda text: to_epoch(datetime.fromisoformat(text)),
+                             deterministic=True)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stock_candles_v2 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                trade_date INTEGER NOT NULL,
+                open_price INTEGER NOT NULL,
+                high_price INTEGER NOT NULL,
+                low_price INTEGER NOT NULL,
+                close_price INTEGER NOT NULL,
+                volume INTEGER NOT NULL,
+                avg_price INTEGER NOT NULL,
+                money_flow INTEGER NOT NULL,
+                net_mf INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                UNIQUE(symbol, timestamp)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_symbol_trade_date 
+            ON stock_candles_v2(symbol, trade_date, timestamp)
+        ''')
+        conn.commit()
+        
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM stock_candles_v2')
+        last_id = cursor.fetchone()[0]
+        copied = 0
+        
+        while True:
+            cursor.execute('BEGIN')
+            cursor.execute('''
+                INSERT INTO stock_candles_v2 
+                (id, symbol, timestamp, trade_date, open_price, high_price, low_price,
+                close_price, volume, avg_price, money_flow, net_mf, created_at)
+                SELECT id, symbol,
+                       to_epoch(timestamp),
+                       CAST(REPLACE(SUBSTR(timestamp, 1, 10), '-', '') AS INTEGER),
+                       open_price, high_price, low_price, close_price, volume,
+                       avg_price, money_flow, net_mf,
+                       to_epoch(created_at)
+                FROM stock_candles
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, MIGRATION_BATCH_SIZE))
+            
+            batch = cursor.rowcount
+            if batch <= 0:
+                break  # Leave the transaction open for the swap
+            
+            copied += batch
+            cursor.execute('SELECT MAX(id) FROM stock_candles_v2')
+            last_id = cursor.fetchone()[0]
+            conn.commit()
+            logging.info(f"Migrated {copied} candles to epoch timestamps")
+        
+        cursor.execute('DROP TABLE stock_candles')
+        cursor.execute('ALTER TABLE stock_candles_v2 RENAME TO stock_candles')
+    
+    def _migrate_daily_summary(self, conn):
+        """
+        Version 3: add daily_summary and fill it from the stored candles
+        """
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_summary (
+                symbol TEXT NOT NULL,
+                trade_date INTEGER NOT NULL,
+                open_price INTEGER NOT NULL,
+                high_price INTEGER NOT NULL,
+                low_price INTEGER NOT NULL,
+                close_price INTEGER NOT NULL,
+                volume INTEGER NOT NULL,
+                net_mf INTEGER NOT NULL,
+                candle_count INTEGER NOT NULL,
+                first_timestamp INTEGER NOT NULL,
+                last_timestamp INTEGER NOT NULL,
+                PRIMARY KEY (symbol, trade_date)
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR REPLACE INTO daily_summary
+            (symbol, trade_date, open_price, high_price, low_price, close_price, volume,
+            net_mf, candle_count, first_timestamp, last_timestamp)
+            SELECT days.symbol, days.trade_date, opening.open_price, days.high_price, days.low_price,
+                   closing.close_price, days.volume, closing.net_mf, days.candle_count,
+                   days.first_timestamp, days.last_timestamp
+            FROM (
+                SELECT symbol, trade_date, MAX(high_price) AS high_price, MIN(low_price) AS low_price,
+                       SUM(volume) AS volume, COUNT(*) AS candle_count,
+                       MIN(timestamp) AS first_timestamp, MAX(timestamp) AS last_timestamp
+                FROM stock_candles
+                GROUP BY symbol, trade_date
+            ) days
+            JOIN stock_candles opening
+                ON opening.symbol = days.symbol AND opening.timestamp = days.first_timestamp
+            JOIN stock_candles closing
+                ON closing.symbol = days.symbol AND closing.timestamp = days.last_timestamp
+        ''')
+        logging.info(f"Summarized {cursor.rowcount} trading days")
+    
+    def _migrate_symbol_stats(self, conn):
+        """
+        Version 4: add symbol_stats and count the stored candles into it and
+        into app_status row 1
+        """
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbol_stats (
+                symbol TEXT PRIMARY KEY,
+                candle_count INTEGER NOT NULL,
+                first_timestamp INTEGER NOT NULL,
+                last_timestamp INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR REPLACE INTO symbol_stats (symbol, candle_count, first_timestamp, last_timestamp)
+            SELECT symbol, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM stock_candles
+            GROUP BY symbol
+        ''')
+        cursor.execute('''
+            INSERT OR REPLACE INTO app_status (id, last_update, total_records)
+            SELECT 1, ?, COALESCE(SUM(candle_count), 0) FROM symbol_stats
+        ''', (datetime.now().isoformat(),))
+    
+    def _migrate_partition_candles(self, conn):
+        """
+        Version 5: split stock_candles into monthly tables behind a view.
+        Each month is copied in its own transaction and skipped if already
+        there, so an interrupted migration resumes where it stopped.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'stock_candles'")
+        row = cursor.fetchone()
+        if row and row[0] == 'table':
+            cursor.execute('ALTER TABLE stock_candles RENAME TO stock_candles_unpartitioned')
+            conn.commit()
+        
+        cursor.execute('SELECT DISTINCT trade_date / 100 FROM stock_candles_unpartitioned')
+        months = sorted(row[0] for row in cursor.fetchall())
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                       ('stock_candles_[0-9][0-9][0-9][0-9][0-9][0-9]',))
+        done = {row[0] for row in cursor.fetchall()}
+        
+        for month in months:
+            table = f"stock_candles_{month}"
+            if table in done:
+                continue
+            cursor.execute('BEGIN')
+            cursor.execute(f'''
+                CREATE TABLE {table} (
+                    id INTEGER PRIMARY KEY,
+                    symbol TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    trade_date INTEGER NOT NULL,
+                    open_price INTEGER NOT NULL,
+                    high_price INTEGER NOT NULL,
+                    low_price INTEGER NOT NULL,
+                    close_price INTEGER NOT NULL,
+                    volume INTEGER NOT NULL,
+                    avg_price INTEGER NOT NULL,
+                    money_flow INTEGER NOT NULL,
+                    net_mf INTEGER NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    UNIQUE(symbol, timestamp)
+                )
+            ''')
+            cursor.execute(f'CREATE INDEX idx_{table}_trade_date ON {table}(symbol, trade_date, timestamp)')
+            cursor.execute(f'''
+                INSERT INTO {table} 
+                SELECT id, symbol, timestamp, trade_date, open_price, high_price, low_price,
+                       close_price, volume, avg_price, money_flow, net_mf, created_at
+                FROM stock_candles_unpartitioned
+                WHERE trade_date BETWEEN ? AND ?
+            ''', (month * 100, month * 100 + 99))
+            copied = cursor.rowcount
+            conn.commit()
+            done.add(table)
+            logging.info(f"Copied {copied} candles to {table}")
+        
+        cursor.execute('BEGIN')
+        cursor.execute('DROP TABLE stock_candles_unpartitioned')
+        if done:
+            cursor.execute('CREATE VIEW stock_candles AS ' +
+                           ' UNION ALL '.join(f'SELECT * FROM {table}' for table in sorted(done)))
+    
+    def _migrate_clustered_candles(self, conn):
+        """
+        Version 6: move symbol names to a symbols table and rebuild each
+        monthly table clustered by (symbol_id, timestamp) WITHOUT ROWID.
+        Each month is rebuilt in its own transaction and skipped if already
+        converted, so an interrupted migration resumes where it stopped.
+        """
+        cursor = conn.cursor()
+        cursor.execute('DROP VIEW IF EXISTS stock_candles')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbols (
+                id INTEGER PRIMARY KEY,
+                symbol TEXT NOT NULL UNIQUE
+            )
+        ''')
+        conn.commit()
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                       ('stock_candles_[0-9][0-9][0-9][0-9][0-9][0-9]',))
+        tables = sorted(row[0] for row in cursor.fetchall())
+        
+        for table in tables:
+            cursor.execute(f'PRAGMA table_info({table})')
+            if 'symbol_id' in {row[1] for row in cursor.fetchall()}:
+                continue
+            cursor.execute('BEGIN')
+            cursor.execute(f'INSERT OR IGNORE INTO symbols (symbol) SELECT DISTINCT symbol FROM {table} ORDER BY symbol')
+            cursor.execute(f'DROP TABLE IF EXISTS {table}_clustered')
+            cursor.execute(f'''
+                CREATE TABLE {table}_clustered (
+                    symbol_id INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    trade_date INTEGER NOT NULL,
+                    open_price INTEGER NOT NULL,
+                    high_price INTEGER NOT NULL,
+                    low_price INTEGER NOT NULL,
+                    close_price INTEGER NOT NULL,
+                    volume INTEGER NOT NULL,
+                    avg_price INTEGER NOT NULL,
+                    money_flow INTEGER NOT NULL,
+                    net_mf INTEGER NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    PRIMARY KEY (symbol_id, timestamp)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute(f'''
+                INSERT INTO {table}_clustered
+                SELECT s.id, c.timestamp, c.trade_date, c.open_price, c.high_price, c.low_price,
+                       c.close_price, c.volume, c.avg_price, c.money_flow, c.net_mf, c.created_at
+                FROM {table} c JOIN symbols s ON s.symbol = c.symbol
+                ORDER BY s.id, c.timestamp
+            ''')
+            copied = cursor.rowcount
+            cursor.execute(f'DROP TABLE {table}')
+            cursor.execute(f'ALTER TABLE {table}_clustered RENAME TO {table}')
+            conn.commit()
+            logging.info(f"Clustered {copied} candles in {table}")
+        
+        cursor.execute('BEGIN')
+        if tables:
+            cursor.execute('CREATE VIEW stock_candles AS ' + ' UNION ALL '.join(
+                f'SELECT s.symbol, c.symbol_id, c.timestamp, c.trade_date, c.open_price, c.high_price, '
+                f'c.low_price, c.close_price, c.volume, c.avg_price, c.money_flow, c.net_mf, c.created_at '
+                f'FROM {table} c JOIN symbols s ON s.id = c.symbol_id'
+                for table in tables))
+    
+    def _migrate_bar_net_mf(self, conn):
+        """
+        Version 7: aggregated_bars gets a net_mf column (closing Net MF of
+        the bar, filled when bars are rolled up from stored candles)
+        """
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA table_info(aggregated_bars)')
+        columns = {row[1] for row in cursor.fetchall()}
+        if columns and 'net_mf' not in columns:
+            cursor.execute('ALTER TABLE aggregated_bars ADD COLUMN net_mf REAL')
+    
+    def _migrate_status_generation(self, conn):
+        """
+        Version 8: app_status gets a generation counter, so other processes
+        notice rewritten Net MF values even when the candle total is unchanged
+        """
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA table_info(app_status)')
+        columns = {row[1] for row in cursor.fetchall()}
+        if columns and 'generation' not in columns:
+            cursor.execute('ALTER TABLE app_status ADD COLUMN generation INTEGER NOT NULL DEFAULT 0')
+    
+    def _row_to_candle(self, row) -> StockCandle:
+        """Build a StockCandle from a stock_candles row (symbol .. created_at)"""
+        return StockCandle(
+            symbol=row[0],
+            timestamp=from_epoch(row[1]),
+            open_price=row[2] / PAISE_PER_RUPEE,
+            high_price=row[3] / PAISE_PER_RUPEE,
+            low_price=row[4] / PAISE_PER_RUPEE,
+            close_price=row[5] / PAISE_PER_RUPEE,
+            volume=row[6],
+            avg_price=row[7] / PAISE_PER_RUPEE,
+            money_flow=row[8] / PAISE_PER_MONEY_FLOW_UNIT,
+            net_mf=row[9] / PAISE_PER_MONEY_FLOW_UNIT,
+            created_at=from_epoch(row[10])
+        )
+    
     def save_candle(self, candle: StockCandle) -> bool:
         """
         Save a stock candle to the database
         Returns True if saved successfully, False if already exists
         """
+        result = self.save_candles([candle])
+        if result.inserted:
+            logging.info(f"Saved candle: {candle}")
+        elif result.success:
+            logging.debug(f"Candle already exists: {candle.symbol} {candle.timestamp}")
+        return result.inserted > 0
+    
+    def save_candles(self, candles) -> SaveResult:
+        """
+        Save many candles (a list of StockCandles, any symbols, or a CandleBatch)
+        in one transaction. Net MF is computed in memory in (symbol, timestamp)
+        order, seeded per trading day from the running Net MF state, or from
+        the last stored candle before it when a candle lands behind the
+        symbol's latest one. Trading days where a candle lands before one
+        already stored have their Net MF recomputed in the same transaction.
+        Candles already stored are skipped.
+        """
+        if not isinstance(candles, CandleBatch):
+            candles = list(candles)
+        rows = self._candle_rows(candles)
+        if not rows:
+            return SaveResult(inserted=0, skipped=0, candles=candles[:0])
+        
+        state = self.net_mf_state
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with state.lock, self._connect() as conn:
+                expired = self._expired_partitions(conn, {row[2] for row in rows})
+                self._ensure_partitions(conn, {row[2] for row in rows if partition_name(row[2]) not in expired})
+                self._ensure_symbols(conn, {row[0] for row in rows})
                 cursor = conn.cursor()
-
-                vol = int(candle.volume/1000)
-                # Calculate avg_price
-                avg_price = int(round((candle.high_price + candle.low_price) / 2, 2))
-            
-                # Calculate money_flow
-                money_flow = int(round((avg_price * vol) / 1000, 2))
+                if not conn.in_transaction:
+                    # Hold the write lock from the state check through commit,
+                    # so no other process stores candles in between
+                    cursor.execute('BEGIN IMMEDIATE')
+                if not state.is_current(cursor):
+                    state.load(cursor)
                 
-                # Calculate net_mf - need to check previous entries
-                net_mf = self._calculate_net_mf(cursor, candle, avg_price, money_flow)
-                net_mf = int(round(net_mf, 2))
+                stored, day_ends = self._stored_timestamps(cursor, rows)
+                previous = {}  # (symbol, trade_date) -> (avg_price, net_mf) of the last candle
+                inserts = []
+                inserted_positions = []
+                out_of_order = {}  # symbol -> trade_dates whose later candles need new Net MF
                 
-                logging.info(f"Final calculated values - Avg: {avg_price}, MF: {money_flow}, NetMF: {net_mf}")
-            
-
-                cursor.execute('''
-                    INSERT OR IGNORE INTO stock_candles 
-                    (symbol, timestamp, open_price, high_price, low_price, 
-                    close_price, volume, avg_price, money_flow, net_mf, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    candle.symbol,
-                    candle.timestamp.isoformat(),
-                    candle.open_price,
-                    candle.high_price,
-                    candle.low_price,
-                    candle.close_price,
-                    candle.volume,
-                    avg_price,
-                    money_flow,
-                    net_mf,
-                    candle.created_at.isoformat()
-                ))
+                for position in sorted(range(len(rows)), key=lambda i: rows[i][:2]):
+                    symbol, timestamp, day, open_price, high_price, low_price, close_price, volume, created_at = rows[position]
+                    if (symbol, timestamp) in stored or partition_name(day) in expired:
+                        continue
+                    stored.add((symbol, timestamp))
+                    
+                    # Everything here is integer paise
+                    avg_price = avg_price_paise(high_price, low_price)
+                    money_flow = avg_price * volume
+                    
+                    key = (symbol, day)
+                    if timestamp < day_ends.get(key, timestamp):
+                        out_of_order.setdefault(symbol, set()).add(day)
+                    if key not in previous:
+                        known, previous[key] = state.previous(symbol, day, timestamp)
+                        if not known:
+                            previous[key] = self._previous_of_day(cursor, symbol, day, timestamp)
+                    net_mf = net_money_flow(money_flow, avg_price, open_price, close_price, previous[key])
+                    previous[key] = (avg_price, net_mf)
+                    
+                    inserts.append((symbol, timestamp, day, open_price, high_price, low_price,
+                                    close_price, volume, avg_price, money_flow, net_mf, created_at))
+                    inserted_positions.append(position)
                 
-                success = cursor.rowcount > 0
+                partitions = {}
+                for row in inserts:
+                    partitions.setdefault(partition_name(row[2]), []).append(
+                        (self.symbol_ids[row[0]],) + row[1:])
+                for table, partition_rows in partitions.items():
+                    cursor.executemany(f'''
+                        INSERT OR IGNORE INTO {table} 
+                        (symbol_id, timestamp, trade_date, open_price, high_price, low_price, 
+                        close_price, volume, avg_price, money_flow, net_mf, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', partition_rows)
+                self._update_daily_summary(cursor, inserts)
+                self._add_to_symbol_stats(cursor, inserts)
+                
+                recomputed = []
+                for symbol, days in out_of_order.items():
+                    for first_day, last_day in day_runs(days):
+                        recomputed.append(self._recompute_net_mf(cursor, symbol, first_day, last_day))
+                generation = self._bump_generation(cursor) if inserts else None
                 conn.commit()
                 
-                if success:
-                    logging.info(f"Saved candle: {candle}")
-                else:
-                    logging.debug(f"Candle already exists: {candle.symbol} {candle.timestamp}")
-                    
-                return success
+                if generation is not None:
+                    state.committed(generation)
+                for row in inserts:
+                    state.record(row[0], row[1], row[2], row[8], row[10])
+                for updated, last in recomputed:
+                    if last:
+                        state.record(*last)
                 
         except sqlite3.Error as e:
-            logging.error(f"Error saving candle: {e}")
-            return False
-
-    def _calculate_net_mf(self, cursor, candle: StockCandle, avg_price: float, money_flow: float) -> float:
+            logging.error(f"Error saving candles: {e}")
+            return SaveResult(inserted=0, skipped=0, candles=candles[:0], error_message=str(e))
+        
+        if isinstance(candles, CandleBatch):
+            saved = candles[np.asarray(inserted_positions, dtype=np.int64)]
+        else:
+            saved = [candles[position] for position in inserted_positions]
+        
+        logging.debug(f"Saved {len(inserts)} candles, skipped {len(rows) - len(inserts)}")
+        return SaveResult(inserted=len(inserts), skipped=len(rows) - len(inserts), candles=saved)
+    
+    def _candle_rows(self, candles) -> List[tuple]:
         """
-        Calculate Net MF based on the rules:
-        1. First entry of day: Compare Close vs Open
-        2. Subsequent entries: Compare current avg_price vs previous avg_price
-        3. Equal avg_prices: Use previous Net MF sign
+        Candles as (symbol, timestamp, trade_date, open, high, low, close,
+        volume, created_at) tuples of integers (epoch seconds, paise)
         """
-        try:
-            # Get the date from timestamp
-            candle_date = candle.timestamp.date()
-            
-            # Check if this is the first entry of the day
+        if isinstance(candles, CandleBatch):
+            count = len(candles)
+            created_at = candles.created_at
+            if created_at is None:
+                created_at = np.full(count, to_epoch(market_now()), dtype=np.int64)
+            paise = [np.rint(column * PAISE_PER_RUPEE).astype(np.int64).tolist()
+                     for column in (candles.open_price, candles.high_price,
+                                    candles.low_price, candles.close_price)]
+            return list(zip([candles.symbol] * count, candles.timestamp.tolist(),
+                            candles.trade_dates().tolist(), *paise,
+                            candles.volume.tolist(), created_at.tolist()))
+        
+        return [
+            (candle.symbol, to_epoch(candle.timestamp), trade_date(candle.timestamp),
+             to_paise(candle.open_price), to_paise(candle.high_price), to_paise(candle.low_price),
+             to_paise(candle.close_price), int(candle.volume), to_epoch(candle.created_at))
+            for candle in candles
+        ]
+    
+    def _stored_timestamps(self, cursor, rows: List[tuple]):
+        """
+        (symbol, timestamp) keys already stored within the time span of each
+        symbol's rows, and the last stored timestamp of each (symbol,
+        trade_date) the rows touch. Symbols whose rows all come after their
+        latest stored candle (the live path) need no query.
+        """
+        spans = {}
+        for row in rows:
+            low, high, first_day, last_day = spans.get(row[0], (row[1], row[1], row[2], row[2]))
+            spans[row[0]] = (min(low, row[1]), max(high, row[1]), min(first_day, row[2]), max(last_day, row[2]))
+        
+        stored = set()
+        day_ends = {}
+        for symbol, (low, high, first_day, last_day) in spans.items():
+            latest = self.net_mf_state.latest_timestamp(symbol)
+            if latest is None or low > latest:
+                continue
             cursor.execute('''
-                SELECT COUNT(*) FROM stock_candles 
-                WHERE symbol = ? AND DATE(timestamp) = ?
-            ''', (candle.symbol, candle_date.isoformat()))
-            
-            day_entry_count = cursor.fetchone()[0]
+                SELECT timestamp FROM stock_candles
+                WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+            ''', (symbol, low, high))
+            stored.update((symbol, row[0]) for row in cursor.fetchall())
             
-            if day_entry_count == 0:
-                # First entry of the day - compare close vs open
-                if candle.close_price < candle.open_price:
-                    return -money_flow
-                else:
-                    return money_flow
+            cursor.execute('''
+                SELECT trade_date, MAX(timestamp) FROM stock_candles
+                WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+                GROUP BY trade_date
+            ''', (symbol, trade_date_bounds(first_day)[0], trade_date_bounds(last_day)[1]))
+            day_ends.update(((symbol, day), end) for day, end in cursor.fetchall())
+        return stored, day_ends
+    
+    def _previous_of_day(self, cursor, symbol: str, day: int, timestamp: int) -> Optional[Tuple[int, int]]:
+        """
+        (avg_price, net_mf) of the symbol's last stored candle on a trading day
+        before a timestamp (a primary key seek on symbol_id, timestamp)
+        """
+        cursor.execute('''
+            SELECT avg_price, net_mf FROM stock_candles 
+            WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp DESC LIMIT 1
+        ''', (symbol, trade_date_bounds(day)[0], timestamp))
+        return cursor.fetchone()
+    
+    def _update_daily_summary(self, cursor, inserts: List[tuple]):
+        """
+        Fold newly inserted candle rows (sorted by symbol, timestamp) into
+        daily_summary within the caller's transaction
+        """
+        days = {}
+        for (symbol, timestamp, day, open_price, high_price, low_price, close_price,
+             volume, avg_price, money_flow, net_mf, created_at) in inserts:
+            summary = days.get((symbol, day))
+            if summary is None:
+                days[(symbol, day)] = [symbol, day, open_price, high_price, low_price, close_price,
+                                       volume, net_mf, 1, timestamp, timestamp]
             else:
-                # Get the most recent entry for this symbol on the same day
-                cursor.execute('''
-                    SELECT avg_price, net_mf FROM stock_candles 
-                    WHERE symbol = ? AND DATE(timestamp) = ?
-                    ORDER BY timestamp DESC LIMIT 1
-                ''', (candle.symbol, candle_date.isoformat()))
-                
-                result = cursor.fetchone()
-                if result:
-                    previous_avg_price, previous_net_mf = result
-                    
-                    if avg_price > previous_avg_price:
-                        return money_flow + previous_net_mf
-                    elif avg_price < previous_avg_price:
-                        return -money_flow + previous_net_mf
-                    else:
-                        # Equal avg prices - use previous Net MF sign
-                        if previous_net_mf >= 0:
-                            return money_flow + previous_net_mf
-                        else:
-                            return -money_flow + previous_net_mf
-                else:
-                    # Fallback - shouldn't happen but just in case
-                    return money_flow
-                    
-        except Exception as e:
-            logging.error(f"Error calculating Net MF: {e}")
-            # Fallback calculation
-            if candle.close_price < candle.open_price:
-                return -money_flow
+                summary[3] = max(summary[3], high_price)
+                summary[4] = min(summary[4], low_price)
+                summary[5] = close_price
+                summary[6] += volume
+                summary[7] = net_mf
+                summary[8] += 1
+                summary[10] = timestamp
+        
+        # Column references on the right are the stored row's values
+        cursor.executemany('''
+            INSERT INTO daily_summary
+            (symbol, trade_date, open_price, high_price, low_price, close_price, volume,
+            net_mf, candle_count, first_timestamp, last_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol, trade_date) DO UPDATE SET
+                open_price = CASE WHEN excluded.first_timestamp < first_timestamp
+                                  THEN excluded.open_price ELSE open_price END,
+                high_price = MAX(high_price, excluded.high_price),
+                low_price = MIN(low_price, excluded.low_price),
+                close_price = CASE WHEN excluded.last_timestamp > last_timestamp
+                                   THEN excluded.close_price ELSE close_price END,
+                volume = volume + excluded.volume,
+                net_mf = CASE WHEN excluded.last_timestamp > last_timestamp
+                              THEN excluded.net_mf ELSE net_mf END,
+                candle_count = candle_count + excluded.candle_count,
+                first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+                last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+        ''', list(days.values()))
+    
+    def _add_to_symbol_stats(self, cursor, inserts: List[tuple]):
+        """Count newly inserted candle rows into symbol_stats and app_status"""
+        if not inserts:
+            return
+        
+        stats = {}
+        for row in inserts:
+            symbol, timestamp = row[0], row[1]
+            entry = stats.get(symbol)
+            if entry is None:
+                stats[symbol] = [symbol, 1, timestamp, timestamp]
             else:
-                return money_flow
+                entry[1] += 1
+                entry[2] = min(entry[2], timestamp)
+                entry[3] = max(entry[3], timestamp)
+        
+        cursor.executemany('''
+            INSERT INTO symbol_stats (symbol, candle_count, first_timestamp, last_timestamp)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (symbol) DO UPDATE SET
+                candle_count = candle_count + excluded.candle_count,
+                first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+                last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+        ''', list(stats.values()))
+        cursor.execute('''
+            UPDATE app_status SET total_records = total_records + ?, last_update = ?
+            WHERE id = 1
+        ''', (len(inserts), datetime.now().isoformat()))
+    
+    def _bump_generation(self, cursor) -> int:
+        """
+        Mark stored candles as changed for every process's Net MF state, in
+        the open write transaction. Returns the new generation.
+        """
+        cursor.execute('UPDATE app_status SET generation = generation + 1 WHERE id = 1')
+        cursor.execute('SELECT generation FROM app_status WHERE id = 1')
+        return cursor.fetchone()[0]
+    
+    def _roll_up_partition(self, cursor, table: str, resolution: str) -> int:
+        """
+        Write a monthly table's candles into aggregated_bars at a coarser
+        resolution, bucketed like BarAggregator (from the market open, daily
+        bars per session). Volume is summed and Net MF, a running total
+        within the day, is the bar's closing value. Replaces bars built
+        live for the same slots. Returns the number of bars written.
+        """
+        first_day = int(table[-6:]) * 100 + 1
+        days = [from_trade_date(first_day) + timedelta(days=offset) for offset in range(31)]
+        sessions = [(trade_date(day), to_epoch(datetime.combine(day, Config.MARKET_OPEN_TIME)))
+                    for day in days if trade_date(day) // 100 == first_day // 100]
+        
+        if resolution == '1d':
+            bucket = 's.session_open'
+        else:
+            # Floor division from the open (candles before it fall in earlier bars)
+            length = int(interval_to_timedelta(resolution).total_seconds())
+            bucket = (f's.session_open + ((c.timestamp - s.session_open + 86400) / {length}'
+                      f' - {86400 // length}) * {length}')
+        
+        cursor.execute(f'''
+            WITH sessions(trade_date, session_open) AS (VALUES {', '.join(['(?, ?)'] * len(sessions))}),
+            buckets AS (
+                SELECT c.symbol_id, {bucket} AS bucket, MAX(c.high_price) AS high_price,
+                       MIN(c.low_price) AS low_price, SUM(c.volume) AS volume, COUNT(*) AS candle_count,
+                       MIN(c.timestamp) AS first_timestamp, MAX(c.timestamp) AS last_timestamp
+                FROM {table} c JOIN sessions s ON s.trade_date = c.trade_date
+                GROUP BY c.symbol_id, bucket
+            )
+            SELECT sy.symbol, b.bucket, opening.open_price, b.high_price, b.low_price,
+                   closing.close_price, b.volume, b.candle_count, closing.net_mf
+            FROM buckets b
+            JOIN symbols sy ON sy.id = b.symbol_id
+            JOIN {table} opening ON opening.symbol_id = b.symbol_id AND opening.timestamp = b.first_timestamp
+            JOIN {table} closing ON closing.symbol_id = b.symbol_id AND closing.timestamp = b.last_timestamp
+        ''', [value for session in sessions for value in session])
+        
+        bars = [
+            (symbol, resolution, from_epoch(bucket).isoformat(),
+             open_price / PAISE_PER_RUPEE, high_price / PAISE_PER_RUPEE, low_price / PAISE_PER_RUPEE, close_price / PAISE_PER_RUPEE,
+             volume, candle_count, net_mf / PAISE_PER_MONEY_FLOW_UNIT)
+            for symbol, bucket, open_price, high_price, low_price, close_price, volume, candle_count, net_mf
+            in cursor.fetchall()
+        ]
+        cursor.executemany('''
+            INSERT OR REPLACE INTO aggregated_bars 
+            (symbol, resolution, timestamp, open_price, high_price, low_price,
+             close_price, volume, candle_count, net_mf)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', bars)
+        return len(bars)
+    
+    def _subtract_from_symbol_stats(self, cursor, removed: Dict[str, int], kept_from: int):
+        """
+        Take dropped candles (count per symbol) out of symbol_stats and
+        app_status, when every candle before trade_date kept_from is gone.
+        New first timestamps come from daily_summary.
+        """
+        for symbol, count in removed.items():
+            cursor.execute('''
+                SELECT MIN(first_timestamp) FROM daily_summary 
+                WHERE symbol = ? AND trade_date >= ?
+            ''', (symbol, kept_from))
+            first_timestamp = cursor.fetchone()[0]
+            if first_timestamp is None:
+                cursor.execute('DELETE FROM symbol_stats WHERE symbol = ?', (symbol,))
+            else:
+                cursor.execute('''
+                    UPDATE symbol_stats
+                    SET candle_count = candle_count - ?, first_timestamp = ?
+                    WHERE symbol = ?
+                ''', (count, first_timestamp, symbol))
+        
+        cursor.execute('''
+            UPDATE app_status SET total_records = total_records - ?, last_update = ?
+            WHERE id = 1
+        ''', (sum(removed.values()), datetime.now().isoformat()))
+    
+    def rebuild_symbol_stats(self) -> int:
+        """
+        Recount symbol_stats and the app_status total from stock_candles.
+        Returns the total number of candles.
+        """
+        try:
+            with self.net_mf_state.lock, self._connect() as conn:
+                cursor = conn.cursor()
+                
+                # Count each monthly table on its own and combine
+                stats = {}
+                for table in self._candle_partitions(cursor):
+                    cursor.execute(f'''
+                        SELECT s.symbol, COUNT(*), MIN(c.timestamp), MAX(c.timestamp)
+                        FROM {table} c JOIN symbols s ON s.id = c.symbol_id
+                        GROUP BY c.symbol_id
+                    ''')
+                    for symbol, count, first_timestamp, last_timestamp in cursor.fetchall():
+                        entry = stats.setdefault(symbol, [symbol, 0, first_timestamp, last_timestamp])
+                        entry[1] += count
+                        entry[2] = min(entry[2], first_timestamp)
+                        entry[3] = max(entry[3], last_timestamp)
+                total = sum(entry[1] for entry in stats.values())
+                
+                cursor.execute('DELETE FROM symbol_stats')
+                cursor.executemany('''
+                    INSERT INTO symbol_stats (symbol, candle_count, first_timestamp, last_timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', list(stats.values()))
+                cursor.execute('''
+                    UPDATE app_status SET total_records = ?, last_update = ?
+                    WHERE id = 1
+                ''', (total, datetime.now().isoformat()))
+                self._bump_generation(cursor)
+                conn.commit()
+                
+            self.net_mf_state.reset()
+            logging.info(f"Rebuilt symbol stats: {total} candles")
+            return total
+            
+        except sqlite3.Error as e:
+            logging.error(f"Error rebuilding symbol stats: {e}")
+            return 0
+    
+    def rebuild_daily_summary(self, symbols: List[str] = None) -> int:
+        """
+        Recompute daily_summary from stock_candles for some symbols (all when
+        omitted). Days whose candles were removed by cleanup keep their rows.
+        Returns the number of trading days written.
+        """
+        try:
+            with self.net_mf_state.lock, self._connect() as conn:
+                cursor = conn.cursor()
+                rebuilt = 0
+                
+                where = ''
+                params = ()
+                if symbols:
+                    cursor.execute(f"SELECT id FROM symbols WHERE symbol IN ({', '.join('?' * len(symbols))})",
+                                   tuple(symbols))
+                    params = tuple(row[0] for row in cursor.fetchall())
+                    if not params:
+                        return 0
+                    where = f"WHERE symbol_id IN ({', '.join('?' * len(params))})"
+                
+                # A trading day never spans two monthly tables
+                for table in self._candle_partitions(cursor):
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO daily_summary
+                        (symbol, trade_date, open_price, high_price, low_price, close_price, volume,
+                        net_mf, candle_count, first_timestamp, last_timestamp)
+                        SELECT s.symbol, days.trade_date, opening.open_price, days.high_price, days.low_price,
+                               closing.close_price, days.volume, closing.net_mf, days.candle_count,
+                               days.first_timestamp, days.last_timestamp
+                        FROM (
+                            SELECT symbol_id, trade_date, MAX(high_price) AS high_price, MIN(low_price) AS low_price,
+                                   SUM(volume) AS volume, COUNT(*) AS candle_count,
+                                   MIN(timestamp) AS first_timestamp, MAX(timestamp) AS last_timestamp
+                            FROM {table}
+                            {where}
+                            GROUP BY symbol_id, trade_date
+                        ) days
+                        JOIN symbols s ON s.id = days.symbol_id
+                        JOIN {table} opening
+                            ON opening.symbol_id = days.symbol_id AND opening.timestamp = days.first_timestamp
+                        JOIN {table} closing
+                            ON closing.symbol_id = days.symbol_id AND closing.timestamp = days.last_timestamp
+                    ''', params)
+                    rebuilt += cursor.rowcount
+                conn.commit()
+                
+            logging.info(f"Rebuilt daily summary for {rebuilt} trading days")
+            return rebuilt
+            
+        except sqlite3.Error as e:
+            logging.error(f"Error rebuilding daily summary: {e}")
+            return 0
+    
+    def recompute_net_mf(self, symbol: str, start_day: date = None, end_day: date = None) -> int:
+        """
+        Rebuild the Net MF chain of a symbol's trading days from start_day to
+        end_day (inclusive, all days when omitted) in one pass.
+        Returns the number of candles whose Net MF changed.
+        """
+        first = trade_date(start_day) if start_day else 0
+        last = trade_date(end_day) if end_day else 99999999
+        
+        state = self.net_mf_state
+        try:
+            with state.lock, self._connect() as conn:
+                cursor = conn.cursor()
+                updated, latest = self._recompute_net_mf(cursor, symbol, first, last)
+                generation = self._bump_generation(cursor) if updated else None
+                conn.commit()
+                
+            if generation is not None:
+                state.committed(generation)
+            if latest:
+                state.record(*latest)
+            logging.info(f"Recomputed Net MF for {symbol}: {updated} candles changed")
+            return updated
+            
+        except sqlite3.Error as e:
+            logging.error(f"Error recomputing Net MF for {symbol}: {e}")
+            return 0
+    
+    def _recompute_net_mf(self, cursor, symbol: str, first_day: int, last_day: int):
+        """
+        Recompute Net MF over trade_dates first_day..last_day without
+        committing. Returns (changed count, (symbol, timestamp, trade_date,
+        avg_price, net_mf) of the range's last candle or None).
+        """
+        symbol_id = self._symbol_id(cursor, symbol)
+        if symbol_id is None:
+            return 0, None
+        
+        # Trading days are contiguous timestamp ranges of the clustered key
+        start = trade_date_bounds(first_day)[0] if first_day else 0
+        end = trade_date_bounds(last_day)[1] if last_day < 99999999 else 2 ** 62
+        cursor.execute('''
+            SELECT timestamp, trade_date, open_price, close_price, avg_price, money_flow, net_mf
+            FROM stock_candles
+            WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp
+        ''', (symbol, start, end))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, None
+        
+        timestamps, days, open_prices, close_prices, avg_prices, money_flows, net_mfs = np.fromiter(
+            chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 7).reshape(-1, 7).T
+        recomputed = net_money_flow_chain(days, avg_prices, open_prices, close_prices, money_flows)
+        changed = np.flatnonzero(recomputed != net_mfs)
+        
+        months = days[changed] // 100
+        for month in np.unique(months).tolist():
+            in_month = changed[months == month]
+            cursor.executemany(
+                f'UPDATE {partition_name(month * 100)} SET net_mf = ? WHERE symbol_id = ? AND timestamp = ?',
+                zip(recomputed[in_month].tolist(), repeat(symbol_id), timestamps[in_month].tolist()))
+        
+        # Closing Net MF for daily_summary, on the days where it changed
+        day_ends = np.flatnonzero(np.append(days[1:] != days[:-1], True))
+        day_ends = day_ends[recomputed[day_ends] != net_mfs[day_ends]]
+        cursor.executemany('UPDATE daily_summary SET net_mf = ? WHERE symbol = ? AND trade_date = ?',
+                           ((net_mf, symbol, day) for net_mf, day in
+                            zip(recomputed[day_ends].tolist(), days[day_ends].tolist())))
+        
+        last = (symbol, int(timestamps[-1]), int(days[-1]), int(avg_prices[-1]), int(recomputed[-1]))
+        return len(changed), last
     
     def get_latest_candle(self, symbol: str) -> Optional[StockCandle]:
         """Get the latest candle for a symbol"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -199,31 +1420,67 @@ class StockDatabase:
                 
                 row = cursor.fetchone()
                 if row:
-                    return StockCandle(
-                        symbol=row[0],
-                        timestamp=datetime.fromisoformat(row[1]),
-                        open_price=row[2],
-                        high_price=row[3],
-                        low_price=row[4],
-                        close_price=row[5],
-                        volume=row[6],
-                        avg_price = row[7],
-                        money_flow = row[8],
-                        net_mf = row[9],
-                        created_at=datetime.fromisoformat(row[10])
-                    )
+                    return self._row_to_candle(row)
                 return None
                 
         except sqlite3.Error as e:
             logging.error(f"Error getting latest candle: {e}")
             return None
     
-    def get_candles_for_symbol(self, symbol: str, limit: int = 100) -> List[StockCandle]:
-        """Get recent candles for a symbol"""
+    def get_latest_snapshot(self, symbols: List[str] = None) -> Dict[str, StockCandle]:
+        """
+        Get the latest candle of every symbol (or of the given ones, in
+        their order) in one query. symbol_stats holds each symbol's last
+        timestamp, so every candle is a single primary key seek in the one
+        monthly table that covers it.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                partitions = self._candle_partitions(cursor)
+                params = []
+                for table in partitions:
+                    params.extend(partition_bounds(table))
+                cursor.execute(' UNION ALL '.join(f'''
+                    SELECT s.symbol, c.timestamp, c.open_price, c.high_price, c.low_price,
+                       c.close_price, c.volume, c.avg_price, c.money_flow, c.net_mf, c.created_at
+                    FROM symbol_stats st
+                    JOIN symbols s ON s.symbol = st.symbol
+                    JOIN {table} c ON c.symbol_id = s.id AND c.timestamp = st.last_timestamp
+                    WHERE st.last_timestamp >= ? AND st.last_timestamp < ?
+                ''' for table in partitions), params)
+                
+                latest = {row[0]: self._row_to_candle(row) for row in cursor.fetchall()}
+                
+                if symbols is not None:
+                    latest = {symbol: latest[symbol] for symbol in symbols if symbol in latest}
+                return latest
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting latest snapshot: {e}")
+            return {}
+    
+    def get_candles_for_symbol(self, symbol: str, limit: int = 100, as_batch: bool = False):
+        """
+        Get recent candles for a symbol, newest first.
+        With as_batch, returns a columnar CandleBatch instead of a list of StockCandles.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
+                if as_batch:
+                    cursor.execute('''
+                        SELECT timestamp, open_price, high_price, low_price, close_price,
+                           volume, avg_price, money_flow, net_mf, created_at
+                        FROM stock_candles 
+                        WHERE symbol = ?
+                        ORDER BY timestamp DESC
+                        LIMIT ?
+                    ''', (symbol, limit))
+                    return CandleBatch.from_rows(symbol, cursor.fetchall())
+                
                 cursor.execute('''
                     SELECT symbol, timestamp, open_price, high_price, low_price,
                        close_price, volume, avg_price, money_flow, net_mf, created_at
@@ -235,33 +1492,404 @@ class StockDatabase:
                 
                 candles = []
                 for row in cursor.fetchall():
-                    candles.append(StockCandle(
-                        symbol=row[0],
-                        timestamp=datetime.fromisoformat(row[1]),
-                        open_price=row[2],
-                        high_price=row[3],
-                        low_price=row[4],
-                        close_price=row[5],
-                        volume=row[6],
-                        avg_price = row[7],
-                        money_flow = row[8],
-                        net_mf = row[9],
-                        created_at=datetime.fromisoformat(row[10])
-                    ))
+                    candles.append(self._row_to_candle(row))
                 
                 return candles
                 
         except sqlite3.Error as e:
             logging.error(f"Error getting candles for symbol: {e}")
+            return CandleBatch.empty(symbol) if as_batch else []
+    
+    def get_candles_since(self, symbol: str, since: datetime, as_batch: bool = False):
+        """
+        Get candles for a symbol at or after a time, oldest first.
+        With as_batch, returns a columnar CandleBatch instead of a list of StockCandles.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                if as_batch:
+                    cursor.execute('''
+                        SELECT timestamp, open_price, high_price, low_price, close_price,
+                           volume, avg_price, money_flow, net_mf, created_at
+                        FROM stock_candles 
+                        WHERE symbol = ? AND timestamp >= ?
+                        ORDER BY timestamp ASC
+                    ''', (symbol, to_epoch(since)))
+                    return CandleBatch.from_rows(symbol, cursor.fetchall())
+                
+                cursor.execute('''
+                    SELECT symbol, timestamp, open_price, high_price, low_price,
+                       close_price, volume, avg_price, money_flow, net_mf, created_at
+                    FROM stock_candles 
+                    WHERE symbol = ? AND timestamp >= ?
+                    ORDER BY timestamp ASC
+                ''', (symbol, to_epoch(since)))
+                
+                return [self._row_to_candle(row) for row in cursor.fetchall()]
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting candles since {since}: {e}")
+            return CandleBatch.empty(symbol) if as_batch else []
+    
+    def get_candles_range(self, symbols, start: datetime = None, end: datetime = None,
+                          after: Tuple[str, datetime] = None, page_size: int = None,
+                          as_batch: bool = False, newest_first: bool = False):
+        """
+        Stream candles of one or more symbols with start <= timestamp < end
+        (either bound optional), in (symbol, timestamp) order. Yields
+        StockCandles, or with as_batch one CandleBatch per page.
+        
+        Pages are fetched by keyset on (symbol, timestamp): each query seeks
+        past the last key returned instead of using OFFSET, and no statement
+        or read transaction stays open between pages, so memory stays flat
+        however wide the range is. Pass the (symbol, timestamp) of the last
+        candle seen as `after` to resume from it later.
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        page_size = page_size or Config.DB_PAGE_SIZE
+        order = 'DESC' if newest_first else 'ASC'
+        
+        for symbol in sorted(set(symbols)):
+            if after and symbol < after[0]:
+                continue
+            
+            low = to_epoch(start) if start else -2 ** 62
+            high = to_epoch(end) if end else 2 ** 62
+            if after and symbol == after[0]:
+                if newest_first:
+                    high = min(high, to_epoch(after[1]))
+                else:
+                    low = max(low, to_epoch(after[1]) + 1)
+            
+            while low < high:
+                try:
+                    cursor = self._connect().cursor()
+                    cursor.execute(f'''
+                        SELECT timestamp, open_price, high_price, low_price, close_price,
+                           volume, avg_price, money_flow, net_mf, created_at
+                        FROM stock_candles 
+                        WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp {order}
+                        LIMIT ?
+                    ''', (symbol, low, high, page_size))
+                    rows = cursor.fetchall()
+                except sqlite3.Error as e:
+                    logging.error(f"Error reading candles of {symbol}: {e}")
+                    return
+                
+                if not rows:
+                    break
+                if as_batch:
+                    yield CandleBatch.from_rows(symbol, rows)
+                else:
+                    for row in rows:
+                        yield self._row_to_candle((symbol,) + row)
+                
+                if len(rows) < page_size:
+                    break
+                if newest_first:
+                    high = rows[-1][0]
+                else:
+                    low = rows[-1][0] + 1
+    
+    def save_bars(self, bars: List[AggregatedBar]) -> int:
+        """
+        Save aggregated bars in one transaction. A bar already stored for the
+        same (symbol, resolution, timestamp) is replaced, so partial bars can
+        be written and later completed.
+        Returns the number of bars written.
+        """
+        if not bars:
+            return 0
+        
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO aggregated_bars 
+                    (symbol, resolution, timestamp, open_price, high_price, low_price,
+                     close_price, volume, candle_count, net_mf)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (bar.symbol, bar.resolution, bar_key(bar.timestamp), bar.open_price,
+                     bar.high_price, bar.low_price, bar.close_price, int(bar.volume), bar.candle_count,
+                     bar.net_mf)
+                    for bar in bars
+                ])
+                
+                conn.commit()
+                return len(bars)
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error saving aggregated bars: {e}")
+            return 0
+    
+    def get_bars(self, symbol: str, resolution: str, limit: int = 100) -> List[AggregatedBar]:
+        """Get recent aggregated bars for a symbol at one resolution, newest first"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT symbol, resolution, timestamp, open_price, high_price, low_price,
+                       close_price, volume, candle_count, net_mf
+                    FROM aggregated_bars 
+                    WHERE symbol = ? AND resolution = ?
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                ''', (symbol, resolution, limit))
+                
+                return [
+                    AggregatedBar(
+                        symbol=row[0],
+                        resolution=row[1],
+                        timestamp=datetime.fromisoformat(row[2]),
+                        open_price=row[3],
+                        high_price=row[4],
+                        low_price=row[5],
+                        close_price=row[6],
+                        volume=row[7],
+                        candle_count=row[8],
+                        net_mf=row[9]
+                    )
+                    for row in cursor.fetchall()
+                ]
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting {resolution} bars for symbol: {e}")
+            return []
+    
+    def _row_to_summary(self, row) -> DailySummary:
+        """Build a DailySummary from a daily_summary row"""
+        return DailySummary(
+            symbol=row[0],
+            trade_date=from_trade_date(row[1]),
+            open_price=row[2] / PAISE_PER_RUPEE,
+            high_price=row[3] / PAISE_PER_RUPEE,
+            low_price=row[4] / PAISE_PER_RUPEE,
+            close_price=row[5] / PAISE_PER_RUPEE,
+            volume=row[6],
+            net_mf=row[7] / PAISE_PER_MONEY_FLOW_UNIT,
+            candle_count=row[8],
+            first_timestamp=from_epoch(row[9]),
+            last_timestamp=from_epoch(row[10])
+        )
+    
+    def get_daily_summary(self, symbol: str, days: int = 30) -> List[DailySummary]:
+        """Get a symbol's recent trading days, newest first"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT symbol, trade_date, open_price, high_price, low_price, close_price,
+                       volume, net_mf, candle_count, first_timestamp, last_timestamp
+                    FROM daily_summary 
+                    WHERE symbol = ?
+                    ORDER BY trade_date DESC
+                    LIMIT ?
+                ''', (symbol, days))
+                
+                return [self._row_to_summary(row) for row in cursor.fetchall()]
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting daily summary for {symbol}: {e}")
+            return []
+    
+    def get_day_summaries(self, day: date) -> List[DailySummary]:
+        """Get every symbol's summary for one trading day (e.g. for a screener)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT symbol, trade_date, open_price, high_price, low_price, close_price,
+                       volume, net_mf, candle_count, first_timestamp, last_timestamp
+                    FROM daily_summary 
+                    WHERE trade_date = ?
+                    ORDER BY symbol
+                ''', (trade_date(day),))
+                
+                return [self._row_to_summary(row) for row in cursor.fetchall()]
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting daily summaries for {day}: {e}")
             return []
     
+    def get_last_timestamps(self, symbols: List[str] = None) -> Dict[str, datetime]:
+        """Get the timestamp of the latest stored candle for each symbol"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT symbol, last_timestamp FROM symbol_stats')
+                
+                last_timestamps = {
+                    row[0]: from_epoch(row[1]) for row in cursor.fetchall()
+                }
+                
+                if symbols is not None:
+                    last_timestamps = {
+                        symbol: last_timestamps[symbol]
+                        for symbol in symbols if symbol in last_timestamps
+                    }
+                return last_timestamps
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting last timestamps: {e}")
+            return {}
+    
+    def get_symbol_metadata(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Get cached metadata for a symbol"""
+        return self.get_symbol_metadata_many([symbol]).get(symbol)
+    
+    def get_symbol_metadata_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get cached metadata for many symbols in one query"""
+        if not symbols:
+            return {}
+        
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                metadata = {}
+                
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(symbols), 500):
+                    chunk = list(symbols[start:start + 500])
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        SELECT symbol, is_valid, name, sector, industry,
+                           market_cap, currency, fetched_at
+                        FROM symbol_metadata
+                        WHERE symbol IN ({placeholders})
+                    ''', chunk)
+                    
+                    for row in cursor.fetchall():
+                        metadata[row[0]] = {
+                            'symbol': row[0],
+                            'is_valid': bool(row[1]),
+                            'name': row[2],
+                            'sector': row[3],
+                            'industry': row[4],
+                            'market_cap': row[5],
+                            'currency': row[6],
+                            'fetched_at': datetime.fromisoformat(row[7])
+                        }
+                
+                return metadata
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting symbol metadata: {e}")
+            return {}
+    
+    def save_symbol_metadata(self, metadata: Dict[str, Any]) -> bool:
+        """Insert or refresh cached metadata for a symbol"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO symbol_metadata
+                    (symbol, is_valid, name, sector, industry, market_cap, currency, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    metadata['symbol'],
+                    int(metadata['is_valid']),
+                    metadata.get('name'),
+                    metadata.get('sector'),
+                    metadata.get('industry'),
+                    metadata.get('market_cap'),
+                    metadata.get('currency'),
+                    metadata['fetched_at'].isoformat()
+                ))
+                conn.commit()
+                return True
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error saving symbol metadata: {e}")
+            return False
+    
+    def get_backfill_checkpoints(self, symbols: List[str], chunk_starts: List[date]) -> Set[Tuple[str, date]]:
+        """Get the (symbol, chunk_start) pairs already backfilled completely"""
+        if not symbols or not chunk_starts:
+            return set()
+        
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT symbol, chunk_start FROM backfill_checkpoints
+                    WHERE status = 'done' AND chunk_start BETWEEN ? AND ?
+                ''', (min(chunk_starts).isoformat(), max(chunk_starts).isoformat()))
+                
+                wanted = set(symbols)
+                return {
+                    (row[0], date.fromisoformat(row[1]))
+                    for row in cursor.fetchall() if row[0] in wanted
+                }
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error getting backfill checkpoints: {e}")
+            return set()
+    
+    def save_backfill_checkpoint(self, symbol: str, chunk_start: date, chunk_end: date,
+                                 status: str, rows_fetched: int) -> bool:
+        """Record the outcome of a backfill chunk"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO backfill_checkpoints
+                    (symbol, chunk_start, chunk_end, status, rows_fetched, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    symbol,
+                    chunk_start.isoformat(),
+                    chunk_end.isoformat(),
+                    status,
+                    rows_fetched,
+                    datetime.now().isoformat()
+                ))
+                conn.commit()
+                return True
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error saving backfill checkpoint: {e}")
+            return False
+    
+    def clear_backfill_checkpoints(self, symbols: List[str] = None) -> int:
+        """Forget backfill progress so the next run fetches everything again"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                
+                if symbols is None:
+                    cursor.execute('DELETE FROM backfill_checkpoints')
+                else:
+                    cursor.executemany('DELETE FROM backfill_checkpoints WHERE symbol = ?',
+                                       [(symbol,) for symbol in symbols])
+                
+                deleted_count = cursor.rowcount
+                conn.commit()
+                return deleted_count
+                
+        except sqlite3.Error as e:
+            logging.error(f"Error clearing backfill checkpoints: {e}")
+            return 0
+    
     def get_all_symbols(self) -> List[str]:
         """Get all symbols in the database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('SELECT DISTINCT symbol FROM stock_candles ORDER BY symbol')
+                cursor.execute('SELECT symbol FROM symbol_stats ORDER BY symbol')
                 return [row[0] for row in cursor.fetchall()]
                 
         except sqlite3.Error as e:
@@ -269,36 +1897,88 @@ class StockDatabase:
             return []
     
     def get_total_records(self) -> int:
-        """Get total number of records in database"""
+        """Get total number of records in database (from the maintained count)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM stock_candles')
-                return cursor.fetchone()[0]
+                cursor.execute('SELECT total_records FROM app_status WHERE id = 1')
+                row = cursor.fetchone()
+                return row[0] if row else 0
                 
         except sqlite3.Error as e:
             logging.error(f"Error getting total records: {e}")
             return 0
     
-    def cleanup_old_data(self, days_to_keep: int = None) -> int:
-        """Remove old data beyond specified days"""
+    def cleanup_old_data(self, days_to_keep: int = None, hourly_months_to_keep: int = None) -> int:
+        """
+        Apply tiered retention. Candles go a whole month at a time: each
+        monthly table that ended before the cutoff is first rolled up into
+        1h and daily bars, then dropped in the same transaction, so
+        retention rounds up to the month and never rewrites live tables.
+        1h bars are kept for hourly_months_to_keep months, daily bars (and
+        daily_summary) forever, other aggregated bars as long as candles.
+        Each run only rolls up the months that expired since the last one.
+        Returns the number of candles removed.
+        """
         if days_to_keep is None:
             days_to_keep = Config.KEEP_DATA_DAYS
+        if hourly_months_to_keep is None:
+            hourly_months_to_keep = Config.KEEP_HOURLY_MONTHS
             
         try:
-            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+            now = datetime.now()
+            cutoff_date = now - timedelta(days=days_to_keep)
+            kept_from = trade_date(cutoff_date) // 100 * 100  # First day of the cutoff's month
+            months_back = now.year * 12 + now.month - 1 - hourly_months_to_keep
+            hourly_cutoff = datetime(months_back // 12, months_back % 12 + 1, 1)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self.net_mf_state.lock, self._connect() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    DELETE FROM stock_candles 
-                    WHERE timestamp < ?
-                ''', (cutoff_date.isoformat(),))
+                expired = [table for table in self._candle_partitions(cursor)
+                           if partition_name(kept_from) > table]
+                deleted_count = 0
                 
-                deleted_count = cursor.rowcount
+                # One transaction per month, so an interrupted run resumes
+                for table in expired:
+                    end = trade_date(from_epoch(partition_bounds(table)[1])) // 100 * 100
+                    cursor.execute('BEGIN IMMEDIATE')
+                    cursor.execute(f'''
+                        SELECT s.symbol, COUNT(*) FROM {table} c
+                        JOIN symbols s ON s.id = c.symbol_id
+                        GROUP BY c.symbol_id
+                    ''')
+                    removed = dict(cursor.fetchall())
+                    
+                    bars = sum(self._roll_up_partition(cursor, table, resolution)
+                               for resolution in ROLLUP_RESOLUTIONS)
+                    cursor.execute(f'DROP TABLE {table}')
+                    self._create_candles_view(cursor)
+                    self._subtract_from_symbol_stats(cursor, removed, end)
+                    self._bump_generation(cursor)
+                    conn.commit()
+                    
+                    deleted_count += sum(removed.values())
+                    logging.info(f"Rolled {sum(removed.values())} candles of {table} up into {bars} bars")
+                
+                cursor.execute('''
+                    DELETE FROM aggregated_bars 
+                    WHERE resolution NOT IN ({}) AND timestamp < ?
+                '''.format(', '.join('?' * len(ROLLUP_RESOLUTIONS))),
+                    ROLLUP_RESOLUTIONS + (bar_key(cutoff_date),))
+                cursor.execute('''
+                    DELETE FROM aggregated_bars 
+                    WHERE resolution = '1h' AND timestamp < ?
+                ''', (bar_key(hourly_cutoff),))
                 conn.commit()
                 
+                if expired:
+                    self.net_mf_state.reset()
+                    # Hand the dropped tables' pages back to the filesystem
+                    # (executescript steps the pragma until every page is freed)
+                    conn.executescript('PRAGMA incremental_vacuum;')
+                    logging.info(f"Dropped candle partitions: {', '.join(expired)}")
+                
                 logging.info(f"Cleaned up {deleted_count} old records")
                 return deleted_count
                 
@@ -307,30 +1987,33 @@ class StockDatabase:
             return 0
     
     def get_database_stats(self) -> Dict[str, Any]:
-        """Get database statistics"""
+        """Get database statistics (from the maintained counts, no candle scans)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Total records
-                cursor.execute('SELECT COUNT(*) FROM stock_candles')
-                total_records = cursor.fetchone()[0]
+                cursor.execute('SELECT total_records FROM app_status WHERE id = 1')
+                row = cursor.fetchone()
+                total_records = row[0] if row else 0
                 
                 # Records per symbol
                 cursor.execute('''
-                    SELECT symbol, COUNT(*) 
-                    FROM stock_candles 
-                    GROUP BY symbol 
-                    ORDER BY COUNT(*) DESC
+                    SELECT symbol, candle_count 
+                    FROM symbol_stats 
+                    ORDER BY candle_count DESC
                 ''')
                 symbol_counts = dict(cursor.fetchall())
                 
                 # Date range
                 cursor.execute('''
-                    SELECT MIN(timestamp), MAX(timestamp) 
-                    FROM stock_candles
+                    SELECT MIN(first_timestamp), MAX(last_timestamp) 
+                    FROM symbol_stats
                 ''')
-                date_range = cursor.fetchone()
+                date_range = tuple(
+                    from_epoch(value).isoformat() if value is not None else None
+                    for value in cursor.fetchone()
+                )
                 
                 return {
                     'total_records': total_records,
@@ -344,10 +2027,11 @@ class StockDatabase:
             return {}
     
     def _get_database_size(self) -> str:
-        """Get database file size in MB"""
+        """Get database file size in MB (including the WAL file)"""
         try:
-            import os
             size_bytes = os.path.getsize(self.db_path)
+            if os.path.exists(self.db_path + '-wal'):
+                size_bytes += os.path.getsize(self.db_path + '-wal')
             size_mb = size_bytes / (1024 * 1024)
             return f"{size_mb:.2f} MB"
         except:
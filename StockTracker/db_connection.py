@@ -0,0 +1,122 @@
+# db_connection.py
+# Long-lived, per-thread SQLite connections
+
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict
+from config import Config
+
+class ConnectionManager:
+    """
+    Hands every thread its own long-lived connection to one database file.
+    Connections are opened once with WAL journaling and the configured
+    PRAGMAs, so each call skips connection setup and reuses the statements
+    sqlite3 has already prepared on that connection. Under WAL, readers on
+    other threads keep working while a writer commits.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._generation = 0  # Bumped by close_all(); threads then reopen on their next call
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use"""
+        cached = getattr(self._local, 'connection', None)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        if cached is not None:
+            # Retired by close_all(); closed here, on the thread that used it
+            self._close(cached[1])
+
+        conn = self._open()
+        with self._lock:
+            self._close_dead_threads()
+            self._connections[threading.current_thread()] = conn
+            self._local.connection = (self._generation, conn)
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread is off only so close_all() can close connections of
+        # finished threads; each connection is still used by one thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=Config.DB_BUSY_TIMEOUT_SECONDS,
+            cached_statements=Config.DB_STATEMENT_CACHE_SIZE,
+            check_same_thread=False
+        )
+        journal_mode = conn.execute(f'PRAGMA journal_mode = {Config.DB_JOURNAL_MODE}').fetchone()[0]
+        if journal_mode.upper() != Config.DB_JOURNAL_MODE.upper():
+            logging.warning(f"Database journal mode is {journal_mode}, not {Config.DB_JOURNAL_MODE}")
+        conn.execute(f'PRAGMA synchronous = {Config.DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size = -{Config.DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {Config.DB_MMAP_SIZE_MB * 1024 * 1024}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        logging.debug(f"Opened database connection for {threading.current_thread().name}")
+        return conn
+
+    def _close_dead_threads(self):
+        """Close connections whose threads have exited (caller holds the lock)"""
+        for thread in [thread for thread in self._connections if not thread.is_alive()]:
+            self._close(self._connections.pop(thread))
+
+    def _close(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Error closing database connection: {e}")
+
+    @contextmanager
+    def synchronous(self, level: str):
+        """
+        Run a block on this thread's connection with another synchronous
+        level, e.g. NORMAL for bulk backfill writes
+        """
+        conn = self.connection()
+        previous = conn.execute('PRAGMA synchronous').fetchone()[0]
+        conn.execute(f'PRAGMA synchronous = {level}')
+        try:
+            yield conn
+        finally:
+            conn.execute(f'PRAGMA synchronous = {previous}')
+
+    def close_all(self):
+        """
+        Retire every thread's connection. The calling thread's connection and
+        those of exited threads are closed now; other threads may be in the
+        middle of a statement, so each closes its own on its next call and
+        reopens.
+        """
+        with self._lock:
+            self._generation += 1
+            self._close_dead_threads()
+            conn = self._connections.pop(threading.current_thread(), None)
+            if conn is not None:
+                self._close(conn)
+                self._local.connection = None
+
+    def open_count(self) -> int:
+        """Number of live connections"""
+        with self._lock:
+            self._close_dead_threads()
+            return len(self._connections)
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """
+    Get the process-wide manager for a database file, so the GUI, scheduler
+    and console StockDatabase instances share per-thread connections
+    """
+    key = os.path.abspath(db_path)
+
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = ConnectionManager(db_path)
+        return _managers[key]
@@ -2,13 +2,14 @@
 # GUI interface for Stock Tracker using Tkinter
 
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
 import logging
 from datetime import datetime
 from typing import Optional
 from config import Config
 from scheduler import DataScheduler
+from aggregator import derived_resolutions
 from database import StockDatabase
 
 class StockTrackerGUI:
@@ -50,6 +51,7 @@ class StockTrackerGUI:
         
         # Create tabs
         self.create_main_tab()
+        self.create_watchlist_tab()
         self.create_data_tab()
         self.create_settings_tab()
         self.create_logs_tab()
@@ -114,6 +116,29 @@ class StockTrackerGUI:
         
         self.error_count_label = ttk.Label(right_stats, text="Errors: 0")
         self.error_count_label.pack(anchor=tk.E)
+        
+        self.write_queue_label = ttk.Label(left_stats, text="Write Queue: 0")
+        self.write_queue_label.pack(anchor=tk.W)
+        
+        self.circuit_label = ttk.Label(right_stats, text="Paused Symbols: 0")
+        self.circuit_label.pack(anchor=tk.E)
+    
+    def create_watchlist_tab(self):
+        """Create the watchlist tab with the latest candle of every tracked symbol"""
+        watchlist_frame = ttk.Frame(self.notebook)
+        self.notebook.add(watchlist_frame, text="Watchlist")
+        
+        columns = ("Symbol", "Time", "Close", "Volume", "Net MF")
+        self.watchlist_tree = ttk.Treeview(watchlist_frame, columns=columns, show="headings", height=15)
+        for col in columns:
+            self.watchlist_tree.heading(col, text=col)
+            self.watchlist_tree.column(col, width=150 if col == "Time" else 100)
+        
+        v_scrollbar = ttk.Scrollbar(watchlist_frame, orient=tk.VERTICAL, command=self.watchlist_tree.yview)
+        self.watchlist_tree.configure(yscrollcommand=v_scrollbar.set)
+        
+        self.watchlist_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
     def create_data_tab(self):
         """Create the data viewing tab"""
@@ -131,7 +156,19 @@ class StockTrackerGUI:
         self.symbol_combo.pack(side=tk.LEFT, padx=5)
         self.symbol_combo.bind("<<ComboboxSelected>>", self.on_symbol_selected)
         
+        ttk.Label(symbol_frame, text="Resolution:").pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.resolution_var = tk.StringVar(value=Config.DATA_INTERVAL)
+        resolution_combo = ttk.Combobox(symbol_frame, textvariable=self.resolution_var, width=5, state="readonly",
+                                        values=[Config.DATA_INTERVAL] + derived_resolutions())
+        resolution_combo.pack(side=tk.LEFT, padx=5)
+        resolution_combo.bind("<<ComboboxSelected>>", self.on_symbol_selected)
+        
         ttk.Button(symbol_frame, text="Refresh", command=self.refresh_data).pack(side=tk.LEFT, padx=5)
+        ttk.Button(symbol_frame, text="Load Older", command=self.load_older_data).pack(side=tk.LEFT, padx=5)
+        
+        # (symbol, timestamp) of the oldest candle shown; the next page starts before it
+        self.data_cursor = None
         
         # Data display
         data_display_frame = ttk.LabelFrame(data_frame, text="Recent Data", padding=5)
@@ -184,6 +221,7 @@ class StockTrackerGUI:
         self.new_symbol_var = tk.StringVar()
         ttk.Entry(add_frame, textvariable=self.new_symbol_var, width=10).pack(side=tk.LEFT, padx=5)
         ttk.Button(add_frame, text="Add", command=self.add_symbol).pack(side=tk.LEFT)
+        ttk.Button(add_frame, text="Import from File...", command=self.import_symbols).pack(side=tk.LEFT, padx=5)
         
         # Current symbols list
         current_frame = ttk.Frame(symbols_frame)
@@ -355,6 +393,19 @@ class StockTrackerGUI:
             self.symbols_count_label.config(text=f"Symbols: {status['symbols_count']}")
             self.error_count_label.config(text=f"Errors: {status['error_count']}")
             
+            # Candles waiting for the writer thread and its last commit time
+            queue = status['ingest_queue']
+            self.write_queue_label.config(
+                text=f"Write Queue: {queue['depth']:,} (last commit {queue['last_commit_ms']:.0f} ms)")
+            
+            # Symbols skipped by the circuit breaker
+            paused = list(status['circuit_breakers']['symbols'])
+            if paused:
+                shown = ', '.join(paused[:5]) + (f" +{len(paused) - 5}" if len(paused) > 5 else "")
+                self.circuit_label.config(text=f"Paused Symbols: {len(paused)} ({shown})", foreground="orange")
+            else:
+                self.circuit_label.config(text="Paused Symbols: 0", foreground="")
+            
             # Update symbols list
             symbols = self.scheduler.get_symbols()
             self.symbol_combo['values'] = symbols
@@ -362,12 +413,33 @@ class StockTrackerGUI:
             for symbol in symbols:
                 self.symbols_listbox.insert(tk.END, symbol)
             
+            self.update_watchlist(symbols)
+            
         except Exception as e:
             logging.error(f"Error updating display: {e}")
         
         # Schedule next update
         self.root.after(Config.UPDATE_GUI_INTERVAL, self.update_display)
     
+    def update_watchlist(self, symbols):
+        """Show the latest candle of each symbol, read in one query"""
+        snapshot = self.database.get_latest_snapshot(symbols)
+        
+        self.watchlist_tree.delete(*self.watchlist_tree.get_children())
+        for symbol in symbols:
+            candle = snapshot.get(symbol)
+            if candle:
+                values = (
+                    symbol,
+                    candle.timestamp.strftime("%Y-%m-%d %H:%M"),
+                    f"{candle.close_price:.2f}",
+                    f"{candle.volume:,}",
+                    f"{candle.net_mf:.2f}"
+                )
+            else:
+                values = (symbol, "No data", "-", "-", "-")
+            self.watchlist_tree.insert("", tk.END, values=values)
+    
     def on_symbol_selected(self, event):
         """Handle symbol selection in data tab"""
         self.refresh_data()
@@ -382,40 +454,129 @@ class StockTrackerGUI:
             # Clear existing data
             for item in self.data_tree.get_children():
                 self.data_tree.delete(item)
+            self.data_cursor = None
             
-            # Get recent candles for symbol
-            candles = self.database.get_candles_for_symbol(symbol, limit=50)
+            resolution = self.resolution_var.get()
+            if resolution != Config.DATA_INTERVAL:
+                # Coarser resolutions come from locally aggregated bars
+                for bar in self.database.get_bars(symbol, resolution, limit=Config.GUI_PAGE_ROWS):
+                    values = (
+                        bar.timestamp.strftime("%Y-%m-%d %H:%M"),
+                        f"{bar.open_price:.2f}",
+                        f"{bar.high_price:.2f}",
+                        f"{bar.low_price:.2f}",
+                        f"{bar.close_price:.2f}",
+                        f"{bar.volume:,}",
+                        "-", "-",
+                        "-" if bar.net_mf is None else f"{bar.net_mf:.2f}"  # Set on rolled-up bars
+                    )
+                    self.data_tree.insert("", 0, values=values)
+                return
             
-            # Display data in reverse chronological order
-            for candle in candles:
-                values = (
-                    candle.timestamp.strftime("%Y-%m-%d %H:%M"),
-                    f"{candle.open_price:.2f}",
-                    f"{candle.high_price:.2f}",
-                    f"{candle.low_price:.2f}",
-                    f"{candle.close_price:.2f}",
-                    f"{candle.volume:,}",
-                    f"{candle.avg_price:.2f}",
-                    f"{candle.money_flow:.2f}",
-                    f"{candle.net_mf:.2f}"
-                )
-                self.data_tree.insert("", 0, values=values)  # Insert at top
+            self.show_candle_page(symbol)
             
         except Exception as e:
             logging.error(f"Error refreshing data: {e}")
     
+    def load_older_data(self):
+        """Add the next page of older candles to the data grid"""
+        if self.data_cursor is None:
+            return
+        
+        try:
+            self.show_candle_page(self.data_cursor[0], after=self.data_cursor)
+        except Exception as e:
+            logging.error(f"Error loading older data: {e}")
+    
+    def show_candle_page(self, symbol, after=None):
+        """
+        Show one page of a symbol's candles, newest first from `after` (the
+        latest candles when omitted), above the rows already in the grid
+        """
+        page = next(self.database.get_candles_range(symbol, after=after, page_size=Config.GUI_PAGE_ROWS,
+                                                    as_batch=True, newest_first=True), None)
+        if page is None:
+            return
+        
+        # Display data in reverse chronological order
+        for candle in page:
+            values = (
+                candle.timestamp.strftime("%Y-%m-%d %H:%M"),
+                f"{candle.open_price:.2f}",
+                f"{candle.high_price:.2f}",
+                f"{candle.low_price:.2f}",
+                f"{candle.close_price:.2f}",
+                f"{candle.volume:,}",
+                f"{candle.avg_price:.2f}",
+                f"{candle.money_flow:.2f}",
+                f"{candle.net_mf:.2f}"
+            )
+            self.data_tree.insert("", 0, values=values)  # Insert at top
+        
+        self.data_cursor = (symbol, page[-1].timestamp)
+    
     def add_symbol(self):
         """Add a new symbol to track"""
         symbol = self.new_symbol_var.get().strip().upper()
         if not symbol:
             return
         
-        if self.scheduler.add_symbol(symbol):
-            self.new_symbol_var.set("")
-            messagebox.showinfo("Success", f"Added symbol: {symbol}")
-            self.update_display()
-        else:
-            messagebox.showerror("Error", f"Failed to add symbol: {symbol}")
+        def add():
+            added = self.scheduler.add_symbol(symbol)
+            
+            def update_gui():
+                if added:
+                    self.new_symbol_var.set("")
+                    messagebox.showinfo("Success", f"Added symbol: {symbol}")
+                    self.update_display()
+                else:
+                    messagebox.showerror("Error", f"Failed to add symbol: {symbol}")
+            
+            self.root.after(0, update_gui)
+        
+        # Validation may need a network lookup, keep it off the GUI thread
+        threading.Thread(target=add, daemon=True).start()
+    
+    def import_symbols(self):
+        """Add symbols listed in a text file (one per line or comma separated)"""
+        path = filedialog.askopenfilename(
+            title="Import Symbols",
+            filetypes=[("Text files", "*.txt *.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        try:
+            with open(path) as f:
+                symbols = [s for s in f.read().replace(',', '\n').split() if s]
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not read {path}: {e}")
+            return
+        
+        def add_all():
+            try:
+                results = self.scheduler.add_symbols(symbols)
+                failed = [symbol for symbol, added in results.items() if not added]
+                
+                def update_gui():
+                    message = f"Added {len(results) - len(failed)}/{len(results)} symbols"
+                    if failed:
+                        message += f"\n\nInvalid: {', '.join(failed[:20])}"
+                        if len(failed) > 20:
+                            message += f" (+{len(failed) - 20} more)"
+                    messagebox.showinfo("Import Complete", message)
+                    self.update_display()
+                
+                self.root.after(0, update_gui)
+                
+            except Exception as e:
+                def show_error():
+                    messagebox.showerror("Error", f"Import failed: {e}")
+                
+                self.root.after(0, show_error)
+        
+        # Run in background thread
+        threading.Thread(target=add_all, daemon=True).start()
     
     def remove_symbol(self):
         """Remove selected symbol from tracking"""
@@ -483,6 +644,7 @@ class StockTrackerGUI:
         """Start the GUI application"""
         logging.info("Starting Stock Tracker GUI")
         self.root.mainloop()
+        self.database.close()
 
 def main():
     """Main entry point for GUI"""
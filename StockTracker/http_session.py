@@ -0,0 +1,55 @@
+# http_session.py
+# Long-lived pooled HTTP session shared by all data requests
+
+import threading
+import logging
+from config import Config
+
+def create_http_session(pool_size: int = None):
+    """
+    Create a keep-alive HTTP session holding up to `pool_size` open
+    connections. Uses curl_cffi (what current yfinance requires) when it is
+    installed, otherwise a requests Session with a sized connection pool.
+    """
+    pool_size = max(1, pool_size or Config.HTTP_POOL_SIZE)
+
+    try:
+        from curl_cffi import CurlOpt
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        curl_requests = None
+
+    if curl_requests is not None:
+        # curl_cffi keeps one handle per thread; MAXCONNECTS bounds the
+        # connections each handle keeps alive for reuse
+        return curl_requests.Session(
+            impersonate="chrome",
+            timeout=Config.HTTP_TIMEOUT_SECONDS,
+            curl_options={CurlOpt.MAXCONNECTS: pool_size}
+        )
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Get the process-wide session, so every fetch reuses the same open
+    connections and the cookie/crumb negotiated with the data provider
+    """
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_http_session()
+            logging.debug(f"Created shared HTTP session ({type(_shared_session).__module__}, "
+                          f"pool size {Config.HTTP_POOL_SIZE})")
+        return _shared_session
@@ -0,0 +1,211 @@
+# ingest_queue.py
+# Write-behind queue with a single writer thread for collected candles
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, List, Optional
+from config import Config
+from models import SaveResult
+
+class IngestQueue:
+    """
+    Bounded write-behind queue between fetching and the database. Producers
+    put fetched candles and return at once; one writer thread drains the
+    queue and saves everything waiting in one transaction (group commit)
+    once `batch_candles` have gathered or `max_delay` seconds after the
+    oldest arrived. put() blocks while the queue is full, so a slow disk
+    slows producers down instead of growing memory without bound.
+    """
+
+    def __init__(self, database, on_saved: Callable[[SaveResult], None] = None,
+                 on_failed: Callable[[SaveResult], None] = None,
+                 capacity: int = None, batch_candles: int = None, max_delay: float = None):
+        self.database = database
+        self.on_saved = on_saved    # Called on the writer thread after every commit
+        self.on_failed = on_failed  # Called on the writer thread after every failed save
+        self.capacity = max(1, capacity or Config.INGEST_QUEUE_CANDLES)
+        self.batch_candles = max(1, batch_candles or Config.INGEST_BATCH_CANDLES)
+        self.max_delay = Config.INGEST_MAX_DELAY_SECONDS if max_delay is None else max_delay
+
+        self._items = deque()  # (sequence, enqueued_at, candles)
+        self._depth = 0        # Candles waiting in _items
+        self._enqueued = 0     # Sequence of the last put
+        self._committed = 0    # Sequence of the last put written (or given up on)
+        self._failed = 0       # Sequence of the last put whose save failed
+        self._flushed = 0      # Sequence the last flush waited for
+        self._flush_requested = False
+        self._stopping = False
+        self._writer: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+
+        # Metrics
+        self._commits = 0
+        self._candles_written = 0
+        self._inserted = 0
+        self._errors = 0
+        self._candles_failed = 0
+        self._last_error: Optional[str] = None
+        self._last_commit_ms = 0.0
+        self._max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+        self._blocked_puts = 0
+        self._blocked_seconds = 0.0
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        with self._condition:
+            self._start_writer()
+
+    def _start_writer(self):
+        """Start a writer unless one is running (caller holds the lock)"""
+        if self._writer is not None:
+            return
+        self._stopping = False
+        self._writer = threading.Thread(target=self._run, name="IngestWriter", daemon=True)
+        self._writer.start()
+
+    def put(self, candles: List, timeout: Optional[float] = None) -> bool:
+        """
+        Queue candles for writing, blocking while the queue is full.
+        Returns False if the timeout expires first.
+        """
+        if not len(candles):
+            return True
+
+        with self._condition:
+            self._start_writer()
+            if self._depth and self._depth + len(candles) > self.capacity:
+                started = time.monotonic()
+                self._blocked_puts += 1
+                # An oversized put still goes in once the queue is empty
+                fits = self._condition.wait_for(
+                    lambda: not self._depth or self._depth + len(candles) <= self.capacity, timeout)
+                self._blocked_seconds += time.monotonic() - started
+                if not fits:
+                    logging.warning(f"Ingest queue full, dropped {len(candles)} candles")
+                    return False
+
+            self._enqueued += 1
+            self._items.append((self._enqueued, time.monotonic(), candles))
+            self._depth += len(candles)
+            self._condition.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write everything queued so far now and wait until it is committed.
+        Returns False if the timeout expires first, or if saving any candles
+        queued since the previous flush failed.
+        """
+        with self._condition:
+            target = self._enqueued
+            since = self._flushed
+            if self._committed < target:
+                self._flush_requested = True
+                self._condition.notify_all()
+                if not self._condition.wait_for(lambda: self._committed >= target, timeout):
+                    return False
+            self._flushed = max(self._flushed, target)
+            return self._failed <= since
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write whatever is still queued, then stop the writer thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            writer = self._writer
+
+        if writer is not None:
+            writer.join(timeout)
+            if writer.is_alive():
+                logging.warning(f"Ingest writer still busy after {timeout}s, {self._depth} candles queued")
+
+    def _next_batch(self):
+        """
+        Wait for the next group of puts to write (caller holds the lock).
+        Returns None once stopping and empty.
+        """
+        while not self._items and not self._stopping:
+            self._condition.wait()
+        if not self._items:
+            self._writer = None  # The next put starts a new one
+            return None
+
+        # Let a group gather unless it is full, overdue or wanted now
+        deadline = self._items[0][1] + self.max_delay
+        while (self._depth < self.batch_candles and not self._flush_requested
+               and not self._stopping):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+
+        batch = list(self._items)
+        self._items.clear()
+        self._depth = 0
+        self._flush_requested = False
+        self._condition.notify_all()  # Room for blocked producers
+        return batch
+
+    def _run(self):
+        """Writer thread: one save_candles transaction per group of puts"""
+        while True:
+            with self._condition:
+                batch = self._next_batch()
+            if batch is None:
+                return
+
+            candles = [candle for _, _, items in batch for candle in items]
+            started = time.perf_counter()
+            try:
+                result = self.database.save_candles(candles)
+            except Exception as e:
+                logging.error(f"Ingest writer failed to save {len(candles)} candles: {e}")
+                result = SaveResult(inserted=0, skipped=0, error_message=str(e))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            callback = self.on_saved if result.success else self.on_failed
+            if callback:
+                try:
+                    callback(result)
+                except Exception as e:
+                    logging.error(f"Error after saving candles: {e}")
+
+            with self._condition:
+                self._commits += 1
+                if result.success:
+                    self._candles_written += len(candles)
+                    self._inserted += result.inserted
+                else:
+                    self._errors += 1
+                    self._candles_failed += len(candles)
+                    self._last_error = result.error_message
+                    self._failed = batch[-1][0]
+                self._last_commit_ms = elapsed_ms
+                self._max_commit_ms = max(self._max_commit_ms, elapsed_ms)
+                self._total_commit_ms += elapsed_ms
+                self._committed = batch[-1][0]
+                self._condition.notify_all()
+
+    def get_status(self) -> dict:
+        """Queue depth, throughput and commit latency for status displays"""
+        with self._condition:
+            return {
+                'running': self._writer is not None,
+                'depth': self._depth,
+                'capacity': self.capacity,
+                'pending_puts': self._enqueued - self._committed,
+                'commits': self._commits,
+                'candles_written': self._candles_written,
+                'inserted': self._inserted,
+                'errors': self._errors,
+                'candles_failed': self._candles_failed,
+                'last_error': self._last_error,
+                'last_commit_ms': self._last_commit_ms,
+                'avg_commit_ms': self._total_commit_ms / self._commits if self._commits else 0.0,
+                'max_commit_ms': self._max_commit_ms,
+                'blocked_puts': self._blocked_puts,
+                'blocked_seconds': self._blocked_seconds
+            }
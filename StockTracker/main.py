@@ -6,6 +6,7 @@ import sys
 import os
 import logging
 import argparse
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 # Add the current directory to Python path
@@ -90,7 +91,9 @@ class StockTrackerApp:
                     print(f"\rStatus: {status['is_running']} | "
                           f"Records: {status['total_records']} | "
                           f"Fetches: {status['fetch_count']} | "
-                          f"Errors: {status['error_count']}", end="")
+                          f"Errors: {status['error_count']} | "
+                          f"Paused: {len(status['circuit_breakers']['symbols'])} | "
+                          f"Queued: {status['ingest_queue']['depth']}", end="")
                     time.sleep(30)  # Update every 30 seconds
                 except KeyboardInterrupt:
                     break
@@ -104,6 +107,7 @@ class StockTrackerApp:
             if self.scheduler:
                 logging.info("Stopping scheduler...")
                 self.scheduler.stop()
+                self.scheduler.database.close()
     
     def test_connection(self):
         """Test the data fetching capability"""
@@ -152,8 +156,9 @@ class StockTrackerApp:
             
             # Recent data
             print(f"\nRecent Data:")
-            for symbol in symbols[:3]:  # Show first 3 symbols
-                latest = database.get_latest_candle(symbol)
+            snapshot = database.get_latest_snapshot(symbols)
+            for symbol in symbols:
+                latest = snapshot.get(symbol)
                 if latest:
                     print(f"  {symbol}: ${latest.close_price:.2f} at {latest.timestamp.strftime('%H:%M')}")
                 else:
@@ -162,13 +167,21 @@ class StockTrackerApp:
         except Exception as e:
             print(f"Error getting status: {e}")
     
-    def backfill_data(self, days=1):
+    def backfill_data(self, days=1, start=None, end=None, restart=False):
         """Backfill historical data"""
         try:
-            print(f"Backfilling {days} days of historical data...")
-            
             scheduler = DataScheduler()
-            results = scheduler.backfill_all_symbols(days)
+            
+            if restart:
+                cleared = scheduler.database.clear_backfill_checkpoints()
+                print(f"Cleared {cleared} backfill checkpoints")
+            
+            if start:
+                print(f"Backfilling historical data from {start} to {end or 'today'}...")
+                results = scheduler.backfill_range(start, end)
+            else:
+                print(f"Backfilling {days} days of historical data...")
+                results = scheduler.backfill_all_symbols(days)
             
             total_records = sum(results.values())
             print(f"✅ Backfilled {total_records} total records")
@@ -179,6 +192,39 @@ class StockTrackerApp:
         except Exception as e:
             print(f"❌ Backfill failed: {e}")
 
+    def rebuild_summary(self, symbols=None):
+        """Rebuild the daily summary and statistics tables from stored candles"""
+        try:
+            database = StockDatabase()
+            print(f"Rebuilding daily summary for {', '.join(symbols) if symbols else 'all symbols'}...")
+            days = database.rebuild_daily_summary(symbols)
+            print(f"✅ Rebuilt {days} trading days")
+            
+            total = database.rebuild_symbol_stats()
+            print(f"✅ Recounted {total} records")
+            
+        except Exception as e:
+            print(f"❌ Rebuild failed: {e}")
+
+    def export_data(self, output, symbols=None, start=None, end=None):
+        """Export stored candles to a CSV file, streamed one page at a time"""
+        try:
+            database = StockDatabase()
+            symbols = symbols or database.get_all_symbols()
+            start_time = datetime.combine(start, datetime.min.time()) if start else None
+            end_time = datetime.combine(end + timedelta(days=1), datetime.min.time()) if end else None
+            
+            print(f"Exporting {len(symbols)} symbols to {output}...")
+            exported = 0
+            with open(output, 'w', newline='') as file:
+                for page in database.get_candles_range(symbols, start_time, end_time, as_batch=True):
+                    page.to_frame().to_csv(file, header=exported == 0, index=False)
+                    exported += len(page)
+            print(f"✅ Exported {exported} records")
+            
+        except Exception as e:
+            print(f"❌ Export failed: {e}")
+
 def create_parser():
     """Create command line argument parser"""
     parser = argparse.ArgumentParser(
@@ -188,7 +234,7 @@ def create_parser():
     parser.add_argument(
         'mode',
         nargs='?',
-        choices=['gui', 'console', 'test', 'status', 'backfill'],
+        choices=['gui', 'console', 'test', 'status', 'backfill', 'rebuild-summary', 'export'],
         default='gui',
         help='Application mode (default: gui)'
     )
@@ -200,12 +246,47 @@ def create_parser():
         help='Number of days for backfill mode (default: 1)'
     )
     
+    parser.add_argument(
+        '--start',
+        type=date.fromisoformat,
+        help='Backfill or export from this date (YYYY-MM-DD); backfill uses it instead of --days'
+    )
+    
+    parser.add_argument(
+        '--end',
+        type=date.fromisoformat,
+        help='Last date to backfill or export (YYYY-MM-DD, default: today)'
+    )
+    
+    parser.add_argument(
+        '--output',
+        default='candles.csv',
+        help='CSV file written by export mode (default: candles.csv)'
+    )
+    
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignore saved backfill progress and fetch everything again'
+    )
+    
     parser.add_argument(
         '--symbols',
         nargs='+',
         help='Override default symbols to track'
     )
     
+    parser.add_argument(
+        '--data-source',
+        choices=['yfinance', 'replay'],
+        help='Market data provider (default: yfinance)'
+    )
+    
+    parser.add_argument(
+        '--replay-dir',
+        help='Directory of recorded <SYMBOL>.csv/.parquet files for the replay source'
+    )
+    
     parser.add_argument(
         '--market-hours-only',
         action='store_true',
@@ -229,6 +310,12 @@ def main():
     if args.symbols:
         Config.STOCK_SYMBOLS = [symbol.upper() for symbol in args.symbols]
     
+    # Override data source if provided
+    if args.data_source:
+        Config.DATA_SOURCE = args.data_source
+    if args.replay_dir:
+        Config.REPLAY_DATA_DIR = args.replay_dir
+    
     # Create application instance
     app = StockTrackerApp()
     
@@ -247,7 +334,13 @@ def main():
             app.show_status()
             
         elif args.mode == 'backfill':
-            app.backfill_data(args.days)
+            app.backfill_data(args.days, args.start, args.end, args.restart)
+            
+        elif args.mode == 'rebuild-summary':
+            app.rebuild_summary(Config.STOCK_SYMBOLS if args.symbols else None)
+            
+        elif args.mode == 'export':
+            app.export_data(args.output, Config.STOCK_SYMBOLS if args.symbols else None, args.start, args.end)
             
     except KeyboardInterrupt:
         print("\n\nShutting down gracefully...")
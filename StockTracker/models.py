@@ -2,8 +2,114 @@
 # Data models for Stock Tracker
 
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+# Prices are stored as integer paise; money flow and Net MF as integer
+# paise too, and reported in thousands of rupees
+PAISE_PER_RUPEE = 100
+PAISE_PER_MONEY_FLOW_UNIT = PAISE_PER_RUPEE * 1000
+
+def to_epoch(value: datetime) -> int:
+    """Datetime to epoch seconds; naive datetimes are taken as market time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=ZoneInfo(Config.MARKET_TIMEZONE))
+    return int(value.timestamp())
+
+def from_epoch(seconds: int) -> datetime:
+    """Epoch seconds to a datetime in the market timezone"""
+    return datetime.fromtimestamp(seconds, ZoneInfo(Config.MARKET_TIMEZONE))
+
+def market_now() -> datetime:
+    """Current time in the market timezone, whatever the host's zone"""
+    return datetime.now(ZoneInfo(Config.MARKET_TIMEZONE))
+
+def trade_date(value: datetime) -> int:
+    """Market-local date of a datetime (or a plain date) as an integer YYYYMMDD"""
+    if getattr(value, 'tzinfo', None) is not None:
+        value = value.astimezone(ZoneInfo(Config.MARKET_TIMEZONE))
+    return value.year * 10000 + value.month * 100 + value.day
+
+def from_trade_date(day: int) -> date:
+    """Integer YYYYMMDD trading day to a date"""
+    return date(day // 10000, day // 100 % 100, day % 100)
+
+def trade_date_bounds(day: int):
+    """Epoch seconds [start, end) of a YYYYMMDD trading day in market time"""
+    start = datetime(day // 10000, day // 100 % 100, day % 100)
+    return to_epoch(start), to_epoch(start + timedelta(days=1))
+
+def to_paise(rupees: float) -> int:
+    """Price in rupees to integer paise"""
+    return int(round(rupees * PAISE_PER_RUPEE))
+
+def avg_price_paise(high_paise: int, low_paise: int) -> int:
+    """Mid price in paise, rounding half a paisa up"""
+    return (high_paise + low_paise + 1) // 2
+
+def net_money_flow(money_flow: int, avg_price: int, open_price: int, close_price: int,
+                   previous: Optional[tuple] = None) -> int:
+    """
+    Net MF of a candle, in integer paise. `previous` is (avg_price, net_mf)
+    of the symbol's preceding candle on the same day, or None for the first.
+    1. First entry of day: Compare Close vs Open
+    2. Subsequent entries: Compare current avg_price vs previous avg_price
+    3. Equal avg_prices: Use previous Net MF sign
+    """
+    if previous is None:
+        return -money_flow if close_price < open_price else money_flow
+
+    previous_avg_price, previous_net_mf = previous
+    if avg_price > previous_avg_price or (avg_price == previous_avg_price and previous_net_mf >= 0):
+        return previous_net_mf + money_flow
+    return previous_net_mf - money_flow
+
+def net_money_flow_chain(chain_ids, avg_price, open_price, close_price, money_flow) -> np.ndarray:
+    """
+    Net MF of many candles at once, applying net_money_flow along each chain
+    (a symbol's trading day). Inputs are integer paise arrays in timestamp
+    order with each chain contiguous; chain_ids tells the chains apart.
+    Steps are summed with NumPy; only equal-average candles, whose sign
+    depends on the running total, are resolved one by one.
+    """
+    chain_ids = np.asarray(chain_ids)
+    avg_price = np.asarray(avg_price, dtype=np.int64)
+    money_flow = np.asarray(money_flow, dtype=np.int64)
+    count = len(avg_price)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    starts = np.ones(count, dtype=bool)
+    starts[1:] = chain_ids[1:] != chain_ids[:-1]
+    previous_avg = np.roll(avg_price, 1)
+
+    # First candle of a chain: close vs open; later ones: avg vs previous avg
+    falling = np.where(starts, np.asarray(close_price) < np.asarray(open_price), avg_price < previous_avg)
+    steps = np.where(falling, -money_flow, money_flow)
+    ties = np.flatnonzero(~starts & (avg_price == previous_avg))
+    steps[ties] = 0
+
+    chain_start = np.maximum.accumulate(np.where(starts, np.arange(count), 0))
+    if len(ties):
+        # A tie takes the sign of the running Net MF before it
+        running = np.cumsum(steps)
+        before_chain = running[chain_start] - steps[chain_start]
+        resolved, current_chain = 0, -1
+        for index in ties.tolist():
+            if chain_start[index] != current_chain:
+                resolved, current_chain = 0, chain_start[index]
+            previous_net_mf = running[index - 1] - before_chain[index] + resolved
+            steps[index] = money_flow[index] if previous_net_mf >= 0 else -money_flow[index]
+            resolved += steps[index]
+
+    running = np.cumsum(steps)
+    return running - (running[chain_start] - steps[chain_start])
 
 @dataclass
 class StockCandle:
@@ -26,15 +132,15 @@ class StockCandle:
     def __post_init__(self):
         """Set created_at to current time if not provided"""
         if self.created_at is None:
-            self.created_at = datetime.now()
+            self.created_at = market_now()
         
-        # Calculate avg_price if not provided
+        # Calculate avg_price if not provided (exact to the paisa)
         if self.avg_price is None:
-            self.avg_price = (self.high_price + self.low_price) / 2
+            self.avg_price = avg_price_paise(to_paise(self.high_price), to_paise(self.low_price)) / PAISE_PER_RUPEE
         
         # Calculate money_flow if not provided (in thousands)
         if self.money_flow is None:
-            self.money_flow = (self.avg_price * self.volume) / 1000
+            self.money_flow = to_paise(self.avg_price) * int(self.volume) / PAISE_PER_MONEY_FLOW_UNIT
     
     def to_dict(self):
         """Convert to dictionary for database storage"""
@@ -73,11 +179,6 @@ class StockCandle:
     @classmethod
     def from_yfinance_row(cls, symbol, timestamp, row):
         """Create StockCandle from yfinance data row"""
-        print("\n--- from_yfinance_row DEBUG ---")
-        print("Symbol:", symbol)
-        print("Timestamp:", timestamp)
-        print("Row data:", row.to_dict() if hasattr(row, "to_dict") else row)
-        print("--------------------------------\n")
         return cls(
             symbol=symbol,
             timestamp=timestamp,
@@ -88,10 +189,320 @@ class StockCandle:
             volume=int(row['Volume'])
         )
     
+    @classmethod
+    def from_yfinance_frame(cls, symbol, frame) -> List['StockCandle']:
+        """Create StockCandles from a whole yfinance frame via its column arrays"""
+        columns = frame_to_columns(frame)
+        return [
+            cls(
+                symbol=symbol,
+                timestamp=timestamp,
+                open_price=open_price,
+                high_price=high_price,
+                low_price=low_price,
+                close_price=close_price,
+                volume=volume
+            )
+            for timestamp, open_price, high_price, low_price, close_price, volume in zip(
+                frame.index.to_pydatetime(),
+                columns['open'].tolist(),
+                columns['high'].tolist(),
+                columns['low'].tolist(),
+                columns['close'].tolist(),
+                columns['volume'].tolist()
+            )
+        ]
+    
     def __str__(self):
         """String representation"""
         return f"{self.symbol} {self.timestamp}: O:{self.open_price:.2f} H:{self.high_price:.2f} L:{self.low_price:.2f} C:{self.close_price:.2f} V:{self.volume}"
 
+@dataclass
+class AggregatedBar:
+    """
+    OHLCV bar built locally from finer candles (or ticks) at a coarser resolution
+    """
+    symbol: str
+    resolution: str
+    timestamp: datetime
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    volume: int
+    candle_count: int = 1
+    net_mf: Optional[float] = None  # Closing Net MF, set when rolled up from stored candles
+    
+    def __str__(self):
+        """String representation"""
+        return (f"{self.symbol} {self.resolution} {self.timestamp}: O:{self.open_price:.2f} "
+                f"H:{self.high_price:.2f} L:{self.low_price:.2f} C:{self.close_price:.2f} V:{self.volume}")
+
+@dataclass
+class DailySummary:
+    """
+    One symbol's trading day rolled up from its candles
+    """
+    symbol: str
+    trade_date: date
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    volume: int
+    net_mf: float  # Net MF of the day's last candle
+    candle_count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+    
+    def __str__(self):
+        """String representation"""
+        return (f"{self.symbol} {self.trade_date}: O:{self.open_price:.2f} H:{self.high_price:.2f} "
+                f"L:{self.low_price:.2f} C:{self.close_price:.2f} V:{self.volume} Net MF:{self.net_mf:.2f}")
+
+class CandleBatch:
+    """
+    Array-backed candles for one symbol. Every field is a NumPy column
+    (timestamp as int64 epoch seconds), so a batch costs a few dozen bytes
+    per candle instead of a boxed StockCandle object. Slicing returns
+    another batch over views of the same arrays; indexing a single row or
+    iterating builds StockCandles on demand.
+    """
+    
+    FLOAT_COLUMNS = ('open_price', 'high_price', 'low_price', 'close_price',
+                     'avg_price', 'money_flow', 'net_mf')
+    
+    def __init__(self, symbol: str, timestamp, open_price, high_price, low_price, close_price,
+                 volume, avg_price=None, money_flow=None, net_mf=None, created_at=None,
+                 tz: str = None):
+        self.symbol = symbol
+        self.tz = tz or Config.MARKET_TIMEZONE
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.open_price = np.asarray(open_price, dtype=np.float64)
+        self.high_price = np.asarray(high_price, dtype=np.float64)
+        self.low_price = np.asarray(low_price, dtype=np.float64)
+        self.close_price = np.asarray(close_price, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+        
+        # Same derivations as StockCandle.__post_init__, once per column
+        if avg_price is None:
+            avg_price = avg_price_paise(_column_paise(self.high_price),
+                                        _column_paise(self.low_price)) / PAISE_PER_RUPEE
+        self.avg_price = np.asarray(avg_price, dtype=np.float64)
+        
+        if money_flow is None:
+            money_flow = _column_paise(self.avg_price) * self.volume / PAISE_PER_MONEY_FLOW_UNIT
+        self.money_flow = np.asarray(money_flow, dtype=np.float64)
+        
+        # NaN marks a Net MF the database has not computed yet
+        if net_mf is None:
+            net_mf = np.full(len(self.timestamp), np.nan)
+        self.net_mf = np.asarray(net_mf, dtype=np.float64)
+        
+        self.created_at = None if created_at is None else np.asarray(created_at, dtype=np.int64)
+    
+    @classmethod
+    def empty(cls, symbol: str) -> 'CandleBatch':
+        """A batch with no candles"""
+        return cls(symbol, [], [], [], [], [], [])
+    
+    @classmethod
+    def from_frame(cls, symbol: str, frame) -> 'CandleBatch':
+        """Create a batch from a yfinance OHLCV frame"""
+        columns = frame_to_columns(frame)
+        tz = str(frame.index.tz) if frame.index.tz is not None else None
+        return cls(symbol, columns['timestamp'], columns['open'], columns['high'],
+                   columns['low'], columns['close'], columns['volume'], tz=tz)
+    
+    @classmethod
+    def from_candles(cls, candles: List[StockCandle]) -> 'CandleBatch':
+        """Create a batch from StockCandles of one symbol"""
+        if not candles:
+            raise ValueError("Cannot infer symbol from an empty candle list")
+        return cls(
+            candles[0].symbol,
+            [to_epoch(c.timestamp) for c in candles],
+            [c.open_price for c in candles],
+            [c.high_price for c in candles],
+            [c.low_price for c in candles],
+            [c.close_price for c in candles],
+            [c.volume for c in candles],
+            avg_price=[c.avg_price for c in candles],
+            money_flow=[c.money_flow for c in candles],
+            net_mf=[np.nan if c.net_mf is None else c.net_mf for c in candles],
+            created_at=[to_epoch(c.created_at) for c in candles]
+        )
+    
+    @classmethod
+    def from_rows(cls, symbol: str, rows: List[tuple]) -> 'CandleBatch':
+        """
+        Create a batch from database rows of (timestamp, open, high, low,
+        close, volume, avg_price, money_flow, net_mf, created_at), with
+        epoch-second times and prices and flows in integer paise
+        """
+        if not rows:
+            return cls.empty(symbol)
+        columns = list(zip(*rows))
+        prices = [np.asarray(column, dtype=np.int64) / PAISE_PER_RUPEE for column in columns[1:5]]
+        return cls(
+            symbol,
+            columns[0],
+            *prices,
+            columns[5],
+            avg_price=np.asarray(columns[6], dtype=np.int64) / PAISE_PER_RUPEE,
+            money_flow=np.asarray(columns[7], dtype=np.int64) / PAISE_PER_MONEY_FLOW_UNIT,
+            net_mf=np.asarray(columns[8], dtype=np.int64) / PAISE_PER_MONEY_FLOW_UNIT,
+            created_at=columns[9]
+        )
+    
+    @classmethod
+    def concat(cls, batches: List['CandleBatch']) -> 'CandleBatch':
+        """Join batches of the same symbol end to end"""
+        if not batches:
+            raise ValueError("Nothing to concatenate")
+        first = batches[0]
+        created_at = None
+        if all(batch.created_at is not None for batch in batches):
+            created_at = np.concatenate([batch.created_at for batch in batches])
+        return cls(
+            first.symbol,
+            np.concatenate([batch.timestamp for batch in batches]),
+            *(np.concatenate([getattr(batch, name) for batch in batches])
+              for name in ('open_price', 'high_price', 'low_price', 'close_price', 'volume',
+                           'avg_price', 'money_flow', 'net_mf')),
+            created_at=created_at,
+            tz=first.tz
+        )
+    
+    def __len__(self):
+        return len(self.timestamp)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._candle(index)
+    
+    def __getitem__(self, key):
+        """A StockCandle for an integer index, a batch for a slice or mask"""
+        if isinstance(key, (int, np.integer)):
+            return self._candle(int(key))
+        return CandleBatch(
+            self.symbol,
+            self.timestamp[key],
+            self.open_price[key],
+            self.high_price[key],
+            self.low_price[key],
+            self.close_price[key],
+            self.volume[key],
+            avg_price=self.avg_price[key],
+            money_flow=self.money_flow[key],
+            net_mf=self.net_mf[key],
+            created_at=None if self.created_at is None else self.created_at[key],
+            tz=self.tz
+        )
+    
+    def _candle(self, index: int) -> StockCandle:
+        """Build the StockCandle view of one row"""
+        if index < 0:
+            index += len(self)
+        tzinfo = ZoneInfo(self.tz)
+        net_mf = self.net_mf[index]
+        return StockCandle(
+            symbol=self.symbol,
+            timestamp=datetime.fromtimestamp(int(self.timestamp[index]), tzinfo),
+            open_price=float(self.open_price[index]),
+            high_price=float(self.high_price[index]),
+            low_price=float(self.low_price[index]),
+            close_price=float(self.close_price[index]),
+            volume=int(self.volume[index]),
+            avg_price=float(self.avg_price[index]),
+            money_flow=float(self.money_flow[index]),
+            net_mf=None if np.isnan(net_mf) else float(net_mf),
+            created_at=(datetime.fromtimestamp(int(self.created_at[index]), tzinfo)
+                        if self.created_at is not None else None)
+        )
+    
+    def to_candles(self) -> List[StockCandle]:
+        """Materialize every row as a StockCandle"""
+        return list(self)
+    
+    def datetimes(self) -> pd.DatetimeIndex:
+        """Timestamps as a tz-aware DatetimeIndex"""
+        return pd.to_datetime(self.timestamp, unit='s', utc=True).tz_convert(self.tz)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """The batch as a DataFrame with a symbol and a tz-aware timestamp column"""
+        frame = pd.DataFrame({'symbol': self.symbol, 'timestamp': self.datetimes()})
+        for name in ('open_price', 'high_price', 'low_price', 'close_price', 'volume',
+                     'avg_price', 'money_flow', 'net_mf'):
+            frame[name] = getattr(self, name)
+        return frame
+    
+    def trade_dates(self) -> np.ndarray:
+        """Market-local date of every candle as YYYYMMDD integers"""
+        index = self.datetimes()
+        return (index.year * 10000 + index.month * 100 + index.day).to_numpy(dtype=np.int64)
+    
+    def between(self, start: datetime = None, end: datetime = None) -> 'CandleBatch':
+        """Candles with start <= timestamp < end"""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.timestamp >= to_epoch(start)
+        if end is not None:
+            mask &= self.timestamp < to_epoch(end)
+        return self[mask]
+    
+    def sorted(self) -> 'CandleBatch':
+        """Candles in ascending timestamp order"""
+        return self[np.argsort(self.timestamp, kind='stable')]
+    
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the column arrays"""
+        columns = [self.timestamp, self.volume] + [getattr(self, name) for name in self.FLOAT_COLUMNS]
+        if self.created_at is not None:
+            columns.append(self.created_at)
+        return sum(column.nbytes for column in columns)
+    
+    def __repr__(self):
+        if not len(self):
+            return f"CandleBatch({self.symbol}, empty)"
+        first, last = self.datetimes()[[0, -1]]
+        return f"CandleBatch({self.symbol}, {len(self)} candles, {first} to {last})"
+
+def _column_paise(prices: np.ndarray) -> np.ndarray:
+    """Price column in rupees to integer paise"""
+    return np.rint(prices * PAISE_PER_RUPEE).astype(np.int64)
+
+def frame_to_columns(frame) -> Dict[str, np.ndarray]:
+    """
+    Convert a yfinance OHLCV frame to NumPy columns without building
+    per-row objects. Timestamps become int64 epoch seconds.
+    """
+    return {
+        'timestamp': frame.index.as_unit('s').asi8,
+        'open': frame['Open'].to_numpy(dtype=np.float64),
+        'high': frame['High'].to_numpy(dtype=np.float64),
+        'low': frame['Low'].to_numpy(dtype=np.float64),
+        'close': frame['Close'].to_numpy(dtype=np.float64),
+        'volume': frame['Volume'].fillna(0).to_numpy(dtype=np.int64)
+    }
+
+def frame_to_rows(symbol: str, frame) -> List[tuple]:
+    """
+    Convert a yfinance OHLCV frame to insert-ready
+    (symbol, timestamp, open, high, low, close, volume) tuples
+    """
+    columns = frame_to_columns(frame)
+    return list(zip(
+        [symbol] * len(frame),
+        frame.index.to_pydatetime(),
+        columns['open'].tolist(),
+        columns['high'].tolist(),
+        columns['low'].tolist(),
+        columns['close'].tolist(),
+        columns['volume'].tolist()
+    ))
+
 @dataclass
 class MarketStatus:
     """
@@ -117,10 +528,30 @@ class FetchResult:
     data: Optional[StockCandle] = None
     error_message: Optional[str] = None
     timestamp: Optional[datetime] = None
+    candles: Optional[List[StockCandle]] = None
+    skipped: bool = False  # Not requested because the symbol's circuit is open
     
     def __post_init__(self):
         if self.timestamp is None:
             self.timestamp = datetime.now()
+        
+        # Single-candle fetches carry their candle in both fields
+        if self.candles is None:
+            self.candles = [self.data] if self.data else []
+
+@dataclass
+class SaveResult:
+    """
+    Represents the result of a bulk candle save
+    """
+    inserted: int
+    skipped: int  # Already stored (or repeated within the batch)
+    candles: object = None  # The inserted candles, as a list or CandleBatch like the input
+    error_message: Optional[str] = None
+    
+    @property
+    def success(self) -> bool:
+        return self.error_message is None
 
 @dataclass
 class AppStatus:
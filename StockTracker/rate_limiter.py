@@ -0,0 +1,82 @@
+# rate_limiter.py
+# Token-bucket rate limiting shared by all data requests
+
+import threading
+import time
+from typing import Optional
+from config import Config
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at `rate` per second
+    up to `capacity`; every outgoing request takes one token.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(max(capacity, 1))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add tokens accrued since the last refill (lock must be held)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if they are available right now"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Block until tokens are available.
+        Returns False if the timeout expires first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            time.sleep(wait)
+
+    @property
+    def available_tokens(self) -> float:
+        """Tokens currently in the bucket"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> TokenBucket:
+    """
+    Get the process-wide limiter used by every fetcher instance, so live
+    collection, backfill and symbol validation share one request budget
+    """
+    global _shared_limiter
+
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucket(Config.REQUESTS_PER_SECOND, Config.RATE_LIMIT_BURST)
+        return _shared_limiter
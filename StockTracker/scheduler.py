@@ -5,12 +5,15 @@ import schedule
 import threading
 import time
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Callable, Optional, List
 from config import Config
 from data_fetcher import StockDataFetcher
 from database import StockDatabase
-from models import MarketStatus, FetchResult
+from backfill import BackfillEngine
+from aggregator import BarAggregator, aggregate_candles
+from ingest_queue import IngestQueue
+from models import MarketStatus, FetchResult, SaveResult, CandleBatch
 
 class DataScheduler:
     """
@@ -18,8 +21,12 @@ class DataScheduler:
     """
     
     def __init__(self):
-        self.fetcher = StockDataFetcher()
         self.database = StockDatabase()
+        self.fetcher = StockDataFetcher(database=self.database)
+        self.aggregator = BarAggregator(self.database)
+        self.aggregator_warm = False
+        self.ingest_queue = IngestQueue(self.database, on_saved=self._on_candles_saved,
+                                        on_failed=self._on_save_failed)
         self.is_running = False
         self.scheduler_thread = None
         self.last_fetch_time = None
@@ -37,6 +44,7 @@ class DataScheduler:
         
         self.market_hours_only = market_hours_only
         self.is_running = True
+        self.ingest_queue.start()
         
         # Schedule data collection every 5 minutes
         schedule.every(Config.FETCH_INTERVAL_MINUTES).minutes.do(self._collect_data)
@@ -44,6 +52,14 @@ class DataScheduler:
         # Schedule daily cleanup at 6 AM
         schedule.every().day.at("06:00").do(self._daily_cleanup)
         
+        # Warm up the data source connection shortly before market open
+        # (a market-time clock time, whatever the host's timezone)
+        warmup_time = datetime.combine(date.today(), Config.MARKET_OPEN_TIME) - timedelta(minutes=Config.SESSION_WARMUP_MINUTES)
+        schedule.every().day.at(warmup_time.strftime("%H:%M"), Config.MARKET_TIMEZONE).do(lambda: self.fetcher.warm_up())
+        
+        # Warm up now as well, in case we start mid-session
+        threading.Thread(target=lambda: self.fetcher.warm_up(), daemon=True).start()
+        
         # Start scheduler in background thread
         self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.scheduler_thread.start()
@@ -61,6 +77,9 @@ class DataScheduler:
             # Wait for thread to finish (up to 5 seconds)
             self.scheduler_thread.join(timeout=5)
         
+        # Write everything collected before stopping
+        self.ingest_queue.stop(timeout=Config.INGEST_STOP_TIMEOUT_SECONDS)
+        
         logging.info("Data scheduler stopped")
     
     def _run_scheduler(self):
@@ -94,13 +113,10 @@ class DataScheduler:
             # Fetch data for all symbols
             results = self.fetcher.fetch_all_symbols()
             
-            # Save successful results to database
-            saved_count = 0
+            # Hand successful results to the writer thread
+            queued_count = self._save_results(results)
             for result in results:
-                if result.success and result.data:
-                    if self.database.save_candle(result.data):
-                        saved_count += 1
-                else:
+                if not result.success and not result.skipped:
                     self.error_count += 1
                     logging.warning(f"Failed to fetch {result.symbol}: {result.error_message}")
             
@@ -108,12 +124,79 @@ class DataScheduler:
             self.last_fetch_time = datetime.now()
             self.fetch_count += 1
             
-            logging.info(f"Completed data collection: {saved_count} new records saved")
+            logging.info(f"Completed data collection: {queued_count} records queued for saving")
             
         except Exception as e:
             logging.error(f"Error during data collection: {e}")
             self.error_count += 1
     
+    def _save_results(self, results: List[FetchResult]) -> int:
+        """
+        Queue every candle from successful fetch results for the writer
+        thread, waiting only if the queue is full. Returns the number queued.
+        """
+        candles = [candle for result in results if result.success for candle in result.candles]
+        self.ingest_queue.put(candles)
+        return len(candles)
+    
+    def _on_save_failed(self, failed: SaveResult):
+        """
+        Count a failed commit of the writer thread (runs on the writer thread)
+        """
+        self.error_count += 1
+        logging.warning(f"Failed to save collected candles: {failed.error_message}")
+    
+    def _on_candles_saved(self, saved: SaveResult):
+        """
+        Fold newly stored candles into the bar aggregator (runs on the
+        writer thread after each commit). Candles gap-filled for earlier
+        days have those days' bars rebuilt from storage instead, since the
+        aggregator only holds today's bars.
+        """
+        self._warm_up_aggregator()
+        session_start = self.fetcher.source.now().normalize().to_pydatetime()
+        earlier = [candle for candle in saved.candles if candle.timestamp < session_start]
+        if earlier:
+            self._rebuild_bars(earlier)
+        self.aggregator.ingest_many(candle for candle in saved.candles
+                                    if candle.timestamp >= session_start)
+        
+        # In-progress bars are written too so coarser views are current
+        self.aggregator.flush(include_open=True)
+        if saved.inserted:
+            logging.info(f"Saved {saved.inserted} new records")
+    
+    def _warm_up_aggregator(self):
+        """
+        Rebuild today's in-progress bars from stored candles, once per run,
+        so bars that started before a restart are not overwritten with partial data
+        """
+        if self.aggregator_warm:
+            return
+        session_start = self.fetcher.source.now().normalize().to_pydatetime()
+        self.aggregator.warm_up(self.fetcher.symbols, session_start)
+        self.aggregator_warm = True
+    
+    def _rebuild_bars(self, candles: List):
+        """
+        Rewrite the bars of every day the candles fall on from all candles
+        stored for those days, so a complete bar is never replaced by one
+        built from a partial fetch
+        """
+        days = {}
+        for candle in candles:
+            days.setdefault(candle.symbol, set()).add(candle.timestamp.date())
+        
+        bars = []
+        for symbol, symbol_days in days.items():
+            pages = list(self.database.get_candles_range(
+                symbol, start=datetime.combine(min(symbol_days), datetime.min.time()),
+                end=datetime.combine(max(symbol_days) + timedelta(days=1), datetime.min.time()),
+                as_batch=True))
+            if pages:
+                bars.extend(aggregate_candles(CandleBatch.concat(pages)))
+        self.database.save_bars(bars)
+    
     def _daily_cleanup(self):
         """
         Daily maintenance tasks
@@ -146,15 +229,16 @@ class DataScheduler:
             logging.info("Manual data collection triggered")
             results = self.fetcher.fetch_all_symbols()
             
-            # Save to database
-            saved_count = 0
-            for result in results:
-                if result.success and result.data:
-                    if self.database.save_candle(result.data):
-                        saved_count += 1
+            # Save through the writer thread, and wait so the data shows right away
+            queued_count = self._save_results(results)
+            if not self.ingest_queue.flush():
+                # Already counted in error_count by the writer thread
+                logging.error(f"Manual collection failed to write {queued_count} records: "
+                              f"{self.ingest_queue.get_status()['last_error']}")
+                return results
             
             self.last_fetch_time = datetime.now()
-            logging.info(f"Manual collection completed: {saved_count} records saved")
+            logging.info(f"Manual collection completed: {queued_count} records written")
             
             return results
             
@@ -176,7 +260,9 @@ class DataScheduler:
             'market_status': market_status,
             'symbols_count': len(self.fetcher.symbols),
             'total_records': self.database.get_total_records(),
-            'market_hours_only': self.market_hours_only
+            'market_hours_only': self.market_hours_only,
+            'circuit_breakers': self.fetcher.circuit_breaker.get_status(),
+            'ingest_queue': self.ingest_queue.get_status()
         }
     
     def add_symbol(self, symbol: str) -> bool:
@@ -185,6 +271,12 @@ class DataScheduler:
         """
         return self.fetcher.add_symbol(symbol)
     
+    def add_symbols(self, symbols: List[str]) -> dict:
+        """
+        Add many symbols to track
+        """
+        return self.fetcher.add_symbols(symbols)
+    
     def remove_symbol(self, symbol: str) -> bool:
         """
         Remove a symbol from tracking
@@ -204,34 +296,37 @@ class DataScheduler:
         try:
             logging.info(f"Backfilling {days} days of data for {symbol}")
             
-            candles = self.fetcher.fetch_historical_data(symbol, days)
-            
-            saved_count = 0
-            for candle in candles:
-                if self.database.save_candle(candle):
-                    saved_count += 1
-            
-            logging.info(f"Backfilled {saved_count} records for {symbol}")
-            return saved_count
+            candles = self.fetcher.fetch_historical_data(symbol, days, as_batch=True)
+            return self._save_backfill(symbol, candles)
             
         except Exception as e:
             logging.error(f"Error backfilling data for {symbol}: {e}")
             return 0
     
-    def backfill_all_symbols(self, days: int = 1) -> dict:
+    def _save_backfill(self, symbol: str, candles: CandleBatch) -> int:
         """
-        Backfill historical data for all symbols
+        Save backfilled candles for a symbol
         """
-        results = {}
+        saved = self.database.save_candles(candles)
+        self.database.save_bars(aggregate_candles(candles))
         
-        for symbol in self.fetcher.symbols:
-            results[symbol] = self.backfill_data(symbol, days)
-            time.sleep(0.5)  # Avoid rate limiting
-        
-        total_saved = sum(results.values())
-        logging.info(f"Backfill completed: {total_saved} total records saved")
-        
-        return results
+        logging.info(f"Backfilled {saved.inserted} records for {symbol}")
+        return saved.inserted
+    
+    def backfill_all_symbols(self, days: int = 1) -> dict:
+        """
+        Backfill the last `days` trading days for all symbols.
+        Runs on the chunked backfill engine, so an interrupted backfill resumes.
+        """
+        engine = BackfillEngine(self.fetcher, self.database)
+        return engine.run_days(days)
+    
+    def backfill_range(self, start: date, end: date = None) -> dict:
+        """
+        Backfill all symbols over a date range, resuming from stored checkpoints
+        """
+        engine = BackfillEngine(self.fetcher, self.database)
+        return engine.run(start, end)
     
     def set_market_hours_only(self, market_hours_only: bool):
         """
@@ -0,0 +1,18 @@
+# conftest.py
+# Shared test fixtures
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    """Point the application at a throwaway database"""
+    path = str(tmp_path / 'stocks.db')
+    monkeypatch.setattr(Config, 'DATABASE_PATH', path)
+    return path
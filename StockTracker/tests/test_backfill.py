@@ -0,0 +1,73 @@
+# test_backfill.py
+# Tests for the chunked backfill engine
+
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from backfill import BackfillEngine
+from config import Config
+from data_fetcher import StockDataFetcher
+from data_sources import ReplaySource, write_synthetic_replay
+from database import StockDatabase
+
+SYMBOL = 'SYM00000.NS'
+
+class LimitedReplaySource(ReplaySource):
+    """Replay source with a fixed clock and a yfinance-like intraday lookback"""
+
+    intraday_lookback_days = 60
+
+    def __init__(self, directory: str, now: datetime):
+        super().__init__(directory, speed=0)
+        self.fixed_now = pd.Timestamp(now, tz=Config.MARKET_TIMEZONE)
+        self.windows = []
+
+    def now(self) -> pd.Timestamp:
+        return self.fixed_now
+
+    def history(self, symbol, interval, period=None, start=None, end=None, raise_errors=False):
+        if start is not None:
+            if start < self.fixed_now - pd.Timedelta(days=self.intraday_lookback_days):
+                raise ValueError(f"{interval} data not available for startTime={start}")
+            self.windows.append((start, end))
+        return super().history(symbol, interval, period, start, end, raise_errors)
+
+def make_engine(tmp_path, now: datetime):
+    directory = str(tmp_path / 'replay')
+    write_synthetic_replay(directory, [SYMBOL], days=60, start_date=now - timedelta(days=80))
+    source = LimitedReplaySource(directory, now)
+    fetcher = StockDataFetcher(symbols=[SYMBOL], source=source)
+    return BackfillEngine(fetcher, StockDatabase(), chunk_days=7), source
+
+def test_first_chunk_is_clamped_to_the_source_lookback(tmp_path, database_path):
+    # Friday: the oldest servable day is a Tuesday, one day into its grid week
+    now = datetime(2026, 10, 16, 12, 0)
+    engine, source = make_engine(tmp_path, now)
+    earliest = engine._earliest_available()
+    assert earliest == date(2026, 8, 18)
+    assert engine.plan_chunks(earliest, now.date())[0][0] == date(2026, 8, 17)
+
+    results = engine.run(date(2026, 8, 1), date(2026, 9, 30))
+
+    assert results[SYMBOL] > 0
+    first_start, _ = source.windows[0]
+    assert first_start.date() == earliest
+    last_end = max(end for _, end in source.windows)
+    assert last_end.date() == date(2026, 10, 1)
+    assert engine.fetcher.circuit_breaker.allow_request(SYMBOL)
+
+    # The grid start stays the checkpoint key, and the clamped chunk is done
+    done = engine.database.get_backfill_checkpoints([SYMBOL], [date(2026, 8, 17)])
+    assert (SYMBOL, date(2026, 8, 17)) in done
+
+def test_chunk_cut_short_by_the_range_is_fetched_again(tmp_path, database_path):
+    now = datetime(2026, 10, 16, 12, 0)
+    engine, source = make_engine(tmp_path, now)
+
+    # Wednesday to Thursday of the week starting Monday 2026-09-07
+    engine.run(date(2026, 9, 9), date(2026, 9, 10))
+
+    assert [(start.date(), end.date()) for start, end in source.windows] == \
+        [(date(2026, 9, 9), date(2026, 9, 11))]
+    assert not engine.database.get_backfill_checkpoints([SYMBOL], [date(2026, 9, 7)])
@@ -0,0 +1,44 @@
+# test_data_fetcher.py
+# Tests for incremental fetching
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data_fetcher import StockDataFetcher
+from data_sources import ReplaySource
+
+SYMBOL = 'SYM00000.NS'
+
+class FrameSource(ReplaySource):
+    """Serves one fixed frame with a fixed clock"""
+
+    def __init__(self, frame: pd.DataFrame, now: pd.Timestamp):
+        super().__init__('.', speed=0)
+        self.frame = frame
+        self.fixed_now = now
+
+    def now(self) -> pd.Timestamp:
+        return self.fixed_now
+
+    def history(self, symbol, interval, period=None, start=None, end=None, raise_errors=False):
+        return self.frame
+
+def test_new_candles_skip_rows_without_prices():
+    index = pd.date_range('2026-10-15 10:00', periods=4, freq='5min', tz=Config.MARKET_TIMEZONE)
+    frame = pd.DataFrame({
+        'Open': [100.0, np.nan, 101.0, 102.0],
+        'High': [101.0, np.nan, 102.0, 103.0],
+        'Low': [99.0, np.nan, 100.0, 101.0],
+        'Close': [100.5, np.nan, 101.5, 102.5],
+        'Volume': [1000, 0, 1200, 900]
+    }, index=index)
+    fetcher = StockDataFetcher(symbols=[SYMBOL], source=FrameSource(frame, index[-1]))
+
+    result = fetcher.fetch_new_candles(SYMBOL, since=datetime(2026, 10, 15, 9, 55))
+
+    assert result.success, result.error_message
+    assert [candle.timestamp for candle in result.candles] == [index[0], index[2]]
+    assert result.data.close_price == 101.5
@@ -0,0 +1,170 @@
+# test_database.py
+# Tests for candle storage and Net MF upkeep
+
+import sqlite3
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import database
+from config import Config
+from database import StockDatabase, partition_name
+from models import PAISE_PER_MONEY_FLOW_UNIT, StockCandle, to_epoch, trade_date
+
+SYMBOL = 'SYM00000.NS'
+OTHER_SYMBOL = 'SYM00001.NS'
+
+def make_candles(start: datetime, count: int, symbol: str = SYMBOL):
+    return [
+        StockCandle(symbol=symbol, timestamp=start + timedelta(minutes=5 * i),
+                    open_price=100.0 + i, high_price=102.0 + i, low_price=99.0 + i,
+                    close_price=101.0 + i, volume=1000 + 100 * i)
+        for i in range(count)
+    ]
+
+def open_in_other_process(monkeypatch) -> StockDatabase:
+    """A StockDatabase with its own in-memory state, like one in a second process"""
+    monkeypatch.setattr(database, '_shared_states', {})
+    return StockDatabase()
+
+def test_live_inserts_chain_from_net_mf_recomputed_elsewhere(database_path, monkeypatch):
+    collector = StockDatabase()
+    candles = make_candles(datetime.now().replace(hour=10, minute=0, second=0, microsecond=0), 4)
+    assert collector.save_candles(candles[:3]).inserted == 3
+
+    # Another process corrects a stored candle and rebuilds the chain;
+    # the candle count does not change
+    with sqlite3.connect(database_path) as conn:
+        conn.execute(f'''
+            UPDATE {partition_name(trade_date(candles[1].timestamp))} SET money_flow = money_flow * 3
+            WHERE timestamp = ?
+        ''', (to_epoch(candles[1].timestamp),))
+    cli = open_in_other_process(monkeypatch)
+    assert cli.recompute_net_mf(SYMBOL) > 0
+
+    assert collector.save_candles(candles[3:]).inserted == 1
+    assert cli.recompute_net_mf(SYMBOL) == 0
+
+def session_start(months_back: int) -> datetime:
+    """Market open of the first weekday on or after the 3rd, `months_back` months ago"""
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - months_back
+    day = date(months // 12, months % 12 + 1, 3)
+    while day.weekday() not in Config.TRADING_DAYS:
+        day += timedelta(days=1)
+    return datetime.combine(day, Config.MARKET_OPEN_TIME)
+
+def save_two_months(db: StockDatabase):
+    """13 candles a day for two symbols on two days in each of two months"""
+    old, recent = session_start(3), session_start(1)
+    days = [old, old + timedelta(days=1), recent, recent + timedelta(days=1)]
+    for symbol in (SYMBOL, OTHER_SYMBOL):
+        # Later days first, so the earlier ones land behind stored candles
+        for start in reversed(days):
+            assert db.save_candles(make_candles(start, 13, symbol)).inserted == 13
+    return old, recent
+
+def query(path: str, sql: str, params=()):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+def candle_stats(path: str):
+    return query(path, '''
+        SELECT symbol, COUNT(*), MIN(timestamp), MAX(timestamp)
+        FROM stock_candles GROUP BY symbol ORDER BY symbol
+    ''')
+
+def test_counters_and_daily_summary_match_stored_candles(database_path):
+    db = StockDatabase()
+    old, recent = save_two_months(db)
+    assert partition_name(trade_date(old)) != partition_name(trade_date(recent))
+
+    assert query(database_path, '''
+        SELECT symbol, candle_count, first_timestamp, last_timestamp
+        FROM symbol_stats ORDER BY symbol
+    ''') == candle_stats(database_path)
+    assert db.get_total_records() == query(database_path, 'SELECT COUNT(*) FROM stock_candles')[0][0] == 104
+
+    assert query(database_path, '''
+        SELECT symbol, trade_date, high_price, low_price, volume, candle_count,
+               first_timestamp, last_timestamp
+        FROM daily_summary ORDER BY symbol, trade_date
+    ''') == query(database_path, '''
+        SELECT symbol, trade_date, MAX(high_price), MIN(low_price), SUM(volume), COUNT(*),
+               MIN(timestamp), MAX(timestamp)
+        FROM stock_candles GROUP BY symbol, trade_date ORDER BY symbol, trade_date
+    ''')
+    # Opening and closing values come from the day's first and last candles
+    assert query(database_path, '''
+        SELECT d.open_price, d.close_price, d.net_mf FROM daily_summary d
+        ORDER BY d.symbol, d.trade_date
+    ''') == query(database_path, '''
+        SELECT opening.open_price, closing.close_price, closing.net_mf
+        FROM daily_summary d
+        JOIN stock_candles opening ON opening.symbol = d.symbol AND opening.timestamp = d.first_timestamp
+        JOIN stock_candles closing ON closing.symbol = d.symbol AND closing.timestamp = d.last_timestamp
+        ORDER BY d.symbol, d.trade_date
+    ''')
+
+def test_cleanup_drops_expired_months_into_rollups(database_path):
+    db = StockDatabase()
+    old, recent = save_two_months(db)
+    old_table, recent_table = partition_name(trade_date(old)), partition_name(trade_date(recent))
+    old_days = query(database_path, '''
+        SELECT symbol, trade_date, open_price, high_price, low_price, close_price, volume, net_mf
+        FROM daily_summary WHERE trade_date < ? ORDER BY symbol, trade_date
+    ''', (trade_date(recent),))
+
+    assert db.cleanup_old_data(days_to_keep=45, hourly_months_to_keep=12) == 52
+
+    tables = [row[0] for row in query(database_path, '''
+        SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'stock_candles_*'
+    ''')]
+    assert old_table not in tables and recent_table in tables
+
+    # symbol_stats and the total now start at the kept month
+    assert query(database_path, '''
+        SELECT symbol, candle_count, first_timestamp, last_timestamp
+        FROM symbol_stats ORDER BY symbol
+    ''') == candle_stats(database_path)
+    assert candle_stats(database_path)[0][1:3] == (26, to_epoch(recent))
+    assert db.get_total_records() == 52
+
+    # 9:15-10:15 holds 12 candles, 10:15 the 13th; daily bars match the summary
+    hourly = query(database_path, '''
+        SELECT symbol, timestamp, candle_count FROM aggregated_bars
+        WHERE resolution = '1h' ORDER BY symbol, timestamp
+    ''')
+    assert [count for _, _, count in hourly] == [12, 1] * 4
+    assert hourly[0][1] == database.bar_key(old)
+    daily = query(database_path, '''
+        SELECT symbol, open_price, high_price, low_price, close_price, volume, net_mf, candle_count
+        FROM aggregated_bars WHERE resolution = '1d' ORDER BY symbol, timestamp
+    ''')
+    assert daily == [
+        (symbol, open_price / 100, high_price / 100, low_price / 100, close_price / 100,
+         volume, net_mf / PAISE_PER_MONEY_FLOW_UNIT, 13)
+        for symbol, _, open_price, high_price, low_price, close_price, volume, net_mf in old_days
+    ]
+
+    # The dropped month's summaries stay, and a second run has nothing to drop
+    assert len(query(database_path, 'SELECT * FROM daily_summary')) == 8
+    assert db.cleanup_old_data(days_to_keep=45, hourly_months_to_keep=12) == 0
+
+def test_range_pages_resumed_with_after_return_every_row_once(database_path):
+    db = StockDatabase()
+    save_two_months(db)
+    expected = [(symbol, timestamp) for symbol, timestamp in query(database_path, '''
+        SELECT symbol, timestamp FROM stock_candles ORDER BY symbol, timestamp
+    ''')]
+
+    seen = []
+    after = None
+    for _ in range(len(expected)):  # Bounded, in case a resume never moves on
+        # Resume every 7 candles, across pages of 4, months and symbols
+        candles = list(islice(db.get_candles_range([OTHER_SYMBOL, SYMBOL], after=after, page_size=4), 7))
+        if not candles:
+            break
+        seen.extend((candle.symbol, to_epoch(candle.timestamp)) for candle in candles)
+        after = (candles[-1].symbol, candles[-1].timestamp)
+
+    assert seen == expected
@@ -0,0 +1,58 @@
+# test_ingest_queue.py
+# Tests for the write-behind ingest queue
+
+import sqlite3
+import time
+
+from ingest_queue import IngestQueue
+from models import SaveResult
+
+class FlakyDatabase:
+    """Fails the saves it is told to, by error result or by raising"""
+
+    def __init__(self):
+        self.outcomes = []
+        self.saved = []
+
+    def save_candles(self, candles):
+        outcome = self.outcomes.pop(0) if self.outcomes else 'ok'
+        if outcome == 'raise':
+            raise sqlite3.OperationalError('database is locked')
+        if outcome == 'error':
+            return SaveResult(inserted=0, skipped=0, error_message='disk I/O error')
+        self.saved.extend(candles)
+        return SaveResult(inserted=len(candles), skipped=0, candles=candles)
+
+def test_flush_reports_failed_saves():
+    database = FlakyDatabase()
+    failures = []
+    queue = IngestQueue(database, on_failed=failures.append, max_delay=60)
+
+    for outcome in ('error', 'raise'):
+        database.outcomes.append(outcome)
+        queue.put(['a', 'b'])
+        assert not queue.flush(timeout=5)
+
+    queue.put(['c'])
+    assert queue.flush(timeout=5)
+    queue.stop(timeout=5)
+
+    status = queue.get_status()
+    assert database.saved == ['c']
+    assert status['candles_written'] == 1
+    assert status['candles_failed'] == 4
+    assert status['errors'] == 2
+    assert status['last_error'] == 'database is locked'
+    assert [failed.error_message for failed in failures] == ['disk I/O error', 'database is locked']
+
+def test_flush_reports_failure_written_before_it_was_called():
+    database = FlakyDatabase()
+    database.outcomes.append('error')
+    queue = IngestQueue(database, max_delay=0)
+
+    queue.put(['a'])
+    while queue.get_status()['pending_puts']:
+        time.sleep(0.01)
+    assert not queue.flush(timeout=5)
+    assert queue.flush(timeout=5)
+    queue.stop(timeout=5)